@@ -22,6 +22,21 @@ from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
 import math
+import argparse
+import atexit
+import csv
+import json
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+import zlib
+import ctypes
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing.sharedctypes import RawArray
+import numpy as np
 
 # ==========================================
 # VARIÁVEIS GLOBAIS
@@ -42,32 +57,61 @@ modo_camera = False  # False=Controla Objeto, True=Controla Câmera
 camera_x, camera_y, camera_z = 0.0, 0.0, 10.0
 camera_yaw = 0.0    # Rotação horizontal (esquerda/direita)
 camera_pitch = 0.0  # Rotação vertical (cima/baixo)
-velocidade_camera = 0.1
+velocidade_camera = 3.0    # Unidades por segundo (WASD no modo câmera)
 sensibilidade_mouse = 0.1
 ultimo_mouse_x = 0
 ultimo_mouse_y = 0
 mouse_capturado = False
+velocidade_rotacao = 150.0  # Graus por segundo (WASD no modo objeto)
+velocidade_objeto = 3.0     # Unidades por segundo (setas)
+
+# Laço de quadros
+fps_maximo = 60                # Limite de quadros por segundo (0 = sem limite)
+passo_simulacao = 1.0 / 120.0  # Passo fixo (s) do movimento por teclas seguradas
 
 # Estado da Iluminação
-# 0: Flat, 1: Gouraud (Suave), 2: Phong (Scanline no cubo)
+# 0: Flat, 1: Gouraud (Suave), 2: Phong (Scanline no cubo), 3: Phong GLSL
 modelo_iluminacao = 0
 
 # Estado de Renderização
 modo_wireframe = False
 
 # Estado do Objeto Selecionado
-# 1=Esfera, 2=Cubo, 3=Cone, 4=Torus, 5=Teapot, 6=Modo Extrusão
+# 1=Esfera, 2=Cubo, 3=Cone, 4=Torus, 5=Teapot, 6=Modo Extrusão, 7=Modelo, 8=Cena
 objeto_selecionado = 1  # Começa com esfera
 modo_extrusao = False
 
 # Estado do Modo Extrusão
 perfil_extrusao = []
+furos_extrusao = []  # Anéis (listas de pontos) recortados do perfil
 altura_extrusao = 2.0
 num_segmentos_extrusao = 20
 extrusao_ativa = False
+extrusao_indexada = True  # Malha com vértices compartilhados (False = 1 normal por face)
+angulo_suavizacao = 30.0  # Graus: faces vizinhas abaixo deste ângulo ficam suaves
 
 # Mostrar comandos na tela
 mostrar_comandos = True
+mostrar_perfil = False  # Tabela de tempos por etapa (perfilador) no HUD
+
+# Geometria própria em buffers na GPU (VBO) ou em modo imediato (glBegin/glEnd)
+usar_vbo = True
+
+# Níveis de detalhe (tecla Q): objetos pequenos na tela usam malhas mais grossas
+usar_lod = True
+
+# Phong por software em ladrilhos, com um pool de processos (tecla B)
+rasterizacao_ladrilhos = False
+
+# Phong por software diferido (tecla G): o scanline preenche um G-buffer
+# (posição, normal, cor base) e a iluminação é uma passada separada, a única
+# refeita quando só a luz se move
+sombreamento_diferido = True
+
+# Diferença máxima aceita entre o sombreamento vetorizado (NumPy) e o
+# cálculo escalar por pixel de phong_shading_point (por canal de cor, em [0, 1]);
+# conferida por `python benchmarks.py --grupos conferencia`
+TOLERANCIA_PHONG_VETORIZADO = 1e-6
 
 
 # ==========================================
@@ -115,11 +159,19 @@ def configurar_iluminacao_renderizacao():
         - Visual suave, mas sem brilho
         
     2 - PHONG SHADING (simulado):
-        - Para objetos padrão: usa GL_SMOOTH + material especular forte
-        - Para CUBO: usa scanline Phong implementado via software
+        - Objetos padrão (1-5) sólidos: scanline Phong implementado via software
+        - Modelo carregado, extrusão e wireframe: GL_SMOOTH + material especular forte
         - Reflexos especulares precisos e realistas
         
-    Nota: O cubo no modo 2 NÃO usa esta função, usa scanline_phong_triangle().
+    3 - PHONG GLSL:
+        - Iluminação por fragmento num shader (ProgramaPhongGLSL), com o
+          mesmo modelo do scanline, para todos os objetos e a extrusão
+        - Sem suporte a shaders, igual ao modo 2 na pipeline fixa
+        
+    Nota: Os objetos padrão sólidos no modo 2 NÃO usam esta função, usam
+          o scanline (scanline_phong_poligono no cubo, uma face por vez, e
+          desenhar_malha_scanline_phong nas malhas, todos os triângulos
+          de uma vez).
     """
     global modelo_iluminacao
     
@@ -135,80 +187,435 @@ def configurar_iluminacao_renderizacao():
         glMaterialfv(GL_FRONT, GL_SPECULAR, [0, 0, 0, 1])  # Sem especular
         glMaterialf(GL_FRONT, GL_SHININESS, 0)
         
-    elif modelo_iluminacao == 2:
+    elif modelo_iluminacao in (2, 3):
         # PHONG - Interpolação suave + reflexo especular forte
         glShadeModel(GL_SMOOTH)
         glMaterialfv(GL_FRONT, GL_SPECULAR, [1, 1, 1, 1])  # Especular máximo
         glMaterialf(GL_FRONT, GL_SHININESS, 60.0)  # Alto brilho
 
 
+# ==========================================
+# MATRIZES NA CPU (MODELVIEW / PROJEÇÃO)
+# ==========================================
+def matriz_translacao(x, y, z):
+    """Matriz 4x4 equivalente a glTranslatef(x, y, z)."""
+    M = np.identity(4)
+    M[:3, 3] = (x, y, z)
+    return M
+
+
+def matriz_rotacao(angulo, x, y, z):
+    """Matriz 4x4 equivalente a glRotatef(angulo, x, y, z) (ângulo em graus)."""
+    eixo = np.array([x, y, z], dtype=np.float64)
+    comprimento = np.linalg.norm(eixo)
+    if comprimento == 0:
+        return np.identity(4)
+    x, y, z = eixo / comprimento
+    c = math.cos(math.radians(angulo))
+    s = math.sin(math.radians(angulo))
+    M = np.identity(4)
+    M[:3, :3] = [
+        [x*x*(1-c) + c,   x*y*(1-c) - z*s, x*z*(1-c) + y*s],
+        [y*x*(1-c) + z*s, y*y*(1-c) + c,   y*z*(1-c) - x*s],
+        [x*z*(1-c) - y*s, y*z*(1-c) + x*s, z*z*(1-c) + c],
+    ]
+    return M
+
+
+def matriz_escala(x, y, z):
+    """Matriz 4x4 equivalente a glScalef(x, y, z)."""
+    return np.diag([x, y, z, 1.0])
+
+
+def matriz_look_at(eye_x, eye_y, eye_z, centro_x, centro_y, centro_z, up_x, up_y, up_z):
+    """Matriz 4x4 equivalente a gluLookAt(eye, centro, up)."""
+    eye = np.array([eye_x, eye_y, eye_z], dtype=np.float64)
+    f = np.array([centro_x, centro_y, centro_z], dtype=np.float64) - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, [up_x, up_y, up_z])
+    s /= np.linalg.norm(s)
+    u = np.cross(s, f)
+    M = np.identity(4)
+    M[0, :3] = s
+    M[1, :3] = u
+    M[2, :3] = -f
+    return M @ matriz_translacao(-eye_x, -eye_y, -eye_z)
+
+
+def matriz_perspectiva(fovy, aspecto, perto, longe):
+    """Matriz 4x4 equivalente a gluPerspective(fovy, aspecto, perto, longe)."""
+    f = 1.0 / math.tan(math.radians(fovy) / 2.0)
+    M = np.zeros((4, 4))
+    M[0, 0] = f / aspecto
+    M[1, 1] = f
+    M[2, 2] = (longe + perto) / (perto - longe)
+    M[2, 3] = 2.0 * longe * perto / (perto - longe)
+    M[3, 2] = -1.0
+    return M
+
+
+def matriz_ortografica(esquerda, direita, baixo, cima, perto, longe):
+    """Matriz 4x4 equivalente a glOrtho(esquerda, direita, baixo, cima, perto, longe)."""
+    M = np.identity(4)
+    M[0, 0] = 2.0 / (direita - esquerda)
+    M[1, 1] = 2.0 / (cima - baixo)
+    M[2, 2] = -2.0 / (longe - perto)
+    M[:3, 3] = (-(direita + esquerda) / (direita - esquerda),
+                -(cima + baixo) / (cima - baixo),
+                -(longe + perto) / (longe - perto))
+    return M
+
+
+_contador_versoes_matriz = [0]
+
+
+class PilhaMatrizes:
+    """
+    Pilha de matrizes 4x4 mantida na CPU, espelhando a pilha do OpenGL.
+
+    Cada operação (transladar, rotacionar, escalar, look_at, perspectiva,
+    ortografica) multiplica o topo pela direita, exatamente como as funções
+    glTranslatef/glRotatef/glScalef/gluLookAt/gluPerspective/glOrtho.
+    Assim a matriz corrente é conhecida sem ler o estado do driver com
+    glGetDoublev. A matriz é enviada ao OpenGL com carregar_no_gl().
+
+    O atributo `versao` muda a cada alteração do topo e serve de chave
+    para o cache da matriz combinada (ver matriz_mvp).
+    """
+
+    def __init__(self):
+        self.pilha = [np.identity(4)]
+        self.versao = 0
+
+    @property
+    def topo(self):
+        return self.pilha[-1]
+
+    def _alterado(self):
+        _contador_versoes_matriz[0] += 1
+        self.versao = _contador_versoes_matriz[0]
+
+    def carregar_identidade(self):
+        self.pilha[-1] = np.identity(4)
+        self._alterado()
+
+    def carregar(self, M):
+        self.pilha[-1] = np.array(M, dtype=np.float64)
+        self._alterado()
+
+    def multiplicar(self, M):
+        self.pilha[-1] = self.pilha[-1] @ M
+        self._alterado()
+
+    def empilhar(self):
+        self.pilha.append(self.pilha[-1].copy())
+
+    def desempilhar(self):
+        self.pilha.pop()
+        self._alterado()
+
+    def transladar(self, x, y, z):
+        self.multiplicar(matriz_translacao(x, y, z))
+
+    def rotacionar(self, angulo, x, y, z):
+        self.multiplicar(matriz_rotacao(angulo, x, y, z))
+
+    def escalar(self, x, y, z):
+        self.multiplicar(matriz_escala(x, y, z))
+
+    def look_at(self, *args):
+        self.multiplicar(matriz_look_at(*args))
+
+    def perspectiva(self, fovy, aspecto, perto, longe):
+        self.multiplicar(matriz_perspectiva(fovy, aspecto, perto, longe))
+
+    def ortografica(self, esquerda, direita, baixo, cima, perto, longe):
+        self.multiplicar(matriz_ortografica(esquerda, direita, baixo, cima, perto, longe))
+
+    def carregar_no_gl(self):
+        """Carrega o topo da pilha na matriz corrente do OpenGL (glLoadMatrixd)."""
+        # O OpenGL espera a matriz em ordem de colunas
+        glLoadMatrixd(np.ascontiguousarray(self.pilha[-1].T))
+
+
+pilha_modelview = PilhaMatrizes()
+pilha_projecao = PilhaMatrizes()
+viewport_atual = (0, 0, 800, 600)  # (x, y, largura, altura), igual a glViewport
+
+# Modelview usada ao desenhar o objeto no último frame (view * transformações
+# do objeto). Usada para mapear cliques do mouse de volta à cena.
+modelview_objeto = np.identity(4)
+
+# View (mundo → câmera) do frame atual, usada pelo Phong GLSL
+view_quadro = np.identity(4)
+
+_cache_mvp = {"chave": None, "mvp": None}
+
+
+def matriz_mvp():
+    """
+    Retorna a matriz combinada projeção * modelview atual.
+
+    O produto é calculado apenas quando uma das pilhas muda; durante o
+    desenho de um objeto ele é reaproveitado por todas as projeções.
+    """
+    chave = (pilha_projecao.versao, pilha_modelview.versao)
+    if _cache_mvp["chave"] != chave:
+        _cache_mvp["mvp"] = pilha_projecao.topo @ pilha_modelview.topo
+        _cache_mvp["chave"] = chave
+    return _cache_mvp["mvp"]
+
+
 # ==========================================
 # PROJEÇÃO 3D → 2D
 # ==========================================
-def project_to_screen(x, y, z):
+def projetar_pontos(pontos, mvp=None, viewport=None):
     """
-    Projeta um ponto 3D para coordenadas de janela 2D (pixels).
-    
-    Usa as matrizes de modelview e projeção atuais do OpenGL para
-    transformar coordenadas 3D do mundo em coordenadas de tela.
-    
+    Projeta vários pontos 3D para coordenadas de janela numa única operação.
+
+    Equivale a chamar gluProject para cada ponto, mas usa as matrizes da
+    CPU (pilha_modelview/pilha_projecao) e uma só multiplicação matricial
+    para o array inteiro.
+
     Args:
-        x, y, z: Coordenadas 3D no espaço do mundo
-        
+        pontos: array (N, 3) de coordenadas 3D
+        mvp: matriz projeção * modelview (padrão: matriz_mvp())
+        viewport: (x, y, largura, altura) (padrão: viewport_atual)
+
     Returns:
-        tuple: (winX, winY, winZ) coordenadas de janela
-               - winX, winY: posição em pixels na tela
-               - winZ: profundidade (para z-buffer)
-               
-    Nota: O eixo Y é invertido para corresponder ao sistema de
-          coordenadas de janela (origem no canto superior esquerdo).
+        np.ndarray: array (N, 3) com (winX, winY, winZ), Y já invertido
+                    (origem no canto superior esquerdo)
     """
-    model = glGetDoublev(GL_MODELVIEW_MATRIX)
-    proj = glGetDoublev(GL_PROJECTION_MATRIX)
-    viewport = glGetIntegerv(GL_VIEWPORT)
+    if mvp is None:
+        mvp = matriz_mvp()
+    if viewport is None:
+        viewport = viewport_atual
+    pontos = np.asarray(pontos, dtype=np.float64).reshape(-1, 3)
 
-    winX, winY, winZ = gluProject(x, y, z, model, proj, viewport)
+    clip = pontos @ mvp[:3, :3].T + mvp[:3, 3]
+    w = pontos @ mvp[3, :3] + mvp[3, 3]
+    ndc = clip / w[:, None]
+
+    janela = np.empty_like(ndc)
+    janela[:, 0] = viewport[0] + viewport[2] * (ndc[:, 0] + 1.0) / 2.0
+    janela[:, 1] = viewport[1] + viewport[3] * (ndc[:, 1] + 1.0) / 2.0
+    janela[:, 2] = (ndc[:, 2] + 1.0) / 2.0
     # Inverte o Y para sistema de janela (Y cresce para baixo)
-    winY = viewport[3] - winY
-    return winX, winY, winZ
+    janela[:, 1] = viewport[3] - janela[:, 1]
+    return janela
+
+
+def desprojetar_pontos(janela, modelview, projecao=None, viewport=None):
+    """
+    Operação inversa de projetar_pontos (equivalente a gluUnProject).
+
+    Args:
+        janela: array (N, 3) com (winX, winY, winZ), Y com origem no topo
+        modelview: matriz modelview usada no desenho
+        projecao: matriz de projeção (padrão: topo de pilha_projecao)
+        viewport: (x, y, largura, altura) (padrão: viewport_atual)
+
+    Returns:
+        np.ndarray: array (N, 3) com as coordenadas no espaço da modelview
+    """
+    if projecao is None:
+        projecao = pilha_projecao.topo
+    if viewport is None:
+        viewport = viewport_atual
+    janela = np.asarray(janela, dtype=np.float64).reshape(-1, 3)
+
+    ndc = np.empty((len(janela), 4))
+    ndc[:, 0] = (janela[:, 0] - viewport[0]) / viewport[2] * 2.0 - 1.0
+    ndc[:, 1] = (viewport[3] - janela[:, 1] - viewport[1]) / viewport[3] * 2.0 - 1.0
+    ndc[:, 2] = janela[:, 2] * 2.0 - 1.0
+    ndc[:, 3] = 1.0
+
+    pontos = ndc @ np.linalg.inv(projecao @ modelview).T
+    return pontos[:, :3] / pontos[:, 3:4]
 
 
 # ==========================================
 # ILUMINAÇÃO PHONG POR PIXEL
 # ==========================================
+class ContextoSombreamento:
+    """
+    Constantes do modelo de Phong para um frame: luz, olho e material.
+
+    Construído uma vez por frame (ver ContextoSombreamento.do_estado_atual)
+    para que o laço interno de sombreamento não precise reler variáveis
+    globais, remontar o vetor do olho nem redeclarar os coeficientes.
+
+    I = Ia·ka + Id·kd·(N·L) + Is·ks·(R·V)^shininess
+
+    Quando shininess é uma potência inteira de 2 (o padrão, 32), (R·V)^n é
+    calculado por quadrados sucessivos (5 multiplicações para n=32) em vez
+    da potência genérica.
+    """
+
+    def __init__(self, luz, olho, ka=0.2, kd=0.7, ks=0.8, shininess=32.0):
+        self.luz = np.array(luz, dtype=np.float64)
+        self.olho = np.array(olho, dtype=np.float64)
+        self.ka = ka
+        self.kd = kd
+        self.ks = ks
+        self.shininess = shininess
+
+        # Número de quadrados sucessivos equivalentes a x ** shininess
+        expoente = int(shininess)
+        if expoente == shininess and expoente > 0 and expoente & (expoente - 1) == 0:
+            self._quadrados = expoente.bit_length() - 1
+        else:
+            self._quadrados = None
+
+    @classmethod
+    def do_estado_atual(cls):
+        """Cria o contexto a partir da luz e da câmera atuais."""
+        global luz_x, luz_y, luz_z, modo_camera
+        global camera_x, camera_y, camera_z
+
+        # Olho na câmera em primeira pessoa ou na câmera fixa
+        if modo_camera:
+            olho = (camera_x, camera_y, camera_z)
+        else:
+            olho = (0.0, 0.0, 10.0)
+        return cls((luz_x, luz_y, luz_z), olho)
+
+    def no_espaco(self, modelo):
+        """
+        O mesmo contexto com a luz e o olho levados ao espaço local de uma
+        matriz modelo (local → mundo).
+
+        Para rotações, translações e escala uniforme (as transformações do
+        objeto), iluminar pontos e normais locais com ele dá a mesma cor
+        que iluminar os pontos e normais no mundo com self: os vetores L, V
+        e N giram juntos e os produtos escalares não mudam.
+        """
+        inversa = np.linalg.inv(modelo)
+        return ContextoSombreamento(inversa[:3, :3] @ self.luz + inversa[:3, 3],
+                                    inversa[:3, :3] @ self.olho + inversa[:3, 3],
+                                    self.ka, self.kd, self.ks, self.shininess)
+
+    def _potencia_especular(self, x):
+        if self._quadrados is None:
+            return x ** self.shininess
+        for _ in range(self._quadrados):
+            x = x * x
+        return x
+
+    def shade(self, positions, normals, base_color, especular=True):
+        """
+        Ilumina N pontos de uma vez.
+
+        Args:
+            positions: array (N, 3) com as posições 3D dos pontos
+            normals: array (N, 3) com as normais (não precisam estar normalizadas)
+            base_color: (r, g, b) cor base do material
+            especular: False omite o termo especular (como Flat/Gouraud)
+
+        Returns:
+            np.ndarray: array (N, 3) com as cores iluminadas
+        """
+        P = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        N = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+
+        # Vetor L (luz)
+        L = _normalizar_linhas(self.luz - P)
+
+        # Normal N (degeneradas apontam para +Z)
+        N, nao_nulo = _normalizar_linhas(N, retornar_mascara=True)
+        N[~nao_nulo] = (0.0, 0.0, 1.0)
+
+        # Vetor para a câmera V
+        V = _normalizar_linhas(self.olho - P)
+
+        # Ambiente + Difuso
+        NdotL = np.maximum(0.0, N[:, 0]*L[:, 0] + N[:, 1]*L[:, 1] + N[:, 2]*L[:, 2])
+        I = self.ka + self.kd * NdotL
+
+        # Especular (apenas onde a face recebe luz)
+        if especular and self.ks != 0:
+            R = 2*NdotL[:, None]*N - L
+            RdotV = np.maximum(0.0, R[:, 0]*V[:, 0] + R[:, 1]*V[:, 1] + R[:, 2]*V[:, 2])
+            I += np.where(NdotL > 0, self.ks * self._potencia_especular(RdotV), 0.0)
+
+        I = np.clip(I, 0.0, 1.0)
+
+        return I[:, None] * np.asarray(base_color, dtype=np.float64)
+
+
+def _normalizar_linhas(vetores, retornar_mascara=False):
+    """Normaliza cada linha de um array (N, 3); linhas nulas ficam inalteradas."""
+    comprimento = np.sqrt(vetores[:, 0]**2 + vetores[:, 1]**2 + vetores[:, 2]**2)
+    nao_nulo = comprimento != 0
+    vetores = vetores.copy()
+    vetores[nao_nulo] /= comprimento[nao_nulo, None]
+    if retornar_mascara:
+        return vetores, nao_nulo
+    return vetores
+
+
+# Contexto de sombreamento do frame atual (recriado no início de display())
+contexto_quadro = ContextoSombreamento((luz_x, luz_y, luz_z), (0.0, 0.0, 10.0))
+
+# O mesmo contexto no espaço do objeto (ContextoSombreamento.no_espaco),
+# refeito em display() depois das transformações do objeto. O scanline
+# ilumina as posições e normais do objeto com ele, o que equivale a
+# iluminar no mundo, como o Phong GLSL e o RenderizadorSoftware
+contexto_objeto = contexto_quadro
+
+
+# Contexto de phong_shading_point, refeito só quando a luz ou o olho mudam
+_cache_contexto_ponto = {"estado": None, "contexto": None}
+
+
 def phong_shading_point(position, normal, base_color):
     """
     Calcula a iluminação Phong para um único ponto/pixel.
-    
+
     Implementa o modelo de iluminação de Phong completo:
     I = Ia·ka + Id·kd·(N·L) + Is·ks·(R·V)^shininess
-    
+
     Componentes:
     - Ambiente (Ia): Luz de fundo constante
     - Difusa (Id): Reflexão difusa proporcional ao ângulo da luz (Lambert)
     - Especular (Is): Reflexo brilhante dependente do ângulo de visão
-    
+
     Args:
         position: [x, y, z] posição 3D do ponto no espaço do mundo
         normal: [nx, ny, nz] vetor normal (interpolado) no ponto
         base_color: (r, g, b) cor base do material
-        
+
     Returns:
         tuple: (r, g, b) cor final iluminada do ponto
-        
-    Nota: Esta função é chamada para CADA PIXEL no algoritmo scanline,
-          tornando-a computacionalmente cara mas visualmente precisa.
+
+    Nota: Mantida por compatibilidade; o scanline usa
+          ContextoSombreamento.shade, que ilumina muitos pontos de uma vez.
+          Para um ponto só, o cálculo escalar (phong_referencia_escalar) é
+          ~15x mais rápido que shade com arrays de um elemento.
     """
     global luz_x, luz_y, luz_z, modo_camera
     global camera_x, camera_y, camera_z
 
-    # Vetor L (luz)
-    L = [luz_x - position[0], luz_y - position[1], luz_z - position[2]]
+    estado = (luz_x, luz_y, luz_z, modo_camera and (camera_x, camera_y, camera_z))
+    if _cache_contexto_ponto["estado"] != estado:
+        _cache_contexto_ponto.update(estado=estado, contexto=ContextoSombreamento.do_estado_atual())
+    r, g, b = phong_referencia_escalar(position, normal, base_color, _cache_contexto_ponto["contexto"])
+    return (float(r), float(g), float(b))
+
+
+def phong_referencia_escalar(position, normal, base_color, contexto):
+    """
+    Cálculo Phong ponto a ponto em Python puro (listas e math.sqrt).
+
+    É a formulação original por pixel: ilumina um ponto só em
+    phong_shading_point e é a referência para verificar
+    ContextoSombreamento.shade (ver comparar_phong_vetorizado).
+    """
+    L = [contexto.luz[i] - position[i] for i in range(3)]
     L_len = math.sqrt(L[0]**2 + L[1]**2 + L[2]**2)
     if L_len != 0:
         L = [L[0]/L_len, L[1]/L_len, L[2]/L_len]
 
-    # Normal N
     N = list(normal)
     N_len = math.sqrt(N[0]**2 + N[1]**2 + N[2]**2)
     if N_len != 0:
@@ -216,48 +623,317 @@ def phong_shading_point(position, normal, base_color):
     else:
         N = [0.0, 0.0, 1.0]
 
-    # Vetor para a câmera V
-    if modo_camera:
-        eye = [camera_x, camera_y, camera_z]
-    else:
-        eye = [0.0, 0.0, 10.0]
-
-    V = [eye[0] - position[0], eye[1] - position[1], eye[2] - position[2]]
+    V = [contexto.olho[i] - position[i] for i in range(3)]
     V_len = math.sqrt(V[0]**2 + V[1]**2 + V[2]**2)
     if V_len != 0:
         V = [V[0]/V_len, V[1]/V_len, V[2]/V_len]
 
-    # Coeficientes Phong
-    ka = 0.2
-    kd = 0.7
-    ks = 0.8
-    shininess = 32.0
-
-    # Ambiente
-    I = ka
-
-    # Difuso
+    I = contexto.ka
     NdotL = max(0.0, N[0]*L[0] + N[1]*L[1] + N[2]*L[2])
-    I += kd * NdotL
-
-    # Especular
+    I += contexto.kd * NdotL
     if NdotL > 0:
-        R = [
-            2*NdotL*N[0] - L[0],
-            2*NdotL*N[1] - L[1],
-            2*NdotL*N[2] - L[2]
-        ]
+        R = [2*NdotL*N[i] - L[i] for i in range(3)]
         RdotV = max(0.0, R[0]*V[0] + R[1]*V[1] + R[2]*V[2])
-        I += ks * (RdotV ** shininess)
+        I += contexto.ks * (RdotV ** contexto.shininess)
 
     I = min(1.0, max(0.0, I))
-
     return (I*base_color[0], I*base_color[1], I*base_color[2])
 
 
+def comparar_phong_vetorizado(posicoes, normais, base_color, contexto=None):
+    """
+    Compara ContextoSombreamento.shade com o cálculo escalar ponto a ponto.
+
+    Returns:
+        float: maior diferença absoluta entre os dois cálculos (deve ficar
+               abaixo de TOLERANCIA_PHONG_VETORIZADO)
+    """
+    if contexto is None:
+        contexto = ContextoSombreamento.do_estado_atual()
+    vetorizado = contexto.shade(posicoes, normais, base_color)
+    referencia = np.array([phong_referencia_escalar(P, N, base_color, contexto)
+                           for P, N in zip(np.asarray(posicoes).tolist(),
+                                           np.asarray(normais).tolist())])
+    if len(referencia) == 0:
+        return 0.0
+    return float(np.max(np.abs(vetorizado - referencia)))
+
+
+# ==========================================
+# SCANLINE PHONG EM POLÍGONOS
+# ==========================================
+def pixels_poligono_scanline(S, P, N, limites=None):
+    """
+    Gera os pixels de um polígono pelo algoritmo scanline com tabela de
+    arestas, para polígonos convexos ou côncavos com qualquer número de
+    vértices (uma face inteira do cubo numa única passada).
+
+    - Tabela de arestas (ET): cada aresta não horizontal, orientada de
+      cima para baixo, guarda x, P e N no topo e seus incrementos por
+      linha (dx/dy, dP/dy, dN/dy), calculados uma única vez
+    - Tabela de arestas ativas (AET): as arestas que cruzam a linha atual,
+      ordenadas por x; pares consecutivos (regra par-ímpar) delimitam os
+      spans. A AET só muda nas linhas em que uma aresta começa ou termina,
+      então cada faixa entre essas linhas é tratada de uma vez com NumPy:
+      x, P e N avançam pelos incrementos por linha a partir da entrada da
+      aresta na AET, sem recalcular intersecções
+    - Em cada span, P e N avançam pelo incremento por pixel (dP/dx, dN/dx)
+
+    A amostragem é no centro dos pixels: o pixel (x, y) é gerado quando
+    yTopo <= y + 0.5 < yBase nas arestas e xEsquerda <= x + 0.5 < xDireita
+    no span, e P e N são os do centro. Polígonos vizinhos (faces do cubo,
+    os dois triângulos de um quad) não se sobrepõem nem deixam frestas, e
+    cada P projeta no centro do seu pixel.
+
+    Args:
+        S: array (k, 3) com (winX, winY, winZ) de cada vértice, ou (k, 4)
+           com 1/w: nesse caso P e N são interpolados com correção de
+           perspectiva (P/w, N/w e 1/w variam linearmente na tela, P e N
+           não), e cada P projeta exatamente no seu pixel
+        P: array (k, 3) com os vértices no espaço 3D
+        N: array (k, 3) com as normais dos vértices
+        limites: (x0, y0, x1, y1) em pixels de janela (Y a partir do topo,
+                 fim exclusivo); pixels fora dele não são gerados, e os
+                 gerados são os mesmos (com os mesmos P e N) que sem limites
+
+    Returns:
+        tuple: (posicoes, normais, x, y): P e N interpolados em cada pixel
+               (N ainda não normalizada) e arrays (N,) de inteiros (em
+               float64) com a coluna e a linha de cada pixel
+    """
+    S = np.asarray(S, dtype=np.float64)
+    P = np.asarray(P, dtype=np.float64).reshape(-1, 3)
+    N = np.asarray(N, dtype=np.float64).reshape(-1, 3)
+    vazio = (np.empty((0, 3)), np.empty((0, 3)), np.empty(0), np.empty(0))
+    if len(S) < 3:
+        return vazio
+
+    perspectiva = S.shape[1] > 3
+    if perspectiva:
+        q = S[:, 3:4]
+        atributos = np.hstack((P * q, N * q, q))
+    else:
+        atributos = np.hstack((P, N))
+
+    # Tabela de arestas: topo e base de cada aresta, sem as horizontais
+    inicio = np.arange(len(S))
+    fim = np.roll(inicio, -1)
+    desce = S[inicio, 1] <= S[fim, 1]
+    topo = np.where(desce, inicio, fim)
+    base = np.where(desce, fim, inicio)
+    y_topo, y_base = S[topo, 1], S[base, 1]
+    nao_horizontal = y_base > y_topo
+    topo, base = topo[nao_horizontal], base[nao_horizontal]
+    y_topo, y_base = y_topo[nao_horizontal], y_base[nao_horizontal]
+    if len(topo) < 2:
+        return vazio
+
+    altura = y_base - y_topo
+    x_topo = S[topo, 0]
+    dx = (S[base, 0] - x_topo) / altura
+    A_topo = atributos[topo]
+    dA = (atributos[base] - A_topo) / altura[:, None]
+    primeira_linha = np.ceil(y_topo - 0.5).astype(np.int64)
+    linha_final = np.ceil(y_base - 0.5).astype(np.int64)  # exclusiva
+
+    y_inicio, y_fim = int(primeira_linha.min()), int(linha_final.max())
+    if limites is not None:
+        y_inicio, y_fim = max(y_inicio, limites[1]), min(y_fim, limites[3])
+    if y_inicio >= y_fim:
+        return vazio
+
+    # Linhas em que a AET muda (uma aresta entra ou sai)
+    eventos = np.unique(np.concatenate((primeira_linha, linha_final, (y_inicio, y_fim))))
+    eventos = eventos[(eventos >= y_inicio) & (eventos <= y_fim)]
+
+    spans = []
+    for r0, r1 in zip(eventos[:-1].tolist(), eventos[1:].tolist()):
+        ativas = (primeira_linha <= r0) & (linha_final > r0)
+        if np.count_nonzero(ativas) < 2:
+            continue
+        # Entrada na AET (valores no centro da linha r0) + k incrementos por linha
+        entrada = r0 + 0.5 - y_topo[ativas]
+        x0 = x_topo[ativas] + dx[ativas] * entrada
+        A0 = A_topo[ativas] + dA[ativas] * entrada[:, None]
+        k = np.arange(r1 - r0, dtype=np.float64)[:, None]
+        X = x0 + k * dx[ativas]
+        A = A0 + k[:, :, None] * dA[ativas]
+
+        # AET ordenada por x em cada linha; pares (0,1), (2,3)... são spans
+        ordem = np.argsort(X, axis=1, kind="stable")
+        X = np.take_along_axis(X, ordem, axis=1)
+        A = np.take_along_axis(A, ordem[:, :, None], axis=1)
+        pares = X.shape[1] // 2 * 2
+        spans.append((np.repeat(np.arange(r0, r1, dtype=np.float64), pares // 2),
+                      X[:, 0:pares:2].ravel(), X[:, 1:pares:2].ravel(),
+                      A[:, 0:pares:2].reshape(-1, A.shape[2]),
+                      A[:, 1:pares:2].reshape(-1, A.shape[2])))
+    if not spans:
+        return vazio
+    ys, xL, xR, AL, AR = (np.concatenate(partes) for partes in zip(*spans))
+
+    # Expande cada span [xL, xR) em pixels
+    x_inicio = np.ceil(xL - 0.5)
+    x_fim = np.ceil(xR - 0.5) - 1
+    if limites is not None:
+        x_inicio = np.maximum(x_inicio, limites[0])
+        x_fim = np.minimum(x_fim, limites[2] - 1)
+    contagens = np.maximum(x_fim - x_inicio + 1, 0).astype(np.int64)
+    span = np.repeat(np.arange(len(xL)), contagens)
+    inicio_span = np.cumsum(contagens) - contagens
+    x = x_inicio[span] + (np.arange(len(span)) - inicio_span[span])
+
+    # Incremento por pixel de cada span, aplicado a partir da borda esquerda
+    largura = xR - xL
+    dA_dx = (AR - AL) / np.where(largura > 0, largura, 1.0)[:, None]
+    A = AL[span] + (x + 0.5 - xL[span])[:, None] * dA_dx[span]
+    if perspectiva:
+        q = A[:, 6:7]
+        return A[:, 0:3] / q, A[:, 3:6] / q, x, ys[span]
+    return A[:, 0:3], A[:, 3:6], x, ys[span]
+
+
 # ==========================================
-# SCANLINE PHONG EM TRIÂNGULO
+# DESCARTE E RECORTE (CAMINHO POR SOFTWARE)
 # ==========================================
+# Polígonos do caminho por software no frame atual:
+# - traseiros: de costas para a câmera (back-face culling)
+# - fora: inteiramente fora do volume de visão (rejeição trivial)
+# - recortados: cortados pelo plano próximo
+descartes_software = {"traseiros": 0, "fora": 0, "recortados": 0}
+
+
+def recortar_plano_proximo(P, N, distancias):
+    """
+    Recorta um polígono contra o plano próximo (Sutherland-Hodgman).
+
+    Args:
+        P, N: arrays (k, 3) com posições e normais dos vértices, em ordem
+        distancias: distância com sinal de cada vértice ao plano (z + w em
+                    coordenadas de recorte; >= 0 é o lado visível)
+
+    Returns:
+        tuple: (P, N) do polígono recortado, com P e N interpolados nos
+               pontos onde as arestas cruzam o plano (a transformação é
+               afim, então interpolar no espaço do objeto é exato)
+    """
+    novos_P, novos_N = [], []
+    for i in range(len(P)):
+        j = (i + 1) % len(P)
+        if distancias[i] >= 0:
+            novos_P.append(P[i])
+            novos_N.append(N[i])
+        if (distancias[i] >= 0) != (distancias[j] >= 0):
+            t = distancias[i] / (distancias[i] - distancias[j])
+            novos_P.append(P[i] + t * (P[j] - P[i]))
+            novos_N.append(N[i] + t * (N[j] - N[i]))
+    return np.array(novos_P).reshape(-1, 3), np.array(novos_N).reshape(-1, 3)
+
+
+def preparar_poligono_software(vertices, normais, mvp=None, viewport=None):
+    """
+    Etapa de geometria do caminho por software, antes do scanline.
+
+    1. Rejeição trivial: se todos os vértices estão do lado de fora de um
+       mesmo plano do volume de visão (em coordenadas de recorte, antes da
+       divisão por w), nenhum pixel do polígono aparece
+    2. Recorte no plano próximo (z = -w): vértices atrás da câmera não têm
+       projeção válida
+    3. Projeção e descarte de faces traseiras: a frente é anti-horária na
+       janela (como glFrontFace(GL_CCW)); com o Y da janela invertido, a
+       área com sinal das faces da frente é negativa
+
+    Args:
+        vertices: array (k, 3) com os vértices do polígono (plano) no
+                  espaço do objeto, em ordem
+        normais: array (k, 3) com as normais dos vértices
+        mvp: matriz projeção * modelview (padrão: matriz_mvp())
+        viewport: (x, y, largura, altura) (padrão: viewport_atual)
+
+    Returns:
+        tuple | None: (S, P, N) do polígono visível, com S (k, 4) =
+                      (winX, winY, winZ, 1/w) em coordenadas de janela
+                      (como projetar_pontos, mais 1/w); None se descartado
+    """
+    if mvp is None:
+        mvp = matriz_mvp()
+    P = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    N = np.asarray(normais, dtype=np.float64).reshape(-1, 3)
+    clip = P @ mvp[:3, :3].T + mvp[:3, 3]
+    w = P @ mvp[3, :3] + mvp[3, 3]
+
+    # 1. Todos fora de x = ±w, y = ±w ou z = ±w
+    if (clip < -w[:, None]).all(axis=0).any() or (clip > w[:, None]).all(axis=0).any():
+        descartes_software["fora"] += 1
+        return None
+
+    # 2. Plano próximo
+    distancias = clip[:, 2] + w
+    if (distancias < 0).any():
+        descartes_software["recortados"] += 1
+        P, N = recortar_plano_proximo(P, N, distancias)
+        if len(P) < 3:
+            return None
+
+    # 3. Faces traseiras (área com sinal do polígono na janela)
+    S = projetar_pontos(P, mvp, viewport)
+    x, y = S[:, 0], S[:, 1]
+    if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) >= 0:
+        descartes_software["traseiros"] += 1
+        return None
+
+    # 1/w de cada vértice, para a interpolação com correção de perspectiva
+    w = P @ mvp[3, :3] + mvp[3, 3]
+    return np.column_stack((S, 1.0 / w)), P, N
+
+
+def limites_viewport(viewport=None):
+    """Retângulo do viewport em coordenadas de janela do scanline (Y do topo)."""
+    if viewport is None:
+        viewport = viewport_atual
+    x, y, largura, altura = (int(v) for v in viewport)
+    return (x, -y, x + largura, altura - y)
+
+
+def scanline_phong_poligono(vertices, normais, base_color):
+    """
+    Renderiza um polígono plano (convexo ou côncavo) com Phong por scanline.
+
+    Descarta/recorta o polígono (preparar_poligono_software), gera seus
+    pixels dentro do viewport (pixels_poligono_scanline) e os ilumina numa
+    única chamada vetorizada (contexto_objeto.shade).
+
+    Args:
+        vertices: lista de k vértices [x, y, z] no espaço 3D, em ordem
+        normais: lista de k normais [nx, ny, nz]
+        base_color: Cor base do material (r, g, b)
+    """
+    poligono = preparar_poligono_software(vertices, normais)
+    if poligono is None:
+        return
+
+    if rasterizacao_ladrilhos:
+        # Rasterizado no fim do frame, em paralelo (RasterizadorLadrilhos)
+        rasterizador_ladrilhos.adicionar(*poligono, base_color)
+        return
+
+    P, N, _, _ = pixels_poligono_scanline(*poligono, limites=limites_viewport())
+    if len(P) == 0:
+        return
+
+    if sombreamento_diferido:
+        # G-buffer: todos os pixels do frame são iluminados juntos em
+        # submeter_pontos_software()
+        buffer_software.adicionar(P, normais=N, base_color=base_color)
+        return
+
+    cores = contexto_objeto.shade(P, N, base_color)
+
+    # Os pixels vão para o buffer do frame; o desenho é feito de uma vez
+    # em submeter_pontos_software()
+    buffer_software.adicionar(P, cores)
+
+
 def scanline_phong_triangle(p1, n1, p2, n2, p3, n3, base_color):
     """
     Renderiza um triângulo usando o algoritmo Scanline com Phong Shading.
@@ -267,177 +943,3074 @@ def scanline_phong_triangle(p1, n1, p2, n2, p3, n3, base_color):
     sobre o processo de iluminação por pixel.
     
     ALGORITMO:
+    0. Descarte e recorte (preparar_poligono_software): faces traseiras e
+       triângulos fora da tela são descartados, e o plano próximo recorta
+       os que passam por trás da câmera
     1. Projeção: Converte vértices 3D (p1, p2, p3) para coordenadas de tela
-    2. Ordenação: Ordena vértices por coordenada Y (de cima para baixo)
+    2. Tabela de arestas: cada aresta guarda x, P e N no topo e seus
+       incrementos por linha
     3. Varredura Y (Scanline):
-       - Para cada linha y do triângulo:
-         a) Calcula intersecções com as 3 arestas
-         b) Interpola posições 3D (P) e normais (N) nas intersecções
+       - Para cada linha y, a tabela de arestas ativas (ordenada por x)
+         dá as intersecções, avançadas incrementalmente de linha em linha
+         com P e N já interpolados
     4. Varredura X (dentro de cada scanline):
        - Para cada pixel x entre as intersecções:
          a) Interpola P e N horizontalmente
          b) Calcula iluminação Phong para P e N interpolados
          c) Desenha o pixel com a cor calculada
     
+    O triângulo é o caso k = 3 de scanline_phong_poligono: os passos 2 a 4
+    são feitos para o polígono inteiro de uma vez (pixels_poligono_scanline)
+    e a iluminação de todos os pixels é calculada numa única chamada
+    vetorizada (contexto_objeto.shade). Os spans são limitados ao viewport:
+    o custo acompanha os pixels visíveis, não a área projetada.
+    
     Args:
         p1, p2, p3: Vértices do triângulo [x, y, z] no espaço 3D
         n1, n2, n3: Normais dos vértices [nx, ny, nz]
         base_color: Cor base do material (r, g, b)
         
-    Complexidade: O(pixels_do_triângulo) - cada pixel é processado individualmente
+    Complexidade: O(pixels visíveis do triângulo) - cada pixel é processado individualmente
     
     Resultado: Iluminação Phong precisa com reflexos especulares suaves e realistas.
     """
-    s1 = project_to_screen(*p1)
-    s2 = project_to_screen(*p2)
-    s3 = project_to_screen(*p3)
+    scanline_phong_poligono((p1, p2, p3), (n1, n2, n3), base_color)
 
-    verts = sorted(
-        [(s1, p1, n1), (s2, p2, n2), (s3, p3, n3)],
-        key=lambda v: v[0][1]
-    )
 
-    (x1, y1, _), P1, N1 = verts[0]
-    (x2, y2, _), P2, N2 = verts[1]
-    (x3, y3, _), P3, N3 = verts[2]
+# ==========================================
+# SCANLINE PHONG EM MALHAS (EM LOTE)
+# ==========================================
+# Pixels candidatos (retângulos envolventes) testados por vez em
+# pixels_triangulos_scanline: limita a memória dos arrays temporários
+CANDIDATOS_POR_LOTE = 1 << 20
 
-    y_min = int(math.floor(y1))
-    y_max = int(math.ceil(y3))
 
-    def edge_intersection(sA, PA, NA, sB, PB, NB, y):
-        xA, yA, _ = sA
-        xB, yB, _ = sB
-        if yA == yB:
-            return None
-        if (y < min(yA, yB)) or (y >= max(yA, yB)):
-            return None
-        t = (y - yA) / (yB - yA)
-        x = xA + t * (xB - xA)
-        P = [PA[i] + t*(PB[i]-PA[i]) for i in range(3)]
-        N = [NA[i] + t*(NB[i]-NA[i]) for i in range(3)]
-        return x, P, N
+def preparar_triangulos_software(vertices, normais, mvp=None, viewport=None):
+    """
+    preparar_poligono_software para todos os triângulos de uma malha de uma vez.
 
-    # Desliga iluminação fixa (vamos colorir "na mão")
-    glDisable(GL_LIGHTING)
+    A rejeição trivial, a projeção e o descarte de faces traseiras são
+    feitos com arrays (T, 3, ...), sem laço por triângulo. Os triângulos
+    que cruzam o plano próximo (raros) não são recortados aqui: seus
+    índices são devolvidos para o recorte um a um.
+
+    Args:
+        vertices: array (T, 3, 3) com os vértices de cada triângulo
+        normais: array (T, 3, 3) com as normais dos vértices
+        mvp: matriz projeção * modelview (padrão: matriz_mvp())
+        viewport: (x, y, largura, altura) (padrão: viewport_atual)
 
-    for y in range(y_min, y_max + 1):
-        intersecoes = []
+    Returns:
+        tuple: (S, P, N, recortar): S (T', 3, 4) = (winX, winY, winZ, 1/w),
+               P e N (T', 3, 3) dos triângulos visíveis, e os índices dos
+               triângulos que precisam de recorte no plano próximo
+    """
+    if mvp is None:
+        mvp = matriz_mvp()
+    P = np.asarray(vertices, dtype=np.float64).reshape(-1, 3, 3)
+    N = np.asarray(normais, dtype=np.float64).reshape(-1, 3, 3)
+    clip = P @ mvp[:3, :3].T + mvp[:3, 3]
+    w = P @ mvp[3, :3] + mvp[3, 3]
 
-        e = edge_intersection(verts[0][0], P1, N1, verts[1][0], P2, N2, y)
-        if e is not None:
-            intersecoes.append(e)
+    # 1. Todos os vértices fora de um mesmo plano do volume de visão
+    fora = ((clip < -w[..., None]).all(axis=1) | (clip > w[..., None]).all(axis=1)).any(axis=1)
+    descartes_software["fora"] += int(np.count_nonzero(fora))
 
-        e = edge_intersection(verts[1][0], P2, N2, verts[2][0], P3, N3, y)
-        if e is not None:
-            intersecoes.append(e)
+    # 2. Cruzam o plano próximo: ficam para preparar_poligono_software
+    proximo = ~fora & (clip[..., 2] + w < 0).any(axis=1)
+    recortar = np.flatnonzero(proximo)
+    inteiros = ~(fora | proximo)
+    P, N, w = P[inteiros], N[inteiros], w[inteiros]
 
-        e = edge_intersection(verts[2][0], P3, N3, verts[0][0], P1, N1, y)
-        if e is not None:
-            intersecoes.append(e)
+    # 3. Projeção e faces traseiras (área com sinal >= 0 na janela)
+    S = projetar_pontos(P.reshape(-1, 3), mvp, viewport).reshape(-1, 3, 3)
+    x, y = S[..., 0], S[..., 1]
+    area = (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1)
+    frente = area < 0
+    descartes_software["traseiros"] += int(np.count_nonzero(~frente))
 
-        if len(intersecoes) < 2:
-            continue
+    S = np.concatenate((S, 1.0 / w[..., None]), axis=2)
+    return S[frente], P[frente], N[frente], recortar
 
-        intersecoes.sort(key=lambda x: x[0])
-        xL, PL, NL = intersecoes[0]
-        xR, PR, NR = intersecoes[1]
 
-        if xL == xR:
-            continue
+def pixels_triangulos_scanline(S, P, N, limites=None):
+    """
+    Gera os pixels de vários triângulos de uma vez, com a mesma amostragem
+    de pixels_poligono_scanline (centro dos pixels, correção de perspectiva).
 
-        x_start = int(math.floor(xL))
-        x_end = int(math.ceil(xR))
+    Em vez de uma tabela de arestas por triângulo, os centros dos pixels
+    dos retângulos envolventes de todos os triângulos são testados juntos
+    contra as três funções de aresta de cada um. Os empates (centro sobre
+    uma aresta) seguem a regra do scanline: o pixel entra pelas arestas da
+    esquerda e pelas horizontais de cima, e não pelas da direita nem pelas
+    de baixo. Cada aresta é avaliada sempre no mesmo sentido (do vértice
+    menor para o maior), então dois triângulos vizinhos dão valores
+    exatamente opostos nela: não se sobrepõem nem deixam frestas. As
+    próprias funções de aresta são as coordenadas baricêntricas que
+    interpolam P/w, N/w e 1/w.
 
-        glBegin(GL_POINTS)
-        for x in range(x_start, x_end + 1):
-            t = (x - xL) / (xR - xL + 1e-9)
+    Args:
+        S: array (T, 3, 4) com (winX, winY, winZ, 1/w) de triângulos da
+           frente (área com sinal negativa na janela), como os devolvidos
+           por preparar_triangulos_software
+        P: array (T, 3, 3) com os vértices no espaço 3D
+        N: array (T, 3, 3) com as normais dos vértices
+        limites: (x0, y0, x1, y1) como em pixels_poligono_scanline
 
-            P = [PL[i] + t*(PR[i]-PL[i]) for i in range(3)]
-            N = [NL[i] + t*(NR[i]-NL[i]) for i in range(3)]
+    Returns:
+        tuple: (posicoes, normais, x, y) como pixels_poligono_scanline,
+               com os pixels de cada triângulo em sequência
+    """
+    S = np.asarray(S, dtype=np.float64).reshape(-1, 3, 4)
+    P = np.asarray(P, dtype=np.float64).reshape(-1, 3, 3)
+    N = np.asarray(N, dtype=np.float64).reshape(-1, 3, 3)
+    vazio = (np.empty((0, 3)), np.empty((0, 3)), np.empty(0), np.empty(0))
+    if len(S) == 0:
+        return vazio
 
-            # Normaliza N
-            L = math.sqrt(N[0]*N[0] + N[1]*N[1] + N[2]*N[2])
-            if L != 0:
-                N = [N[0]/L, N[1]/L, N[2]/L]
-            else:
-                N = [0.0, 0.0, 1.0]
+    # Retângulo envolvente em pixels (fim exclusivo), cortado pelos limites
+    X, Y = S[..., 0], S[..., 1]
+    x0, x1 = np.ceil(X.min(axis=1) - 0.5), np.ceil(X.max(axis=1) - 0.5)
+    y0, y1 = np.ceil(Y.min(axis=1) - 0.5), np.ceil(Y.max(axis=1) - 0.5)
+    if limites is not None:
+        x0, x1 = np.maximum(x0, limites[0]), np.minimum(x1, limites[2])
+        y0, y1 = np.maximum(y0, limites[1]), np.minimum(y1, limites[3])
+    largura = np.maximum(x1 - x0, 0).astype(np.int64)
+    areas = largura * np.maximum(y1 - y0, 0).astype(np.int64)
 
-            cor = phong_shading_point(P, N, base_color)
-            glColor3f(*cor)
-            glVertex3f(P[0], P[1], P[2])
-        glEnd()
+    # Aresta k vai do vértice k ao k+1; a origem é o menor dos dois
+    # (x, depois y) e o sinal desfaz a troca: F = sinal * (d x (c - o)) é
+    # positiva dentro dos triângulos da frente
+    i, j = np.arange(3), (np.arange(3) + 1) % 3
+    A, B = S[:, i, :2], S[:, j, :2]
+    troca = (A[..., 0] > B[..., 0]) | ((A[..., 0] == B[..., 0]) & (A[..., 1] > B[..., 1]))
+    origem = np.where(troca[..., None], B, A)
+    direcao = np.where(troca[..., None], A, B) - origem
+    sinal = np.where(troca, 1.0, -1.0)
+    # Gradiente de F: (dy, -dx) no sentido original da aresta
+    gx, gy = B[..., 1] - A[..., 1], A[..., 0] - B[..., 0]
+    empate = (gx > 0) | ((gx == 0) & (gy > 0))
 
-    glEnable(GL_LIGHTING)
+    # A função da aresta k é o peso do vértice oposto a ela; multiplicada
+    # por 1/w, dá a interpolação com correção de perspectiva
+    q = S[..., 3]
+    atributos = np.concatenate((P, N), axis=2)
+    oposto = np.array([1, 2, 0])
+
+    partes = []
+    acumulado = np.cumsum(areas)
+    inicio = 0
+    while inicio < len(S):
+        fim = int(np.searchsorted(acumulado, acumulado[inicio] - areas[inicio] + CANDIDATOS_POR_LOTE,
+                                  side="right"))
+        fim = max(fim, inicio + 1)
+        lote = np.arange(inicio, fim)
+        inicio = fim
+        contagens = areas[lote]
+        if contagens.sum() == 0:
+            continue
+
+        # Centros dos pixels candidatos de cada triângulo do lote
+        t = np.repeat(lote, contagens)
+        k = np.arange(len(t)) - np.repeat(np.cumsum(contagens) - contagens, contagens)
+        x = x0[t] + k % largura[t]
+        y = y0[t] + k // largura[t]
+        cx, cy = x[:, None] + 0.5, y[:, None] + 0.5
+
+        F = sinal[t] * (direcao[t, :, 0] * (cy - origem[t, :, 1])
+                        - direcao[t, :, 1] * (cx - origem[t, :, 0]))
+        dentro = ((F > 0) | ((F == 0) & empate[t])).all(axis=1)
+        t, x, y, F = t[dentro], x[dentro], y[dentro], F[dentro]
+
+        pesos = F[:, oposto] * q[t]
+        A_pixel = np.einsum("ck,ckd->cd", pesos, atributos[t]) / pesos.sum(axis=1)[:, None]
+        partes.append((A_pixel[:, 0:3], A_pixel[:, 3:6], x, y))
+    if not partes:
+        return vazio
+    return tuple(np.concatenate(parte) for parte in zip(*partes))
 
 
 # ==========================================
-# CUBO COM SCANLINE PHONG
+# SUBMISSÃO DOS PIXELS DO SCANLINE (1 DRAW CALL)
 # ==========================================
-def desenhar_cubo_scanline_phong():
-    """Cubo de lado 2 ([-1,1]) desenhado com Phong por scanline."""
-    base_color = (0.0, 0.5, 1.0)
+class BufferPontosSoftware:
+    """
+    Buffers contíguos (float32) com os pixels gerados pelo scanline no frame.
 
-    def face(p0, p1, p2, p3, N):
-        scanline_phong_triangle(p0, N, p1, N, p2, N, base_color)
-        scanline_phong_triangle(p0, N, p2, N, p3, N, base_color)
+    Cada triângulo rasterizado escreve suas posições e cores no fim dos
+    arrays; ao final do frame tudo é enviado ao OpenGL com um único
+    glDrawArrays(GL_POINTS), em vez de um glColor3f + glVertex3f por pixel.
+    A capacidade dobra quando necessário e é reaproveitada entre frames.
 
-    # Frente (z=1)
-    N = [0.0, 0.0, 1.0]
-    face([-1.0,-1.0, 1.0],
-         [ 1.0,-1.0, 1.0],
-         [ 1.0, 1.0, 1.0],
-         [-1.0, 1.0, 1.0], N)
+    No sombreamento diferido os polígonos guardam normais e cores base em
+    vez de cores (o G-buffer do caminho por pontos), e sombrear() ilumina
+    todos os pixels de uma vez; os arrays continuam válidos depois de
+    limpar(), então a iluminação pode ser refeita sem rasterizar.
+    """
 
-    # Trás (z=-1)
-    N = [0.0, 0.0,-1.0]
-    face([ 1.0,-1.0,-1.0],
-         [-1.0,-1.0,-1.0],
-         [-1.0, 1.0,-1.0],
-         [ 1.0, 1.0,-1.0], N)
+    CAMPOS = ("posicoes", "cores", "normais", "bases")
 
-    # Direita (x=1)
-    N = [1.0, 0.0, 0.0]
-    face([ 1.0,-1.0, 1.0],
-         [ 1.0,-1.0,-1.0],
-         [ 1.0, 1.0,-1.0],
-         [ 1.0, 1.0, 1.0], N)
+    def __init__(self, capacidade=65536):
+        for nome in self.CAMPOS:
+            setattr(self, nome, np.empty((capacidade, 3), dtype=np.float32))
+        self.total = 0
+        self.poligonos = 0
 
-    # Esquerda (x=-1)
-    N = [-1.0, 0.0, 0.0]
-    face([-1.0,-1.0,-1.0],
-         [-1.0,-1.0, 1.0],
-         [-1.0, 1.0, 1.0],
-         [-1.0, 1.0,-1.0], N)
+    def limpar(self):
+        self.total = 0
+        self.poligonos = 0
 
-    # Topo (y=1)
-    N = [0.0, 1.0, 0.0]
-    face([-1.0, 1.0, 1.0],
-         [ 1.0, 1.0, 1.0],
-         [ 1.0, 1.0,-1.0],
-         [-1.0, 1.0,-1.0], N)
+    def adicionar(self, posicoes, cores=None, normais=None, base_color=None, poligonos=1):
+        """
+        Acrescenta os pixels de um polígono (ou de uma malha inteira, com o
+        número de polígonos em poligonos): com cores, ou com normais e cor base.
+        """
+        n = len(posicoes)
+        fim = self.total + n
+        if fim > len(self.posicoes):
+            capacidade = max(fim, 2 * len(self.posicoes))
+            for nome in self.CAMPOS:
+                antigo = getattr(self, nome)
+                novo = np.empty((capacidade, 3), dtype=np.float32)
+                novo[:self.total] = antigo[:self.total]
+                setattr(self, nome, novo)
+        self.posicoes[self.total:fim] = posicoes
+        if cores is not None:
+            self.cores[self.total:fim] = cores
+        else:
+            self.normais[self.total:fim] = normais
+            self.bases[self.total:fim] = base_color
+        self.total = fim
+        self.poligonos += poligonos
 
-    # Base (y=-1)
-    N = [0.0,-1.0, 0.0]
-    face([-1.0,-1.0,-1.0],
-         [ 1.0,-1.0,-1.0],
-         [ 1.0,-1.0, 1.0],
-         [-1.0,-1.0, 1.0], N)
+    def sombrear(self, contexto, n=None):
+        """Ilumina os n primeiros pixels a partir do G-buffer (padrão: total)."""
+        n = self.total if n is None else n
+        self.cores[:n] = contexto.shade(self.posicoes[:n], self.normais[:n], self.bases[:n])
 
 
-# ==========================================
-# AUXILIARES PARA EXTRUSÃO
-# ==========================================
-def calcular_normal_face(p1, p2, p3):
+buffer_software = BufferPontosSoftware()
+
+# Contadores do último frame do caminho por software (mostrados no HUD):
+# - pixels: pixels gerados pelo scanline
+# - chamadas_gl: chamadas PyOpenGL feitas para desenhá-los
+# - chamadas_imediato: quantas seriam no modo imediato (glBegin/glColor3f/
+#   glVertex3f/glEnd), para comparar a economia
+# - descartados: polígonos descartados antes do scanline (faces traseiras
+#   e fora da tela)
+# - cache: "redesenhar" se o frame redesenhou o resultado anterior,
+#   "resombrear" se só iluminou de novo o G-buffer, None se rasterizou
+#   (CacheQuadroSoftware)
+estatisticas_software = {"pixels": 0, "chamadas_gl": 0, "chamadas_imediato": 0, "descartados": 0,
+                         "cache": None}
+
+# VBOs de streaming (posições, cores) dos pixels do scanline
+_vbos_pontos_software = [None, None]
+
+
+def submeter_pontos_software():
     """
-    Calcula o vetor normal de uma face triangular.
-    
-    Usa o produto vetorial (cross product) de dois vetores da face:
-    N = (p2 - p1) × (p3 - p1)
-    
-    O vetor normal é perpendicular à superfície e aponta "para fora" da face.
-    Essencial para cálculos de iluminação (determina quanto de luz atinge a face).
-    
-    Args:
+    Desenha todos os pixels acumulados no frame com um único draw call.
+
+    Com usar_vbo, os buffers contíguos de buffer_software são enviados a
+    VBOs de streaming (GL_STREAM_DRAW); sem VBO, usa vertex arrays do lado
+    do cliente (glVertexPointer/glColorPointer) apontando para os arrays.
+    Deve ser chamada com a mesma modelview usada no scanline (as posições
+    estão no espaço do objeto). Atualiza estatisticas_software e limpa o
+    buffer.
+
+    Com rasterizacao_ladrilhos, os triângulos guardados são rasterizados
+    em paralelo e o framebuffer resultante é enviado de uma vez
+    (RasterizadorLadrilhos.blit).
+
+    Se o frame reaproveitou o resultado anterior (CacheQuadroSoftware),
+    nada é rasterizado: os pixels que já estão nos VBOs (ou no framebuffer
+    dos ladrilhos) são desenhados de novo. Se só a luz mudou (sombreamento
+    diferido), o G-buffer é iluminado de novo e só as cores são reenviadas.
+    """
+    pendente = cache_quadro_software.pendente
+    if pendente:
+        cache_quadro_software.pendente = None
+        estatisticas_software.update(cache_quadro_software.estatisticas)
+        estatisticas_software["cache"] = pendente
+        n = cache_quadro_software.estatisticas["pixels"]
+        if rasterizacao_ladrilhos:
+            if pendente == "resombrear":
+                rasterizador_ladrilhos.sombrear(contexto_objeto)
+            estatisticas_software["chamadas_gl"] = rasterizador_ladrilhos.blit()
+        else:
+            if pendente == "resombrear":
+                buffer_software.sombrear(contexto_objeto, n)
+            estatisticas_software["chamadas_gl"] = _desenhar_pontos_software(
+                n, enviar_posicoes=False, enviar_cores=pendente == "resombrear")
+        return
+
+    estatisticas_software["descartados"] = descartes_software["traseiros"] + descartes_software["fora"]
+    estatisticas_software["cache"] = None
+    for nome in descartes_software:
+        descartes_software[nome] = 0
+
+    if rasterizacao_ladrilhos:
+        poligonos = len(rasterizador_ladrilhos.poligonos)
+        n = rasterizador_ladrilhos.renderizar(contexto_objeto, matriz_mvp(), viewport_atual,
+                                              sombreamento_diferido)
+        estatisticas_software["pixels"] = n
+        estatisticas_software["chamadas_gl"] = rasterizador_ladrilhos.blit() if n else 0
+        estatisticas_software["chamadas_imediato"] = 2 * poligonos + 2 * n + 2 if n else 0
+    else:
+        n = buffer_software.total
+        if sombreamento_diferido and n:
+            buffer_software.sombrear(contexto_objeto)
+        estatisticas_software["pixels"] = n
+        estatisticas_software["chamadas_gl"] = _desenhar_pontos_software(n) if n else 0
+        # Modo imediato: glBegin/glEnd por polígono + glColor3f/glVertex3f por pixel
+        estatisticas_software["chamadas_imediato"] = 2 * buffer_software.poligonos + 2 * n + 2 if n else 0
+    buffer_software.limpar()
+    cache_quadro_software.guardar(estatisticas_software)
+
+
+def _desenhar_pontos_software(n, enviar_posicoes=True, enviar_cores=True):
+    """
+    Desenha os n primeiros pixels de buffer_software como GL_POINTS.
+
+    Args:
+        enviar_posicoes, enviar_cores: False redesenha o que já está no
+                                       VBO correspondente, sem glBufferData
+
+    Returns:
+        int: chamadas OpenGL feitas
+    """
+    glDisable(GL_LIGHTING)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    if usar_vbo and vbo_disponivel():
+        if _vbos_pontos_software[0] is None:
+            _vbos_pontos_software[:] = glGenBuffers(2)
+        vbo_posicoes, vbo_cores = _vbos_pontos_software
+        glBindBuffer(GL_ARRAY_BUFFER, vbo_posicoes)
+        if enviar_posicoes:
+            glBufferData(GL_ARRAY_BUFFER, buffer_software.posicoes[:n], GL_STREAM_DRAW)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo_cores)
+        if enviar_cores:
+            glBufferData(GL_ARRAY_BUFFER, buffer_software.cores[:n], GL_STREAM_DRAW)
+        glColorPointer(3, GL_FLOAT, 0, None)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        chamadas = 13 + enviar_posicoes + enviar_cores
+    else:
+        glVertexPointer(3, GL_FLOAT, 0, buffer_software.posicoes[:n])
+        glColorPointer(3, GL_FLOAT, 0, buffer_software.cores[:n])
+        chamadas = 9
+    glDrawArrays(GL_POINTS, 0, n)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glEnable(GL_LIGHTING)
+    return chamadas
+
+
+# ==========================================
+# CACHE DO QUADRO POR SOFTWARE
+# ==========================================
+class CacheQuadroSoftware:
+    """
+    Reaproveita o resultado do caminho por software entre frames.
+
+    A chave tem duas partes (ver chave_quadro_software):
+    - geometria: quando muda, o scanline roda de novo
+    - luz: quando só ela muda e o frame guardado é diferido, o G-buffer
+      continua válido e apenas a passada de iluminação é refeita
+
+    Quando nada mudou, o frame não rasteriza nem ilumina nada: os pixels
+    do frame anterior continuam nos VBOs de streaming (ou no framebuffer
+    dos ladrilhos) e são apenas desenhados de novo. Redesenhos sem mudança
+    na cena (HUD, movimento do mouse no modo objeto, [R]...) custam um
+    draw call em vez do scanline inteiro.
+
+    Os pixels são redesenhados, e não copiados como imagem, porque passam
+    pelo teste de profundidade junto com o resto da cena (indicador da luz).
+    """
+
+    def __init__(self):
+        self.ativo = True
+        self.chave = None
+        self.candidata = None
+        self.pendente = None  # None, "redesenhar" ou "resombrear"
+        self.estatisticas = None
+        self.acertos = 0
+        self.resombreamentos = 0
+        self.reconstrucoes = 0
+
+    def invalidar(self):
+        self.chave = None
+
+    def reaproveitar(self, chave):
+        """
+        True se o resultado guardado vale para a chave (geometria, luz,
+        diferido); nesse caso o chamador não rasteriza nada e
+        submeter_pontos_software() redesenha (ou ilumina de novo) o frame
+        anterior. Senão, a chave fica à espera de guardar().
+        """
+        if self.ativo and self.chave is not None and chave[0] == self.chave[0]:
+            if chave[1] == self.chave[1]:
+                self.acertos += 1
+                self.pendente = "redesenhar"
+                return True
+            if chave[2]:
+                self.resombreamentos += 1
+                self.pendente = "resombrear"
+                self.chave = chave
+                return True
+        self.candidata = chave
+        return False
+
+    def guardar(self, estatisticas):
+        """Associa o frame que acabou de ser desenhado à chave candidata."""
+        self.chave = self.candidata if self.ativo else None
+        self.candidata = None
+        if self.chave is not None:
+            self.reconstrucoes += 1
+            self.estatisticas = dict(estatisticas)
+
+
+cache_quadro_software = CacheQuadroSoftware()
+
+
+def chave_quadro_software():
+    """
+    Tudo que afeta a imagem do caminho por software no frame atual.
+
+    Returns:
+        tuple: (geometria, luz, diferido). A geometria tem a MVP (câmera,
+               projeção e transformações do objeto) e o que escolhe o que
+               é desenhado e onde os pixels ficam guardados (VBO, vertex
+               arrays, ladrilhos, G-buffer); a luz tem a luz, o olho e o
+               material do contexto do frame
+    """
+    global modelo_iluminacao, objeto_selecionado, usar_vbo, usar_lod, limiares_lod
+
+    contexto = contexto_objeto
+    geometria = (matriz_mvp().tobytes(), tuple(viewport_atual), modelo_iluminacao,
+                 objeto_selecionado, rasterizacao_ladrilhos, sombreamento_diferido,
+                 usar_vbo and vbo_disponivel(), usar_lod, tuple(limiares_lod),
+                 estatisticas_lod["nivel"])
+    luz = (contexto.luz.tobytes(), contexto.olho.tobytes(),
+           contexto.ka, contexto.kd, contexto.ks, contexto.shininess)
+    return geometria, luz, sombreamento_diferido
+
+
+# ==========================================
+# RASTERIZAÇÃO EM LADRILHOS (MULTIPROCESSO)
+# ==========================================
+TAMANHO_LADRILHO = 64  # pixels de lado de cada ladrilho da tela
+
+
+def rasterizar_ladrilho(ladrilho, poligonos, contexto, mvp, viewport, cor, profundidade,
+                        gbuffer=None):
+    """
+    Rasteriza e ilumina (Phong) os polígonos de um ladrilho da tela.
+
+    Os polígonos são processados na ordem em que foram desenhados e cada
+    pixel passa por um teste de profundidade (GL_LESS) contra o buffer,
+    então o resultado não depende de qual processo rasteriza o ladrilho:
+    cada ladrilho só escreve nos próprios pixels.
+
+    Com gbuffer (sombreamento diferido), nada é iluminado aqui: P, N e a
+    cor base dos pixels visíveis vão para o G-buffer, e sombrear_ladrilho
+    ilumina depois só o que sobrou do teste de profundidade.
+
+    Args:
+        ladrilho: (x0, y0, x1, y1) em pixels de janela (Y a partir do topo)
+        poligonos: lista de (S, P, N, base_color), como em
+                   preparar_poligono_software
+        contexto: ContextoSombreamento do frame
+        mvp, viewport: usados para a profundidade de cada pixel
+        cor: array (altura, largura, 4) uint8, linha 0 na base da janela
+             (a ordem de glDrawPixels)
+        profundidade: array (altura, largura) float32 em [0, 1]
+        gbuffer: array (3, altura, largura, 3) float32 com posições,
+                 normais e cores base, ou None para iluminar na hora
+
+    Returns:
+        int: número de fragmentos gerados no ladrilho
+    """
+    altura = cor.shape[0]
+    fragmentos = 0
+    for S, P, N, base_color in poligonos:
+        P, N, x, y = pixels_poligono_scanline(S, P, N, limites=ladrilho)
+        if len(P) == 0:
+            continue
+        fragmentos += len(P)
+
+        linhas = altura - 1 - y.astype(np.intp)
+        colunas = x.astype(np.intp)
+        z = projetar_pontos(P, mvp, viewport)[:, 2].astype(np.float32)
+
+        # Teste de profundidade antes do sombreamento: só ilumina o que aparece
+        visiveis = z < profundidade[linhas, colunas]
+        if not visiveis.any():
+            continue
+        linhas, colunas = linhas[visiveis], colunas[visiveis]
+        profundidade[linhas, colunas] = z[visiveis]
+        if gbuffer is not None:
+            gbuffer[0, linhas, colunas] = P[visiveis]
+            gbuffer[1, linhas, colunas] = N[visiveis]
+            gbuffer[2, linhas, colunas] = base_color
+            continue
+        cores = contexto.shade(P[visiveis], N[visiveis], base_color)
+        cor[linhas, colunas, :3] = np.round(cores * 255.0)
+        cor[linhas, colunas, 3] = 255
+    return fragmentos
+
+
+def sombrear_ladrilho(ladrilho, contexto, cor, profundidade, gbuffer):
+    """
+    Passada de iluminação do sombreamento diferido sobre um ladrilho.
+
+    Ilumina, numa única chamada vetorizada, todos os pixels do ladrilho
+    cobertos no G-buffer (profundidade < 1). Basta refazê-la quando só a
+    luz muda: o G-buffer continua válido.
+
+    Returns:
+        int: número de pixels iluminados
+    """
+    x0, y0, x1, y1 = ladrilho
+    altura = cor.shape[0]
+    linhas = slice(altura - y1, altura - y0)
+    colunas = slice(x0, x1)
+    cobertos = profundidade[linhas, colunas] < 1.0
+    if not cobertos.any():
+        return 0
+    posicoes, normais, bases = (g[linhas, colunas][cobertos] for g in gbuffer)
+    cores = contexto.shade(posicoes, normais, bases)
+    bloco = cor[linhas, colunas]
+    bloco[cobertos, :3] = np.round(cores * 255.0)
+    bloco[cobertos, 3] = 255
+    return len(cores)
+
+
+# Framebuffer compartilhado visto de dentro de cada processo do pool
+_framebuffer_trabalhador = {}
+
+
+def _iniciar_trabalhador(cor_compartilhada, profundidade_compartilhada, gbuffer_compartilhado,
+                         largura, altura):
+    _framebuffer_trabalhador["cor"] = np.frombuffer(
+        cor_compartilhada, dtype=np.uint8).reshape(altura, largura, 4)
+    _framebuffer_trabalhador["profundidade"] = np.frombuffer(
+        profundidade_compartilhada, dtype=np.float32).reshape(altura, largura)
+    _framebuffer_trabalhador["gbuffer"] = np.frombuffer(
+        gbuffer_compartilhado, dtype=np.float32).reshape(3, altura, largura, 3)
+
+
+def _rasterizar_ladrilho_trabalhador(tarefa):
+    ladrilho, poligonos, contexto, mvp, viewport, diferido = tarefa
+    return rasterizar_ladrilho(ladrilho, poligonos, contexto, mvp, viewport,
+                               _framebuffer_trabalhador["cor"],
+                               _framebuffer_trabalhador["profundidade"],
+                               _framebuffer_trabalhador["gbuffer"] if diferido else None)
+
+
+def _sombrear_ladrilho_trabalhador(tarefa):
+    ladrilho, contexto = tarefa
+    return sombrear_ladrilho(ladrilho, contexto, _framebuffer_trabalhador["cor"],
+                             _framebuffer_trabalhador["profundidade"],
+                             _framebuffer_trabalhador["gbuffer"])
+
+
+class RasterizadorLadrilhos:
+    """
+    Caminho por software em ladrilhos, com um pool de processos.
+
+    Em vez de acumular pixels em buffer_software, scanline_phong_poligono
+    entrega os polígonos já projetados (adicionar). No fim do frame
+    (renderizar) eles são distribuídos nos ladrilhos da tela que seus
+    retângulos envolventes tocam, e cada ladrilho é rasterizado e
+    iluminado por um processo do pool direto num framebuffer de cor e
+    profundidade em memória compartilhada (multiprocessing RawArray). O
+    processo principal envia o framebuffer ao OpenGL de uma vez (blit).
+
+    Com processos=1 os ladrilhos são rasterizados no próprio processo,
+    pelo mesmo código; o framebuffer resultante é idêntico, byte a byte,
+    ao de qualquer número de processos.
+
+    No sombreamento diferido, a rasterização preenche um G-buffer (também
+    compartilhado) e uma segunda passada ilumina cada ladrilho ocupado;
+    sombrear() refaz só essa passada quando apenas a luz mudou.
+    """
+
+    def __init__(self, processos=None, tamanho_ladrilho=TAMANHO_LADRILHO):
+        self.processos = processos or os.cpu_count() or 1
+        self.tamanho_ladrilho = tamanho_ladrilho
+        self.poligonos = []
+        self.largura = self.altura = 0
+        self.cor = None
+        self.profundidade = None
+        self.gbuffer = None
+        self.ladrilhos_ocupados = []
+        self._memoria = None
+        self._pool = None
+        self._estencil = None
+
+    def _preparar(self, largura, altura):
+        """(Re)aloca o framebuffer compartilhado quando o tamanho muda."""
+        if (largura, altura) == (self.largura, self.altura):
+            return
+        self.fechar()  # o pool recebe a memória na criação
+        cor = RawArray(ctypes.c_uint8, largura * altura * 4)
+        profundidade = RawArray(ctypes.c_float, largura * altura)
+        gbuffer = RawArray(ctypes.c_float, 3 * altura * largura * 3)
+        self._memoria = (cor, profundidade, gbuffer)
+        self.cor = np.frombuffer(cor, dtype=np.uint8).reshape(altura, largura, 4)
+        self.profundidade = np.frombuffer(profundidade, dtype=np.float32).reshape(altura, largura)
+        self.gbuffer = np.frombuffer(gbuffer, dtype=np.float32).reshape(3, altura, largura, 3)
+        self.ladrilhos_ocupados = []
+        self.largura, self.altura = largura, altura
+
+    def _obter_pool(self):
+        if self.processos <= 1:
+            return None
+        if self._pool is None:
+            # fork: os processos herdam o módulo já carregado (também quando
+            # ele é importado por outro nome, como em benchmarks.py)
+            metodos = multiprocessing.get_all_start_methods()
+            contexto_mp = multiprocessing.get_context("fork" if "fork" in metodos else None)
+            self._pool = contexto_mp.Pool(self.processos, initializer=_iniciar_trabalhador,
+                                          initargs=(*self._memoria, self.largura, self.altura))
+        return self._pool
+
+    def fechar(self):
+        """Encerra o pool de processos (recriado quando necessário)."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def definir_processos(self, processos):
+        self.fechar()
+        self.processos = processos or os.cpu_count() or 1
+
+    def adicionar(self, S, P, N, base_color):
+        """Guarda um polígono (já projetado) para o próximo renderizar()."""
+        self.poligonos.append((S, P, N, tuple(base_color)))
+
+    def distribuir(self, largura, altura):
+        """
+        Distribui os polígonos nos ladrilhos que seus retângulos envolventes
+        tocam. Polígonos inteiramente fora da tela são descartados.
+
+        Returns:
+            list: [(ladrilho, poligonos)] só para ladrilhos não vazios, em
+                  ordem de linha; cada lista mantém a ordem de desenho
+        """
+        t = self.tamanho_ladrilho
+        colunas = (largura + t - 1) // t
+        ladrilhos = {}
+        for poligono in self.poligonos:
+            S = poligono[0]
+            x0, x1 = max(math.floor(S[:, 0].min()), 0), min(math.ceil(S[:, 0].max()), largura - 1)
+            y0, y1 = max(math.floor(S[:, 1].min()), 0), min(math.ceil(S[:, 1].max()), altura - 1)
+            if x0 > x1 or y0 > y1:
+                continue
+            for ly in range(y0 // t, y1 // t + 1):
+                for lx in range(x0 // t, x1 // t + 1):
+                    ladrilhos.setdefault(ly * colunas + lx, []).append(poligono)
+
+        resultado = []
+        for indice in sorted(ladrilhos):
+            ly, lx = divmod(indice, colunas)
+            ladrilho = (lx * t, ly * t, min((lx + 1) * t, largura), min((ly + 1) * t, altura))
+            resultado.append((ladrilho, ladrilhos[indice]))
+        return resultado
+
+    def renderizar(self, contexto, mvp, viewport, diferido=False):
+        """
+        Rasteriza os polígonos adicionados no framebuffer compartilhado.
+
+        Args:
+            diferido: True preenche o G-buffer e ilumina numa segunda passada
+
+        Returns:
+            int: número de fragmentos gerados
+        """
+        if not self.poligonos:
+            return 0
+        largura, altura = int(viewport[2]), int(viewport[3])
+        self._preparar(largura, altura)
+        self.cor[:] = 0
+        self.profundidade[:] = 1.0
+
+        tarefas = [(ladrilho, poligonos, contexto, mvp, viewport, diferido)
+                   for ladrilho, poligonos in self.distribuir(largura, altura)]
+        self.poligonos = []
+        self.ladrilhos_ocupados = [tarefa[0] for tarefa in tarefas]
+        if not tarefas:
+            return 0
+        pool = self._obter_pool()
+        if pool is None:
+            fragmentos = sum(rasterizar_ladrilho(*tarefa[:5], self.cor, self.profundidade,
+                                                 self.gbuffer if diferido else None)
+                             for tarefa in tarefas)
+        else:
+            fragmentos = sum(pool.map(_rasterizar_ladrilho_trabalhador, tarefas, chunksize=1))
+        if diferido:
+            self.sombrear(contexto)
+        return fragmentos
+
+    def sombrear(self, contexto):
+        """
+        Passada de iluminação sobre o G-buffer do último renderizar(...,
+        diferido=True), ladrilho a ladrilho (no pool, se houver).
+
+        Returns:
+            int: número de pixels iluminados
+        """
+        tarefas = [(ladrilho, contexto) for ladrilho in self.ladrilhos_ocupados]
+        if not tarefas:
+            return 0
+        pool = self._obter_pool()
+        if pool is None:
+            return sum(sombrear_ladrilho(ladrilho, contexto, self.cor, self.profundidade,
+                                         self.gbuffer) for ladrilho, contexto in tarefas)
+        return sum(pool.map(_sombrear_ladrilho_trabalhador, tarefas, chunksize=1))
+
+    def blit(self):
+        """
+        Envia o framebuffer à janela, respeitando a profundidade da cena.
+
+        1ª passada: só profundidade (glDrawPixels GL_DEPTH_COMPONENT com
+        teste GL_LESS), marcando no estêncil os pixels onde o software venceu.
+        2ª passada: a cor, apenas nesses pixels. Sem buffer de estêncil, a
+        cor é desenhada onde houve fragmento (teste de alfa).
+
+        Returns:
+            int: chamadas OpenGL feitas
+        """
+        if self._estencil is None:
+            self._estencil = glGetIntegerv(GL_STENCIL_BITS) > 0
+
+        glWindowPos2i(0, 0)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glColorMask(GL_FALSE, GL_FALSE, GL_FALSE, GL_FALSE)
+        if self._estencil:
+            glEnable(GL_STENCIL_TEST)
+            glClear(GL_STENCIL_BUFFER_BIT)
+            glStencilFunc(GL_ALWAYS, 1, 0xFF)
+            glStencilOp(GL_KEEP, GL_KEEP, GL_REPLACE)
+        glDrawPixels(self.largura, self.altura, GL_DEPTH_COMPONENT, GL_FLOAT, self.profundidade)
+        glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE)
+
+        glDisable(GL_DEPTH_TEST)
+        if self._estencil:
+            glStencilFunc(GL_EQUAL, 1, 0xFF)
+            glStencilOp(GL_KEEP, GL_KEEP, GL_KEEP)
+        else:
+            glEnable(GL_ALPHA_TEST)
+            glAlphaFunc(GL_GREATER, 0.0)
+        glDrawPixels(self.largura, self.altura, GL_RGBA, GL_UNSIGNED_BYTE, self.cor)
+        if self._estencil:
+            glDisable(GL_STENCIL_TEST)
+        else:
+            glDisable(GL_ALPHA_TEST)
+        glEnable(GL_DEPTH_TEST)
+        return 13 if self._estencil else 11
+
+
+rasterizador_ladrilhos = RasterizadorLadrilhos()
+atexit.register(rasterizador_ladrilhos.fechar)
+
+
+# ==========================================
+# OBJETOS COM SCANLINE PHONG
+# ==========================================
+# Faces do cubo de lado 2 ([-1,1]): 4 vértices (anti-horário) + normal
+FACES_CUBO = [
+    # Frente (z=1)
+    ([[-1.0,-1.0, 1.0], [ 1.0,-1.0, 1.0], [ 1.0, 1.0, 1.0], [-1.0, 1.0, 1.0]], [0.0, 0.0, 1.0]),
+    # Trás (z=-1)
+    ([[ 1.0,-1.0,-1.0], [-1.0,-1.0,-1.0], [-1.0, 1.0,-1.0], [ 1.0, 1.0,-1.0]], [0.0, 0.0,-1.0]),
+    # Direita (x=1)
+    ([[ 1.0,-1.0, 1.0], [ 1.0,-1.0,-1.0], [ 1.0, 1.0,-1.0], [ 1.0, 1.0, 1.0]], [1.0, 0.0, 0.0]),
+    # Esquerda (x=-1)
+    ([[-1.0,-1.0,-1.0], [-1.0,-1.0, 1.0], [-1.0, 1.0, 1.0], [-1.0, 1.0,-1.0]], [-1.0, 0.0, 0.0]),
+    # Topo (y=1)
+    ([[-1.0, 1.0, 1.0], [ 1.0, 1.0, 1.0], [ 1.0, 1.0,-1.0], [-1.0, 1.0,-1.0]], [0.0, 1.0, 0.0]),
+    # Base (y=-1)
+    ([[-1.0,-1.0,-1.0], [ 1.0,-1.0,-1.0], [ 1.0,-1.0, 1.0], [-1.0,-1.0, 1.0]], [0.0,-1.0, 0.0]),
+]
+
+
+def desenhar_malha_scanline_phong(malha, base_color):
+    """
+    Desenha todos os triângulos de uma Malha com Phong por scanline.
+
+    A malha inteira passa de uma vez pelo descarte
+    (preparar_triangulos_software), pela rasterização
+    (pixels_triangulos_scanline) e pela iluminação: o custo em Python é
+    por malha, não por triângulo. Só os triângulos que cruzam o plano
+    próximo são recortados e rasterizados um a um.
+    """
+    vertices, normais = malha.triangulos()
+    S, P, N, recortar = preparar_triangulos_software(vertices, normais)
+    for i in recortar.tolist():
+        scanline_phong_poligono(vertices[i], normais[i], base_color)
+
+    if rasterizacao_ladrilhos:
+        for S_i, P_i, N_i in zip(S, P, N):
+            rasterizador_ladrilhos.adicionar(S_i, P_i, N_i, base_color)
+        return
+
+    triangulos = len(S)
+    P, N, _, _ = pixels_triangulos_scanline(S, P, N, limites=limites_viewport())
+    if len(P) == 0:
+        return
+    if sombreamento_diferido:
+        buffer_software.adicionar(P, normais=N, base_color=base_color, poligonos=triangulos)
+        return
+    buffer_software.adicionar(P, contexto_objeto.shade(P, N, base_color), poligonos=triangulos)
+
+
+def desenhar_cubo_scanline_phong():
+    """Cubo de lado 2 ([-1,1]) desenhado com Phong por scanline."""
+    base_color = (0.0, 0.5, 1.0)
+
+    # Cada face é um quad inteiro: uma passada de scanline, sem a diagonal
+    # compartilhada por 2 triângulos
+    for vertices, normal in FACES_CUBO:
+        scanline_phong_poligono(vertices, [normal] * 4, base_color)
+
+
+# ==========================================
+# MALHAS (ARRAYS DE VÉRTICES)
+# ==========================================
+_contador_versoes_malha = [0]
+
+
+class Malha:
+    """
+    Malha de triângulos guardada em arrays NumPy.
+
+    Atributos:
+        vertices: array (V, 3) com as posições
+        normais: array (V, 3) com a normal de cada vértice
+        indices: array (3T,) uint32, 3 índices por triângulo
+        segmentos: array (S, 2, 3) com as arestas do wireframe
+        versao: identificador único, muda a cada malha construída (permite
+                a quem guarda cópias da geometria saber quando atualizar)
+    """
+
+    def __init__(self, vertices, normais, indices, segmentos=None):
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.normais = np.ascontiguousarray(normais, dtype=np.float64).reshape(-1, 3)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32).ravel()
+        if segmentos is None:
+            segmentos = np.empty((0, 2, 3))
+        self.segmentos = np.ascontiguousarray(segmentos, dtype=np.float64).reshape(-1, 2, 3)
+        _contador_versoes_malha[0] += 1
+        self.versao = _contador_versoes_malha[0]
+
+    @classmethod
+    def de_triangulos(cls, vertices, normais, segmentos=None):
+        """
+        Cria uma malha sem vértices compartilhados a partir de triângulos soltos.
+
+        Args:
+            vertices: array (T, 3, 3)
+            normais: array (T, 3) (uma por face) ou (T, 3, 3) (uma por vértice)
+        """
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3, 3)
+        normais = np.asarray(normais, dtype=np.float64)
+        if normais.ndim == 2:
+            normais = np.repeat(normais[:, None], 3, axis=1)
+        return cls(vertices.reshape(-1, 3), normais.reshape(-1, 3),
+                   np.arange(3 * len(vertices)), segmentos)
+
+    @property
+    def num_triangulos(self):
+        return len(self.indices) // 3
+
+    def triangulos(self):
+        """Retorna (vertices (T, 3, 3), normais (T, 3, 3)) por triângulo."""
+        return (self.vertices[self.indices].reshape(-1, 3, 3),
+                self.normais[self.indices].reshape(-1, 3, 3))
+
+
+# ==========================================
+# MALHAS PROCEDURAIS (ESFERA, CUBO, CONE, TORUS, TEAPOT)
+# ==========================================
+def grade_esfera(raio, fatias, pilhas):
+    """
+    Pontos de uma esfera UV com polos no eixo Z (como glutSolidSphere).
+
+    Returns:
+        np.ndarray: array (pilhas + 1, fatias + 1, 3) com os pontos da grade
+    """
+    theta = np.linspace(0.0, 2.0 * math.pi, fatias + 1)
+    phi = np.linspace(0.0, math.pi, pilhas + 1)
+    grade = np.empty((pilhas + 1, fatias + 1, 3))
+    grade[:, :, 0] = np.sin(phi)[:, None] * np.cos(theta)
+    grade[:, :, 1] = np.sin(phi)[:, None] * np.sin(theta)
+    grade[:, :, 2] = np.cos(phi)[:, None]
+    return grade * raio
+
+
+def segmentos_grade(grade):
+    """Arestas das linhas e colunas de uma grade (linhas, colunas, 3)."""
+    horizontais = np.stack([grade[:, :-1], grade[:, 1:]], axis=2).reshape(-1, 2, 3)
+    verticais = np.stack([grade[:-1], grade[1:]], axis=2).reshape(-1, 2, 3)
+    return np.concatenate([horizontais, verticais])
+
+
+def indices_grade(linhas, colunas, inicio=0):
+    """
+    Índices (2 triângulos por quad) de uma grade de vértices linhas x colunas.
+
+    O quad (i, j) vira (i,j)-(i+1,j)-(i+1,j+1) e (i,j)-(i+1,j+1)-(i,j+1):
+    anti-horário visto de fora quando as linhas avançam "para baixo" e as
+    colunas "para a direita" na superfície.
+    """
+    i, j = np.meshgrid(np.arange(linhas - 1), np.arange(colunas - 1), indexing="ij")
+    a = (inicio + i * colunas + j).ravel()
+    b = a + colunas
+    c = b + 1
+    d = a + 1
+    return np.stack([a, b, c, a, c, d], axis=1).reshape(-1, 2, 3).transpose(1, 0, 2).ravel()
+
+
+def malha_de_grades(grades, segmentos=None):
+    """
+    Junta grades (pontos (L, C, 3), normais (L, C, 3)) em uma única Malha.
+
+    Os vértices de cada grade são compartilhados entre os quads vizinhos.
+    Sem segmentos explícitos, o wireframe são as linhas e colunas das grades.
+    """
+    vertices, normais, indices = [], [], []
+    inicio = 0
+    for pontos, normais_grade in grades:
+        linhas, colunas = pontos.shape[:2]
+        vertices.append(pontos.reshape(-1, 3))
+        normais.append(normais_grade.reshape(-1, 3))
+        indices.append(indices_grade(linhas, colunas, inicio))
+        inicio += linhas * colunas
+    if segmentos is None:
+        segmentos = np.concatenate([segmentos_grade(pontos) for pontos, _ in grades])
+    return Malha(np.concatenate(vertices), np.concatenate(normais),
+                 np.concatenate(indices), segmentos)
+
+
+def gerar_malha_esfera(raio=1.0, fatias=20, pilhas=20):
+    """Esfera UV de centro na origem e polos no eixo Z (como glutSolidSphere)."""
+    unitaria = grade_esfera(1.0, fatias, pilhas)
+    return malha_de_grades([(unitaria * raio, unitaria)])
+
+
+def gerar_malha_cubo(tamanho=2.0):
+    """Cubo centrado na origem (como glutSolidCube), 4 vértices e 2 triângulos por face."""
+    vertices = np.array([quad for quad, _ in FACES_CUBO]) * (tamanho / 2.0)
+    normais = np.repeat(np.array([N for _, N in FACES_CUBO])[:, None], 4, axis=1)
+    base = 4 * np.arange(len(FACES_CUBO))[:, None]
+    indices = (base + np.array([0, 1, 2, 0, 2, 3])).ravel()
+    # 12 arestas: os 4 lados das faces da frente e de trás + 4 laterais
+    frente, tras = vertices[0], vertices[1][[1, 0, 3, 2]]
+    segmentos = [[frente[k], frente[(k + 1) % 4]] for k in range(4)]
+    segmentos += [[tras[k], tras[(k + 1) % 4]] for k in range(4)]
+    segmentos += [[frente[k], tras[k]] for k in range(4)]
+    return Malha(vertices.reshape(-1, 3), normais.reshape(-1, 3), indices, segmentos)
+
+
+def gerar_malha_cone(base=1.0, altura=2.0, fatias=15, pilhas=15):
+    """
+    Cone com a base (raio base) em z=0 e o vértice em z=altura (como glutSolidCone).
+
+    A lateral é uma grade pilhas x fatias com as normais exatas do cone; a
+    base é um disco voltado para -Z.
+    """
+    theta = np.linspace(0.0, 2.0 * math.pi, fatias + 1)
+    t = np.linspace(0.0, 1.0, pilhas + 1)
+    cos_t, sen_t = np.cos(theta), np.sin(theta)
+
+    # Lateral: linhas do vértice (t=1) para a base (t=0), colunas em theta
+    lateral = np.empty((pilhas + 1, fatias + 1, 3))
+    raio = (base * t)[:, None]
+    lateral[:, :, 0] = raio * cos_t
+    lateral[:, :, 1] = raio * sen_t
+    lateral[:, :, 2] = (altura * (1.0 - t))[:, None]
+    inclinacao = math.hypot(altura, base)
+    normais_lateral = np.empty_like(lateral)
+    normais_lateral[:, :, 0] = cos_t * (altura / inclinacao)
+    normais_lateral[:, :, 1] = sen_t * (altura / inclinacao)
+    normais_lateral[:, :, 2] = base / inclinacao
+
+    # Base: linhas da borda para o centro (com theta crescente, visto de -Z)
+    disco = np.empty((2, fatias + 1, 3))
+    disco[0, :, 0] = base * cos_t
+    disco[0, :, 1] = base * sen_t
+    disco[1, :, :2] = 0.0
+    disco[:, :, 2] = 0.0
+    normais_disco = np.zeros_like(disco)
+    normais_disco[:, :, 2] = -1.0
+
+    return malha_de_grades([(lateral, normais_lateral), (disco, normais_disco)],
+                           segmentos_grade(lateral))
+
+
+def gerar_malha_torus(raio_interno=0.5, raio_externo=1.0, lados=15, aneis=15):
+    """
+    Torus em torno do eixo Z (como glutSolidTorus).
+
+    Args:
+        raio_interno: raio do tubo
+        raio_externo: distância do centro do tubo ao eixo Z
+        lados: divisões da seção do tubo
+        aneis: divisões ao redor do eixo Z
+    """
+    # Linhas ao redor do eixo Z (theta), colunas ao redor do tubo (phi)
+    theta = np.linspace(0.0, 2.0 * math.pi, aneis + 1)[:, None]
+    phi = np.linspace(0.0, 2.0 * math.pi, lados + 1)[None, :]
+    normais = np.empty((aneis + 1, lados + 1, 3))
+    normais[:, :, 0] = np.cos(phi) * np.cos(theta)
+    normais[:, :, 1] = np.cos(phi) * np.sin(theta)
+    normais[:, :, 2] = np.sin(phi) * np.ones_like(theta)
+    centro_tubo = np.zeros_like(normais)
+    centro_tubo[:, :, 0] = raio_externo * np.cos(theta)
+    centro_tubo[:, :, 1] = raio_externo * np.sin(theta)
+    return malha_de_grades([(centro_tubo + raio_interno * normais, normais)])
+
+
+# Bule de Utah: 10 retalhos de Bézier bicúbicos (índices de 16 pontos de
+# controle) e os pontos de controle, como em teapot.c do GLUT. Os retalhos
+# da borda, corpo, tampa e fundo cobrem 1/4 do bule e são espelhados em X e
+# Y; os da alça e do bico cobrem metade e são espelhados só em Y.
+RETALHOS_TEAPOT = [
+    # Borda
+    [102, 103, 104, 105, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15],
+    # Corpo
+    [12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27],
+    [24, 25, 26, 27, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40],
+    # Tampa
+    [96, 96, 96, 96, 97, 98, 99, 100, 101, 101, 101, 101, 0, 1, 2, 3],
+    [0, 1, 2, 3, 106, 107, 108, 109, 110, 111, 112, 113, 114, 115, 116, 117],
+    # Fundo
+    [118, 118, 118, 118, 124, 122, 119, 121, 123, 126, 125, 120, 40, 39, 38, 37],
+    # Alça
+    [41, 42, 43, 44, 45, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55, 56],
+    [53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63, 64, 28, 65, 66, 67],
+    # Bico
+    [68, 69, 70, 71, 72, 73, 74, 75, 76, 77, 78, 79, 80, 81, 82, 83],
+    [80, 81, 82, 83, 84, 85, 86, 87, 88, 89, 90, 91, 92, 93, 94, 95],
+]
+NUM_RETALHOS_ESPELHADOS_XY = 6
+
+PONTOS_CONTROLE_TEAPOT = [
+    [0.2, 0, 2.7], [0.2, -0.112, 2.7], [0.112, -0.2, 2.7], [0, -0.2, 2.7],
+    [1.3375, 0, 2.53125], [1.3375, -0.749, 2.53125], [0.749, -1.3375, 2.53125],
+    [0, -1.3375, 2.53125], [1.4375, 0, 2.53125], [1.4375, -0.805, 2.53125],
+    [0.805, -1.4375, 2.53125], [0, -1.4375, 2.53125], [1.5, 0, 2.4],
+    [1.5, -0.84, 2.4], [0.84, -1.5, 2.4], [0, -1.5, 2.4], [1.75, 0, 1.875],
+    [1.75, -0.98, 1.875], [0.98, -1.75, 1.875], [0, -1.75, 1.875], [2, 0, 1.35],
+    [2, -1.12, 1.35], [1.12, -2, 1.35], [0, -2, 1.35], [2, 0, 0.9],
+    [2, -1.12, 0.9], [1.12, -2, 0.9], [0, -2, 0.9], [-2, 0, 0.9], [2, 0, 0.45],
+    [2, -1.12, 0.45], [1.12, -2, 0.45], [0, -2, 0.45], [1.5, 0, 0.225],
+    [1.5, -0.84, 0.225], [0.84, -1.5, 0.225], [0, -1.5, 0.225], [1.5, 0, 0.15],
+    [1.5, -0.84, 0.15], [0.84, -1.5, 0.15], [0, -1.5, 0.15], [-1.6, 0, 2.025],
+    [-1.6, -0.3, 2.025], [-1.5, -0.3, 2.25], [-1.5, 0, 2.25], [-2.3, 0, 2.025],
+    [-2.3, -0.3, 2.025], [-2.5, -0.3, 2.25], [-2.5, 0, 2.25], [-2.7, 0, 2.025],
+    [-2.7, -0.3, 2.025], [-3, -0.3, 2.25], [-3, 0, 2.25], [-2.7, 0, 1.8],
+    [-2.7, -0.3, 1.8], [-3, -0.3, 1.8], [-3, 0, 1.8], [-2.7, 0, 1.575],
+    [-2.7, -0.3, 1.575], [-3, -0.3, 1.35], [-3, 0, 1.35], [-2.5, 0, 1.125],
+    [-2.5, -0.3, 1.125], [-2.65, -0.3, 0.9375], [-2.65, 0, 0.9375],
+    [-2, -0.3, 0.9], [-1.9, -0.3, 0.6], [-1.9, 0, 0.6], [1.7, 0, 1.425],
+    [1.7, -0.66, 1.425], [1.7, -0.66, 0.6], [1.7, 0, 0.6], [2.6, 0, 1.425],
+    [2.6, -0.66, 1.425], [3.1, -0.66, 0.825], [3.1, 0, 0.825], [2.3, 0, 2.1],
+    [2.3, -0.25, 2.1], [2.4, -0.25, 2.025], [2.4, 0, 2.025], [2.7, 0, 2.4],
+    [2.7, -0.25, 2.4], [3.3, -0.25, 2.4], [3.3, 0, 2.4], [2.8, 0, 2.475],
+    [2.8, -0.25, 2.475], [3.525, -0.25, 2.49375], [3.525, 0, 2.49375],
+    [2.9, 0, 2.475], [2.9, -0.15, 2.475], [3.45, -0.15, 2.5125],
+    [3.45, 0, 2.5125], [2.8, 0, 2.4], [2.8, -0.15, 2.4], [3.2, -0.15, 2.4],
+    [3.2, 0, 2.4], [0, 0, 3.15], [0.8, 0, 3.15], [0.8, -0.45, 3.15],
+    [0.45, -0.8, 3.15], [0, -0.8, 3.15], [0, 0, 2.85], [1.4, 0, 2.4],
+    [1.4, -0.784, 2.4], [0.784, -1.4, 2.4], [0, -1.4, 2.4], [0.4, 0, 2.55],
+    [0.4, -0.224, 2.55], [0.224, -0.4, 2.55], [0, -0.4, 2.55], [1.3, 0, 2.55],
+    [1.3, -0.728, 2.55], [0.728, -1.3, 2.55], [0, -1.3, 2.55], [1.3, 0, 2.4],
+    [1.3, -0.728, 2.4], [0.728, -1.3, 2.4], [0, -1.3, 2.4], [0, 0, 0],
+    [1.425, -0.798, 0], [1.5, 0, 0.075], [1.425, 0, 0], [0.798, -1.425, 0],
+    [0, -1.5, 0.075], [0, -1.425, 0], [1.5, -0.84, 0.075], [0.84, -1.5, 0.075],
+]
+
+
+def _bernstein_cubico(t):
+    """Polinômios de Bernstein cúbicos e suas derivadas em t (array (n,))."""
+    s = 1.0 - t
+    valores = np.stack([s**3, 3*t*s**2, 3*t**2*s, t**3], axis=1)
+    derivadas = np.stack([-3*s**2, 3*s**2 - 6*t*s, 6*t*s - 3*t**2, 3*t**2], axis=1)
+    return valores, derivadas
+
+
+def retalhos_teapot():
+    """Os 32 retalhos do bule completo (pontos de controle (32, 4, 4, 3))."""
+    pontos = np.array(PONTOS_CONTROLE_TEAPOT, dtype=np.float64)
+    retalhos = []
+    for i, indices in enumerate(RETALHOS_TEAPOT):
+        p = pontos[indices].reshape(4, 4, 3)
+        # Espelhar inverte a orientação; inverter as colunas a restaura
+        retalhos.append(p)
+        retalhos.append(p[:, ::-1] * (1, -1, 1))
+        if i < NUM_RETALHOS_ESPELHADOS_XY:
+            retalhos.append(p[:, ::-1] * (-1, 1, 1))
+            retalhos.append(p * (-1, -1, 1))
+    return np.array(retalhos)
+
+
+def gerar_malha_teapot(tamanho=1.0, subdivisoes=7):
+    """
+    Bule de Utah avaliado a partir dos retalhos de Bézier (como glutSolidTeapot).
+
+    Cada retalho vira uma grade (subdivisoes + 1)² com normais analíticas
+    (∂P/∂v × ∂P/∂u). Nos retalhos que degeneram em um ponto (topo da tampa
+    e centro do fundo) a normal é tomada logo ao lado da borda degenerada.
+    A orientação final é a do GLUT: em pé no eixo Y, centrado na origem e
+    com escala 0.5 · tamanho.
+    """
+    t = np.linspace(0.0, 1.0, subdivisoes + 1)
+    B, dB = _bernstein_cubico(t)
+    # Parâmetros afastados das bordas só para as normais
+    Bn, dBn = _bernstein_cubico(np.clip(t, 1e-4, 1.0 - 1e-4))
+
+    grades = []
+    for p in retalhos_teapot():
+        # Grade com linhas em v e colunas em u (triângulos anti-horários vistos de fora)
+        pontos = np.einsum("ui,vj,ijk->vuk", B, B, p)
+        du = np.einsum("ui,vj,ijk->vuk", dBn, Bn, p)
+        dv = np.einsum("ui,vj,ijk->vuk", Bn, dBn, p)
+        normais = np.cross(dv, du)
+        normais /= np.maximum(np.linalg.norm(normais, axis=2, keepdims=True), 1e-12)
+        grades.append((pontos, normais))
+    malha = malha_de_grades(grades)
+
+    # glRotatef(270, 1, 0, 0); glScalef(0.5 * tamanho); glTranslatef(0, 0, -1.5)
+    rotacao = matriz_rotacao(270.0, 1.0, 0.0, 0.0)[:3, :3]
+    escala = 0.5 * tamanho
+    deslocamento = np.array([0.0, 0.0, -1.5])
+    malha.vertices = ((malha.vertices + deslocamento) * escala) @ rotacao.T
+    malha.normais = malha.normais @ rotacao.T
+    malha.segmentos = ((malha.segmentos + deslocamento) * escala) @ rotacao.T
+    return malha
+
+
+GERADORES_MALHA = {
+    "esfera": gerar_malha_esfera,
+    "cubo": gerar_malha_cubo,
+    "cone": gerar_malha_cone,
+    "torus": gerar_malha_torus,
+    "teapot": gerar_malha_teapot,
+}
+
+# Malhas procedurais já geradas, por (forma, *parâmetros)
+_cache_malhas_procedurais = {}
+
+
+def malha_procedural(forma, *parametros):
+    """
+    Malha de uma forma padrão, gerada uma única vez por (forma, parâmetros).
+
+    Exemplo: malha_procedural("esfera", 1.0, 20, 20) equivale a
+    glutSolidSphere(1.0, 20, 20), mas os arrays podem ser reaproveitados
+    pela GPU (VBO), pelo scanline e pelo renderizador por software.
+    """
+    chave = (forma,) + tuple(parametros)
+    malha = _cache_malhas_procedurais.get(chave)
+    if malha is None:
+        malha = GERADORES_MALHA[forma](*parametros)
+        _cache_malhas_procedurais[chave] = malha
+    return malha
+
+
+# Malhas de cada objeto padrão (forma, parâmetros sólidos, parâmetros do
+# wireframe), com as mesmas tesselações das primitivas do GLUT
+MALHAS_OBJETOS = {
+    1: ("esfera", (1.0, 20, 20), (1.0, 10, 10)),
+    2: ("cubo", (2.0,), (2.0,)),
+    3: ("cone", (1.0, 2.0, 15, 15), (1.0, 2.0, 15, 15)),
+    4: ("torus", (0.5, 1.0, 15, 15), (0.5, 1.0, 15, 15)),
+    5: ("teapot", (1.0, 7), (1.0, 10)),
+}
+
+
+def malha_objeto(objeto, wireframe=False):
+    """Malha do objeto padrão (1-5) ou do modelo carregado (7), ou None se não existir."""
+    if objeto == OBJETO_MODELO:
+        return malha_modelo_externo(wireframe)
+    if objeto not in MALHAS_OBJETOS:
+        return None
+    forma, solido, arame = MALHAS_OBJETOS[objeto]
+    return malha_procedural(forma, *(arame if wireframe else solido))
+
+
+# ==========================================
+# NÍVEIS DE DETALHE (LOD)
+# ==========================================
+# Tesselações sólidas de cada objeto padrão, da mais fina (nível 0, a de
+# MALHAS_OBJETOS) à mais grossa. O cubo tem um único nível.
+NIVEIS_LOD = {
+    1: [(1.0, 20, 20), (1.0, 12, 12), (1.0, 8, 6), (1.0, 5, 4)],
+    2: [(2.0,)],
+    3: [(1.0, 2.0, 15, 15), (1.0, 2.0, 10, 4), (1.0, 2.0, 6, 2), (1.0, 2.0, 4, 1)],
+    4: [(0.5, 1.0, 15, 15), (0.5, 1.0, 10, 10), (0.5, 1.0, 6, 6), (0.5, 1.0, 4, 4)],
+    5: [(1.0, 7), (1.0, 4), (1.0, 2), (1.0, 1)],
+}
+
+# Diâmetro mínimo na tela, em pixels, de cada nível: o nível 0 vale a
+# partir de limiares_lod[0], o 1 a partir de limiares_lod[1] e assim por
+# diante; abaixo do último limiar, o nível seguinte (--lod-limiares)
+limiares_lod = [100.0, 40.0, 15.0]
+
+# Margem relativa em torno de cada limiar: o nível só muda quando o tamanho
+# passa do limiar por essa fração, para não alternar a cada quadro
+histerese_lod = 0.15
+
+# Extrusão: o nível n usa 1 a cada 2^n pontos de cada anel do perfil, sem
+# deixar nenhum anel com menos que PONTOS_MINIMOS_LOD pontos
+PONTOS_MINIMOS_LOD = 16
+
+# Nível do objeto desenhado no quadro anterior (histerese) e o que o HUD mostra
+estatisticas_lod = {"chave": None, "nivel": -1, "niveis": 1, "triangulos": 0}
+
+
+def malhas_lod(objeto):
+    """Malhas sólidas de todos os níveis de detalhe de um objeto padrão (1-5)."""
+    forma = MALHAS_OBJETOS[objeto][0]
+    return [malha_procedural(forma, *parametros) for parametros in NIVEIS_LOD[objeto]]
+
+
+def tamanho_na_tela(centros_olho, raios, projecao, altura):
+    """
+    Diâmetro aproximado, em pixels, de esferas projetadas na tela.
+
+    Na perspectiva, o diâmetro é 2·r·(P[1][1]/2)·altura / w, com w = -z do
+    centro no espaço do olho; na ortográfica, w = 1. Esferas que envolvem
+    o olho (w <= r) ocupam a tela toda e retornam infinito.
+
+    Args:
+        centros_olho: array (N, 3) com os centros no espaço do olho
+        raios: array (N,) com os raios (já com a escala da modelview)
+        projecao: matriz de projeção 4x4
+        altura: altura da viewport em pixels
+    """
+    w = centros_olho @ projecao[3, :3] + projecao[3, 3]
+    perspectiva = projecao[3, 3] == 0.0
+    envolve = (w <= raios) if perspectiva else np.zeros(len(raios), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tamanho = raios * projecao[1, 1] * altura / w
+    return np.where(envolve, np.inf, tamanho)
+
+
+def escolher_niveis_lod(tamanhos, atuais, num_niveis):
+    """
+    Nível de detalhe de cada objeto pelo tamanho na tela, com histerese.
+
+    Sem nível anterior (atual < 0), vale o nível ideal para o tamanho. Com
+    ele, o nível só fica mais fino quando o tamanho passa do limiar por
+    histerese_lod acima, e só fica mais grosso quando cai histerese_lod
+    abaixo dele.
+
+    Args:
+        tamanhos: array (N,) com os diâmetros em pixels (tamanho_na_tela)
+        atuais: array (N,) com os níveis do quadro anterior (-1: nenhum)
+        num_niveis: número de níveis de cada objeto (int ou array (N,))
+
+    Returns:
+        np.ndarray: array (N,) de níveis (0 = mais fino)
+    """
+    global usar_lod, limiares_lod, histerese_lod
+
+    tamanhos = np.asarray(tamanhos, dtype=np.float64)
+    if not usar_lod or not limiares_lod:
+        return np.zeros(len(tamanhos), dtype=np.int64)
+    limiares = np.asarray(limiares_lod, dtype=np.float64)[:, None]
+    ideal = (tamanhos < limiares).sum(axis=0)
+    mais_fino = (tamanhos < limiares * (1.0 - histerese_lod)).sum(axis=0)
+    mais_grosso = (tamanhos < limiares * (1.0 + histerese_lod)).sum(axis=0)
+    atuais = np.asarray(atuais)
+    niveis = np.where(atuais < 0, ideal, np.clip(atuais, mais_fino, mais_grosso))
+    return np.minimum(niveis, np.asarray(num_niveis) - 1)
+
+
+def nivel_lod(chave, malha, num_niveis, modelview, projecao, altura):
+    """
+    Nível de detalhe do objeto único do quadro (objeto padrão ou extrusão),
+    pelo tamanho na tela da esfera envolvente de malha (nível 0) desenhada
+    com a modelview. A histerese vale enquanto chave não muda.
+    """
+    nivel = 0
+    if num_niveis > 1:
+        centro, raio = esfera_envolvente(malha)
+        centro_olho = modelview[:3, :3] @ centro + modelview[:3, 3]
+        raio = raio * np.linalg.norm(modelview[:3, :3], axis=0).max()
+        tamanho = tamanho_na_tela(centro_olho[None], np.array([raio]), projecao, altura)
+        atual = estatisticas_lod["nivel"] if estatisticas_lod["chave"] == chave else -1
+        nivel = int(escolher_niveis_lod(tamanho, np.array([atual]), num_niveis)[0])
+    estatisticas_lod.update(chave=chave, nivel=nivel, niveis=num_niveis)
+    return nivel
+
+
+def malha_desenhada(objeto):
+    """
+    Malha do objeto (1-5 ou 7) como foi desenhada no último quadro: a do
+    wireframe, ou a do nível de detalhe escolhido por nivel_lod; None se o
+    objeto não existe.
+    """
+    global modo_wireframe
+
+    if modo_wireframe or objeto not in NIVEIS_LOD:
+        return malha_objeto(objeto, modo_wireframe)
+    nivel = estatisticas_lod["nivel"] if estatisticas_lod["chave"] == objeto else 0
+    return malhas_lod(objeto)[max(nivel, 0)]
+
+
+# ==========================================
+# MALHAS EXTERNAS (OBJ / PLY / STL)
+# ==========================================
+# Objeto 7: modelo carregado de arquivo (--modelo ARQUIVO)
+OBJETO_MODELO = 7
+
+# Registro de um STL binário: normal, 3 vértices (float32) e 2 bytes de atributo
+DTYPE_STL = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("atributo", "<u2")])
+
+# Tipos escalares do cabeçalho PLY
+TIPOS_PLY = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+
+TAMANHO_BLOCO_OBJ = 1 << 24  # bytes lidos por vez do OBJ texto (16 MiB)
+
+
+def normais_suaves(vertices, indices):
+    """
+    Normal de cada vértice: soma das normais (ponderadas pela área) das
+    faces que o usam, acumulada com np.bincount (sem laço por triângulo).
+    """
+    T = indices.reshape(-1, 3)
+    p1, p2, p3 = vertices[T[:, 0]], vertices[T[:, 1]], vertices[T[:, 2]]
+    N_faces = np.repeat(np.cross(p2 - p1, p3 - p1), 3, axis=0)
+    N = np.column_stack([np.bincount(indices, weights=N_faces[:, k], minlength=len(vertices))
+                         for k in range(3)])
+    comprimento = np.sqrt((N ** 2).sum(axis=1))
+    nao_nulo = comprimento > 0
+    N[nao_nulo] /= comprimento[nao_nulo, None]
+    N[~nao_nulo] = (0.0, 0.0, 1.0)
+    return N
+
+
+def triangular_faces_em_leque(contagens, indices):
+    """
+    Triangula em leque polígonos guardados em sequência.
+
+    Args:
+        contagens: array (F,) com o número de vértices de cada face
+        indices: array (sum(contagens),) com os índices das faces, em ordem
+
+    Returns:
+        np.ndarray: array (3T,) com os índices dos triângulos
+    """
+    contagens = np.asarray(contagens, dtype=np.int64)
+    inicio = np.cumsum(contagens) - contagens
+    por_face = np.maximum(contagens - 2, 0)
+    face = np.repeat(np.arange(len(contagens)), por_face)
+    j = np.arange(len(face)) - np.repeat(np.cumsum(por_face) - por_face, por_face) + 1
+    primeiro = inicio[face]
+    return np.column_stack((indices[primeiro], indices[primeiro + j],
+                            indices[primeiro + j + 1])).ravel()
+
+
+def _ler_mapeado(caminho, ler):
+    """Chama ler(mapa) com o arquivo mapeado em memória (mmap, só leitura)."""
+    with open(caminho, "rb") as arquivo, \
+            mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+        return ler(mapa)
+
+
+def carregar_stl(caminho):
+    """
+    Lê um STL binário: os registros de 50 bytes viram um array estruturado
+    (DTYPE_STL) direto sobre o arquivo mapeado, sem objetos por triângulo.
+    As normais são recalculadas pelos vértices (muitos exportadores gravam
+    zeros).
+    """
+    def ler(mapa):
+        if len(mapa) < 84:
+            raise ValueError("STL truncado")
+        total = int(np.frombuffer(mapa, dtype="<u4", count=1, offset=80)[0])
+        # Bytes sobrando no fim são tolerados (alguns exportadores os deixam);
+        # só um arquivo curto demais que começa com "solid" é STL texto
+        if len(mapa) < 84 + total * DTYPE_STL.itemsize:
+            if mapa[:5] == b"solid":
+                raise ValueError("STL texto (ASCII) não suportado; exporte em binário")
+            raise ValueError("STL truncado")
+        registros = np.frombuffer(mapa, dtype=DTYPE_STL, count=total, offset=84)
+        vertices = registros["vertices"].astype(np.float64)
+        del registros  # libera o buffer antes de fechar o mmap
+        return vertices
+
+    vertices = _ler_mapeado(caminho, ler)
+    normais = calcular_normais_faces(vertices[:, 0], vertices[:, 1], vertices[:, 2])
+    return Malha.de_triangulos(vertices, normais)
+
+
+def _cabecalho_ply(mapa):
+    """
+    Interpreta o cabeçalho de um PLY.
+
+    Returns:
+        tuple: (formato, elementos, inicio_dos_dados); cada elemento é
+               (nome, quantidade, [(propriedade, tipo, tipo_da_contagem)]),
+               com tipo_da_contagem None para propriedades escalares
+    """
+    fim = mapa.find(b"end_header")
+    if not mapa[:4].startswith(b"ply") or fim < 0:
+        raise ValueError("arquivo PLY inválido")
+    inicio_dados = mapa.find(b"\n", fim) + 1
+    formato, elementos = None, []
+    for linha in mapa[:fim].decode("ascii", errors="replace").splitlines():
+        partes = linha.split()
+        if not partes:
+            continue
+        if partes[0] == "format":
+            formato = partes[1]
+        elif partes[0] == "element":
+            elementos.append((partes[1], int(partes[2]), []))
+        elif partes[0] == "property":
+            if partes[1] == "list":
+                elementos[-1][2].append((partes[4], TIPOS_PLY[partes[3]], TIPOS_PLY[partes[2]]))
+            else:
+                elementos[-1][2].append((partes[2], TIPOS_PLY[partes[1]], None))
+    return formato, elementos, inicio_dados
+
+
+def carregar_ply(caminho):
+    """
+    Lê um PLY binário (little ou big endian) sobre o arquivo mapeado.
+
+    Os vértices são um array estruturado montado a partir do cabeçalho.
+    As faces também, quando todas têm o mesmo número de vértices (o caso
+    comum, só triângulos); faces de tamanhos variados (triângulos e quads
+    misturados) são localizadas por _faces_ply_variadas, também sem laço
+    por face.
+    Usa as normais do arquivo (nx, ny, nz) se houver; senão, suaves.
+    """
+    def ler(mapa):
+        formato, elementos, posicao = _cabecalho_ply(mapa)
+        if formato not in ("binary_little_endian", "binary_big_endian"):
+            raise ValueError(f"PLY {formato} não suportado; exporte em binário")
+        ordem = "<" if formato == "binary_little_endian" else ">"
+        vertices = normais = indices = None
+        for nome, quantidade, propriedades in elementos:
+            listas = [p for p in propriedades if p[2] is not None]
+            if not listas:
+                dtype = np.dtype([(p, ordem + t) for p, t, _ in propriedades])
+                dados = np.frombuffer(mapa, dtype=dtype, count=quantidade, offset=posicao)
+                posicao += quantidade * dtype.itemsize
+                if nome == "vertex":
+                    vertices = np.column_stack([dados[c].astype(np.float64) for c in "xyz"])
+                    if {"nx", "ny", "nz"} <= set(dtype.names):
+                        normais = np.column_stack([dados[c].astype(np.float64)
+                                                   for c in ("nx", "ny", "nz")])
+                del dados
+                continue
+            if nome != "face" or len(propriedades) != 1:
+                raise ValueError(f"elemento PLY '{nome}' com listas não suportado")
+            _, tipo, tipo_contagem = propriedades[0]
+            indices, posicao = _faces_ply(mapa, quantidade, posicao, ordem + tipo,
+                                          ordem + tipo_contagem)
+        if vertices is None or indices is None:
+            raise ValueError("PLY sem vértices ou faces")
+        return vertices, normais, indices
+
+    vertices, normais, indices = _ler_mapeado(caminho, ler)
+    if normais is None:
+        normais = normais_suaves(vertices, indices)
+    return Malha(vertices, normais, indices)
+
+
+def _faces_ply(mapa, quantidade, posicao, tipo, tipo_contagem):
+    """Lê quantidade faces 'property list' a partir de posicao; retorna (indices, fim)."""
+    if quantidade == 0:
+        return np.empty(0, dtype=np.uint32), posicao
+    tamanho_contagem = np.dtype(tipo_contagem).itemsize
+    k = int(np.frombuffer(mapa, dtype=tipo_contagem, count=1, offset=posicao)[0])
+    dtype = np.dtype([("n", tipo_contagem), ("i", tipo, (k,))])
+    if posicao + quantidade * dtype.itemsize <= len(mapa):
+        faces = np.frombuffer(mapa, dtype=dtype, count=quantidade, offset=posicao)
+        if (faces["n"] == k).all():
+            indices = faces["i"].astype(np.int64).ravel()
+            del faces
+            return (triangular_faces_em_leque(np.full(quantidade, k), indices),
+                    posicao + quantidade * dtype.itemsize)
+        del faces
+
+    return _faces_ply_variadas(mapa, quantidade, posicao, tipo, tipo_contagem)
+
+
+def _ler_valores_bytes(bytes_, inicios, tipo):
+    """Valores de tipo (dtype NumPy) que começam nos bytes inicios (sem alinhamento)."""
+    largura = np.dtype(tipo).itemsize
+    if largura == 1:
+        return bytes_[inicios].view(tipo)
+    return np.ascontiguousarray(bytes_[inicios[:, None] + np.arange(largura)]).view(tipo).ravel()
+
+
+def _faces_ply_variadas(mapa, quantidade, posicao, tipo, tipo_contagem):
+    """
+    Faces 'property list' de tamanhos variados (ex.: triângulos e quads
+    misturados), sem laço por face.
+
+    O início de cada face depende das contagens de todas as anteriores:
+    é uma lista encadeada sobre os bytes. Cada byte da região é tratado
+    como um possível início de face, com proximo[p] = p + contagem lida em
+    p. Dobrar os saltos (proximo[proximo], ...) dá o salto de ~raiz de
+    quantidade faces, que localiza o início de cada bloco; daí todos os
+    blocos avançam juntos, um salto simples por vez. São ~2 raiz de
+    quantidade passadas vetorizadas, em vez de uma por face.
+    """
+    bytes_ = np.frombuffer(mapa, dtype=np.uint8, offset=posicao)
+    tamanho = len(bytes_)
+    tamanho_contagem = np.dtype(tipo_contagem).itemsize
+    tamanho_indice = np.dtype(tipo).itemsize
+    indice_tipo = np.int32 if tamanho < 2 ** 31 - 1 else np.int64
+
+    # Possíveis inícios perto do fim leem a contagem só até o último byte
+    inicios = np.minimum(np.arange(tamanho), max(tamanho - tamanho_contagem, 0))
+    contagens_bytes = _ler_valores_bytes(bytes_, inicios, tipo_contagem).astype(np.int64)
+    del inicios
+    # Saltos para fora da região vão para o sentinela `tamanho`, que aponta para si
+    proximo = np.empty(tamanho + 1, dtype=indice_tipo)
+    proximo[:tamanho] = np.minimum(np.arange(tamanho) + tamanho_contagem
+                                   + contagens_bytes * tamanho_indice, tamanho)
+    proximo[tamanho] = tamanho
+
+    # Salto de `passo` faces (~raiz de quantidade), dobrando proximo
+    passo = 1
+    salto = proximo
+    while passo * passo < quantidade:
+        salto = salto[salto]
+        passo *= 2
+    # Âncoras: a primeira face de cada bloco de `passo` faces
+    ancoras = np.empty(-(-quantidade // passo), dtype=np.int64)
+    p = 0
+    for b in range(len(ancoras)):
+        ancoras[b] = p
+        p = int(salto[p])
+    del salto
+    # Dentro dos blocos, um salto simples por vez, todos os blocos juntos
+    inicios = np.empty((len(ancoras), passo), dtype=np.int64)
+    for j in range(passo):
+        inicios[:, j] = ancoras
+        ancoras = proximo[ancoras]
+    del proximo
+    inicios = inicios.ravel()[:quantidade]
+    if inicios[-1] >= tamanho:
+        raise ValueError("PLY truncado (faces)")
+
+    contagens = contagens_bytes[inicios]
+    del contagens_bytes
+    fim = int(inicios[-1] + tamanho_contagem + contagens[-1] * tamanho_indice)
+    if fim > tamanho:
+        raise ValueError("PLY truncado (faces)")
+
+    # Posição de cada índice: início da sua face + contagem + j * tamanho
+    total = int(contagens.sum())
+    j = np.arange(total) - np.repeat(np.cumsum(contagens) - contagens, contagens)
+    posicoes = np.repeat(inicios + tamanho_contagem, contagens) + j * tamanho_indice
+    indices = _ler_valores_bytes(bytes_, posicoes, tipo).astype(np.int64)
+    del bytes_
+    return triangular_faces_em_leque(contagens, indices), posicao + fim
+
+
+def _linhas_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO_OBJ):
+    """Lê um arquivo texto em blocos, entregando listas de linhas completas."""
+    resto = b""
+    with open(caminho, "rb") as arquivo:
+        while True:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                break
+            bloco = resto + bloco
+            corte = bloco.rfind(b"\n") + 1
+            resto = bloco[corte:]
+            yield bloco[:corte].splitlines()
+    if resto:
+        yield [resto]
+
+
+def carregar_obj(caminho):
+    """
+    Lê um OBJ texto em blocos (_linhas_em_blocos), sem carregar o arquivo
+    inteiro como texto.
+
+    Em cada bloco, as linhas 'v' e 'f' são convertidas de uma vez com
+    NumPy; faces com mais de 3 vértices são trianguladas em leque e índices
+    negativos (relativos) são resolvidos. Texturas, grupos e materiais são
+    ignorados, e as normais são recalculadas (suaves).
+    """
+    blocos_vertices, blocos_indices = [], []
+    total_vertices = 0
+    for linhas in _linhas_em_blocos(caminho):
+        posicoes, faces, antes = [], [], []
+        for linha in linhas:
+            if linha.startswith(b"v "):
+                posicoes.append(linha[2:])
+            elif linha.startswith(b"f "):
+                faces.append(linha[2:])
+                antes.append(len(posicoes))
+        if posicoes:
+            # x y z [w | r g b]: só as três primeiras coordenadas
+            blocos_vertices.append(np.array([l.split()[:3] for l in posicoes], dtype=np.float64))
+        if faces:
+            # "7/1/3" → "7": só o índice do vértice
+            tokens = [[t.split(b"/", 1)[0] for t in f.split()] for f in faces]
+            contagens = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+            indices = np.array([i for t in tokens for i in t], dtype=np.int64)
+            # Negativos contam a partir do último vértice definido antes da face
+            definidos = np.repeat(total_vertices + np.array(antes), contagens)
+            indices = np.where(indices < 0, definidos + indices, indices - 1)
+            blocos_indices.append(triangular_faces_em_leque(contagens, indices))
+        total_vertices += len(posicoes)
+
+    if not blocos_vertices or not blocos_indices:
+        raise ValueError("OBJ sem vértices ou faces")
+    vertices = np.concatenate(blocos_vertices)
+    indices = np.concatenate(blocos_indices)
+    if indices.min() < 0 or indices.max() >= len(vertices):
+        raise ValueError("OBJ com índice de vértice fora do intervalo")
+    return Malha(vertices, normais_suaves(vertices, indices), indices)
+
+
+CARREGADORES_MALHA = {".obj": carregar_obj, ".ply": carregar_ply, ".stl": carregar_stl}
+
+
+def carregar_malha(caminho, normalizar=True):
+    """
+    Carrega uma malha OBJ, PLY (binário) ou STL (binário), pela extensão.
+
+    Args:
+        normalizar: True centraliza a malha na origem e a escala para caber
+                    numa esfera de raio 1.5, como os objetos padrão
+
+    Returns:
+        Malha
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in CARREGADORES_MALHA:
+        raise ValueError(f"formato '{extensao}' não suportado (use .obj, .ply ou .stl)")
+    malha = CARREGADORES_MALHA[extensao](caminho)
+    if normalizar and len(malha.vertices):
+        centro = (malha.vertices.min(axis=0) + malha.vertices.max(axis=0)) / 2.0
+        malha.vertices -= centro
+        raio = np.sqrt((malha.vertices ** 2).sum(axis=1)).max()
+        if raio > 0:
+            malha.vertices *= 1.5 / raio
+    return malha
+
+
+def segmentos_malha(malha):
+    """Arestas únicas dos triângulos de uma malha, como (S, 2, 3) para o wireframe."""
+    T = malha.indices.reshape(-1, 3).astype(np.int64)
+    arestas = np.concatenate((T[:, [0, 1]], T[:, [1, 2]], T[:, [2, 0]]))
+    arestas.sort(axis=1)
+    arestas = np.unique(arestas[:, 0] * len(malha.vertices) + arestas[:, 1])
+    a, b = np.divmod(arestas, len(malha.vertices))
+    return np.stack((malha.vertices[a], malha.vertices[b]), axis=1)
+
+
+# Wireframe (arestas únicas) de malhas sem segmentos próprios, pela versão
+# (malhas da cena e modelo externo); esvaziado quando enche, como o cache de
+# triangulações, para modelos recarregados não acumularem
+_cache_arame = {}
+LIMITE_CACHE_ARAME = 32
+
+
+def arame_malha(malha):
+    """A malha, se já tem arestas de wireframe; senão, uma malha só com as arestas dos triângulos."""
+    if len(malha.segmentos):
+        return malha
+    if malha.versao not in _cache_arame:
+        if len(_cache_arame) >= LIMITE_CACHE_ARAME:
+            _cache_arame.clear()
+        _cache_arame[malha.versao] = Malha(np.empty((0, 3)), np.empty((0, 3)), [],
+                                           segmentos_malha(malha))
+    return _cache_arame[malha.versao]
+
+
+# Modelo carregado (objeto 7)
+modelo_externo = {"caminho": None, "malha": None}
+
+
+def definir_modelo_externo(caminho):
+    """Carrega o arquivo como objeto 7; retorna a Malha."""
+    inicio = time.perf_counter()
+    malha = carregar_malha(caminho)
+    modelo_externo.update(caminho=caminho, malha=malha)
+    print(f"Modelo {os.path.basename(caminho)}: {malha.num_triangulos} triângulos, "
+          f"{len(malha.vertices)} vértices ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    return malha
+
+
+def malha_modelo_externo(wireframe=False):
+    """Malha do objeto 7 (ou seu wireframe), ou None se nenhum modelo foi carregado."""
+    malha = modelo_externo["malha"]
+    if malha is None or not wireframe:
+        return malha
+    return arame_malha(malha)
+
+
+# Arquivo gravado por [Z] no modo extrusão
+ARQUIVO_STL_EXTRUSAO = "extrusao.stl"
+
+
+def exportar_stl(caminho, malha):
+    """
+    Grava uma Malha como STL binário numa única escrita: cabeçalho,
+    contagem e registros (DTYPE_STL) são montados num só buffer NumPy.
+    """
+    vertices, _ = malha.triangulos()
+    total = len(vertices)
+    buffer = np.zeros(84 + total * DTYPE_STL.itemsize, dtype=np.uint8)
+    cabecalho = b"Trabalho CG 3D - extrusao"
+    buffer[:len(cabecalho)] = np.frombuffer(cabecalho, dtype=np.uint8)
+    buffer[80:84] = np.frombuffer(struct.pack("<I", total), dtype=np.uint8)
+    registros = buffer[84:].view(DTYPE_STL)
+    registros["vertices"] = vertices
+    registros["normal"] = calcular_normais_faces(vertices[:, 0], vertices[:, 1], vertices[:, 2])
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(buffer)
+    return total
+
+
+# ==========================================
+# BVH (PICKING POR RAIO)
+# ==========================================
+TRIANGULOS_POR_FOLHA = 8
+
+
+def _espalhar_bits(v):
+    """Intercala 2 zeros entre os 10 bits menores de cada valor (código de Morton)."""
+    v = v.astype(np.uint32)
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+
+def intersectar_raio_triangulos(origem, direcao, v0, e1, e2):
+    """
+    Intersecção de um raio com vários triângulos (Möller–Trumbore),
+    sem descartar faces de costas.
+
+    Args:
+        origem, direcao: arrays (3,) do raio
+        v0: array (T, 3) com o 1º vértice de cada triângulo
+        e1, e2: arrays (T, 3) com as arestas v1 - v0 e v2 - v0
+
+    Returns:
+        tuple: arrays (T,) (t, u, v); t é inf onde o raio não atinge o
+               triângulo à frente da origem, e (u, v) são as coordenadas
+               baricêntricas de v1 e v2 no ponto atingido
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.cross(direcao, e2)
+        det = (e1 * p).sum(axis=1)
+        inv_det = 1.0 / det
+        s = origem - v0
+        u = (s * p).sum(axis=1) * inv_det
+        q = np.cross(s, e1)
+        v = (q @ direcao) * inv_det
+        t = (e2 * q).sum(axis=1) * inv_det
+        atinge = (np.abs(det) > 1e-12) & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > 1e-9)
+    return np.where(atinge, t, np.inf), u, v
+
+
+class BVH:
+    """
+    Hierarquia de caixas envolventes (alinhadas aos eixos) sobre os
+    triângulos de uma Malha, para intersectar raios em tempo logarítmico.
+
+    A construção não tem laço por triângulo: os triângulos são ordenados
+    pelo código de Morton do centróide e agrupados, nessa ordem, em folhas
+    de TRIANGULOS_POR_FOLHA. A árvore é binária e completa, guardada como
+    heap (filhos do nó n em 2n e 2n + 1, folhas de F a 2F - 1), e a caixa
+    de cada nível é a união das caixas dos filhos, calculada de uma vez.
+
+    A consulta desce um nível por vez testando juntas todas as caixas
+    atingidas naquele nível, e só intersecta os triângulos das folhas
+    atingidas.
+    """
+
+    def __init__(self, malha, triangulos_por_folha=TRIANGULOS_POR_FOLHA):
+        triangulos = malha.vertices[malha.indices.astype(np.int64)].reshape(-1, 3, 3)
+        total = len(triangulos)
+        self.malha = malha
+        self.versao = malha.versao
+        self.por_folha = triangulos_por_folha
+
+        # Ordem de Morton dos centróides: triângulos próximos, folhas próximas
+        centroides = triangulos.mean(axis=1)
+        minimo = centroides.min(axis=0) if total else np.zeros(3)
+        extensao = np.maximum(np.ptp(centroides, axis=0) if total else np.ones(3), 1e-12)
+        grade = np.clip((centroides - minimo) / extensao * 1023.0, 0, 1023)
+        codigos = ((_espalhar_bits(grade[:, 0]) << 2) | (_espalhar_bits(grade[:, 1]) << 1)
+                   | _espalhar_bits(grade[:, 2]))
+        ordem = np.argsort(codigos, kind="stable")
+
+        folhas = max(1, -(-total // triangulos_por_folha))
+        self.folhas = 1 << (folhas - 1).bit_length()
+        vagas = self.folhas * triangulos_por_folha
+
+        # Triângulos na ordem das folhas; vagas sem triângulo ficam com NaN
+        # (nunca atingidas) e índice -1
+        self.ids = np.full(vagas, -1, dtype=np.int64)
+        self.ids[:total] = ordem
+        ordenados = np.full((vagas, 3, 3), np.nan)
+        ordenados[:total] = triangulos[ordem]
+        self.v0 = ordenados[:, 0]
+        self.e1 = ordenados[:, 1] - ordenados[:, 0]
+        self.e2 = ordenados[:, 2] - ordenados[:, 0]
+
+        # Caixas: folhas a partir dos triângulos, níveis acima pela união.
+        # Nós sem triângulos ficam com caixa vazia (mínimo > máximo).
+        self.minimos = np.full((2 * self.folhas, 3), np.inf)
+        self.maximos = np.full((2 * self.folhas, 3), -np.inf)
+        minimos = np.full((vagas, 3), np.inf)
+        maximos = np.full((vagas, 3), -np.inf)
+        minimos[:total] = ordenados[:total].min(axis=1)
+        maximos[:total] = ordenados[:total].max(axis=1)
+        F = self.folhas
+        self.minimos[F:] = minimos.reshape(F, triangulos_por_folha, 3).min(axis=1)
+        self.maximos[F:] = maximos.reshape(F, triangulos_por_folha, 3).max(axis=1)
+        n = F // 2
+        while n >= 1:
+            self.minimos[n:2 * n] = self.minimos[2 * n:4 * n].reshape(n, 2, 3).min(axis=1)
+            self.maximos[n:2 * n] = self.maximos[2 * n:4 * n].reshape(n, 2, 3).max(axis=1)
+            n //= 2
+
+    def _caixas_atingidas(self, nos, origem, inverso):
+        """Máscara dos nós cuja caixa o raio atinge à frente da origem (teste das placas)."""
+        with np.errstate(invalid="ignore"):
+            t1 = (self.minimos[nos] - origem) * inverso
+            t2 = (self.maximos[nos] - origem) * inverso
+        # 0 * inf: raio paralelo à placa com a origem na borda, que conta como dentro
+        t1[np.isnan(t1)] = -np.inf
+        t2[np.isnan(t2)] = np.inf
+        entrada = np.minimum(t1, t2).max(axis=1)
+        saida = np.maximum(t1, t2).min(axis=1)
+        ocupado = self.minimos[nos, 0] <= self.maximos[nos, 0]
+        return ocupado & (saida >= np.maximum(entrada, 0.0))
+
+    def intersectar(self, origem, direcao):
+        """
+        Triângulo mais próximo atingido pelo raio origem + t·direcao (t > 0).
+
+        Returns:
+            tuple: (triangulo, t, u, v), com triangulo o índice na malha e
+                   (u, v) as coordenadas baricêntricas; None se não atinge
+        """
+        origem = np.asarray(origem, dtype=np.float64)
+        direcao = np.asarray(direcao, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            inverso = 1.0 / direcao
+
+        nos = np.array([1])
+        nos = nos[self._caixas_atingidas(nos, origem, inverso)]
+        while len(nos) and nos[0] < self.folhas:
+            nos = (2 * nos[:, None] + np.array([0, 1])).ravel()
+            nos = nos[self._caixas_atingidas(nos, origem, inverso)]
+        if not len(nos):
+            return None
+
+        vagas = ((nos - self.folhas)[:, None] * self.por_folha + np.arange(self.por_folha)).ravel()
+        t, u, v = intersectar_raio_triangulos(origem, direcao, self.v0[vagas],
+                                              self.e1[vagas], self.e2[vagas])
+        mais_proximo = int(np.argmin(t))
+        if not np.isfinite(t[mais_proximo]):
+            return None
+        return (int(self.ids[vagas[mais_proximo]]), float(t[mais_proximo]),
+                float(u[mais_proximo]), float(v[mais_proximo]))
+
+
+# BVHs das malhas consultadas, pela versão (a cena usa uma por malha e
+# nível de detalhe)
+_cache_bvh = {}
+LIMITE_CACHE_BVH = 32
+
+
+def bvh_malha(malha):
+    """Retorna a BVH da malha, construindo-a só quando a malha muda."""
+    bvh = _cache_bvh.get(malha.versao)
+    if bvh is None:
+        if len(_cache_bvh) >= LIMITE_CACHE_BVH:
+            _cache_bvh.clear()
+        bvh = _cache_bvh[malha.versao] = BVH(malha)
+    return bvh
+
+
+def picking_malha(malha, origem, direcao):
+    """
+    Ponto da malha atingido primeiro por um raio (no espaço da malha).
+
+    Returns:
+        tuple: (triangulo, ponto, normal), com a normal interpolada das
+               normais dos vértices pelas coordenadas baricêntricas; None
+               se o raio não atinge a malha
+    """
+    if malha is None or malha.num_triangulos == 0:
+        return None
+    acerto = bvh_malha(malha).intersectar(origem, direcao)
+    if acerto is None:
+        return None
+    triangulo, t, u, v = acerto
+    ponto = np.asarray(origem, dtype=np.float64) + t * np.asarray(direcao, dtype=np.float64)
+    N = malha.normais[malha.indices[3 * triangulo:3 * triangulo + 3]]
+    normal = (1.0 - u - v) * N[0] + u * N[1] + v * N[2]
+    comprimento = np.linalg.norm(normal)
+    if comprimento > 0:
+        normal /= comprimento
+    return triangulo, ponto, normal
+
+
+# ==========================================
+# GRAFO DE CENA (CULLING POR FRUSTUM)
+# ==========================================
+# Objeto 8: cena com milhares de objetos (grafo de cena)
+OBJETO_CENA = 8
+
+# Esfera envolvente de cada malha, pela versão: (centro, raio). Cada edição
+# da extrusão gera uma versão nova (LOD), então o cache tem limite
+_cache_esferas = {}
+LIMITE_CACHE_ESFERAS = 64
+
+
+def esfera_envolvente(malha):
+    """Esfera envolvente da malha (centro da caixa alinhada aos eixos e maior distância a ele)."""
+    if malha.versao not in _cache_esferas:
+        if len(_cache_esferas) >= LIMITE_CACHE_ESFERAS:
+            _cache_esferas.clear()
+        if len(malha.vertices):
+            centro = (malha.vertices.min(axis=0) + malha.vertices.max(axis=0)) / 2.0
+            raio = float(np.sqrt(((malha.vertices - centro) ** 2).sum(axis=1)).max())
+        else:
+            centro, raio = np.zeros(3), 0.0
+        _cache_esferas[malha.versao] = (centro, raio)
+    return _cache_esferas[malha.versao]
+
+
+def planos_frustum(mvp):
+    """
+    Os 6 planos do volume de visão (esquerda, direita, baixo, cima, perto,
+    longe) de uma matriz projeção * view, com as normais para dentro e
+    normalizadas (método de Gribb e Hartmann).
+
+    Returns:
+        np.ndarray: array (6, 4) com (a, b, c, d): a·x + b·y + c·z + d >= 0 dentro
+    """
+    planos = np.array([mvp[3] + mvp[0], mvp[3] - mvp[0],
+                       mvp[3] + mvp[1], mvp[3] - mvp[1],
+                       mvp[3] + mvp[2], mvp[3] - mvp[2]])
+    return planos / np.linalg.norm(planos[:, :3], axis=1)[:, None]
+
+
+class NoCena:
+    """
+    Nó do grafo de cena.
+
+    Atributos:
+        transformacao: matriz 4x4 relativa ao pai
+        malha: Malha desenhada no nó (None para nós que só agrupam filhos)
+        cor: (r, g, b) cor base
+        niveis: Malhas de cada nível de detalhe (a primeira é malha); nós
+                com a mesma lista são agrupados
+        filhos: lista de NoCena
+    """
+
+    def __init__(self, malha=None, transformacao=None, cor=(0.0, 0.5, 1.0), niveis=None):
+        self.transformacao = np.identity(4) if transformacao is None else \
+            np.array(transformacao, dtype=np.float64)
+        self.malha = malha
+        self.cor = tuple(cor)
+        self.niveis = niveis if niveis is not None else ([malha] if malha is not None else [])
+        self.filhos = []
+
+    def adicionar(self, filho):
+        """Adiciona um filho e o retorna."""
+        self.filhos.append(filho)
+        return filho
+
+    @property
+    def esfera(self):
+        """Esfera envolvente da malha no espaço do nó, ou None sem malha."""
+        return None if self.malha is None else esfera_envolvente(self.malha)
+
+
+class GrafoCena:
+    """
+    Grafo de cena com culling por frustum.
+
+    Para o quadro não percorrer os nós um a um, o grafo é "achatado" em
+    arrays (ordem em largura, pais antes dos filhos): transformações
+    locais, índice do pai, nível, esferas envolventes e cores. As matrizes
+    de mundo são calculadas um nível por vez (um produto matricial em
+    lote por nível) e as esferas são testadas contra os 6 planos do
+    frustum de uma vez. O nível de detalhe de cada nó visível sai do
+    tamanho da esfera na tela (escolher_niveis_lod), com a histerese
+    guardada por nó entre as chamadas de visiveis().
+
+    Os arrays são refeitos quando o grafo muda; quem alterar nós ou
+    transformações deve chamar invalidar().
+    """
+
+    def __init__(self, raiz=None):
+        self.raiz = raiz if raiz is not None else NoCena()
+        self._arrays = None
+        self._niveis = None
+
+    def invalidar(self):
+        self._arrays = None
+        self._niveis = None
+
+    def _achatar(self):
+        nos, pais, niveis = [self.raiz], [-1], [0]
+        i = 0
+        while i < len(nos):
+            for filho in nos[i].filhos:
+                nos.append(filho)
+                pais.append(i)
+                niveis.append(niveis[i] + 1)
+            i += 1
+
+        niveis = np.array(niveis)
+        com_malha = np.array([no.malha is not None for no in nos])
+        esferas = [no.esfera or (np.zeros(3), 0.0) for no in nos]
+
+        # Nós com as mesmas malhas (não só a mesma lista) formam um grupo,
+        # desenhado com instâncias
+        grupos = {}
+        for indice, no in enumerate(nos):
+            if no.malha is not None:
+                chave = tuple(map(id, no.niveis))
+                grupos.setdefault(chave, (no.niveis, []))[1].append(indice)
+
+        self._arrays = {
+            "locais": np.array([no.transformacao for no in nos]),
+            "pais": np.array(pais),
+            "por_nivel": [np.flatnonzero(niveis == n) for n in range(1, niveis.max() + 1)],
+            "com_malha": com_malha,
+            "centros": np.array([centro for centro, _ in esferas]),
+            "raios": np.array([raio for _, raio in esferas]),
+            "cores": np.array([no.cor for no in nos]),
+            "num_niveis": np.array([max(len(no.niveis), 1) for no in nos]),
+            "malhas": [no.niveis for no in nos],
+            "grupos": [(malhas, np.array(indices)) for malhas, indices in grupos.values()],
+        }
+        self._niveis = np.full(len(nos), -1)
+        return self._arrays
+
+    @property
+    def arrays(self):
+        return self._arrays if self._arrays is not None else self._achatar()
+
+    @property
+    def num_objetos(self):
+        """Número de nós com malha."""
+        return int(self.arrays["com_malha"].sum())
+
+    def matrizes_mundo(self, modelo=None):
+        """Matrizes de mundo (N, 4, 4) de todos os nós; modelo é aplicado acima da raiz."""
+        arrays = self.arrays
+        mundo = np.empty_like(arrays["locais"])
+        mundo[0] = arrays["locais"][0] if modelo is None else modelo @ arrays["locais"][0]
+        for indices in arrays["por_nivel"]:
+            mundo[indices] = mundo[arrays["pais"][indices]] @ arrays["locais"][indices]
+        return mundo
+
+    def visiveis(self, modelo, view, projecao, altura):
+        """
+        Culling por frustum: testa a esfera envolvente de cada nó (no mundo)
+        contra os planos do volume de visão da câmera, e escolhe o nível de
+        detalhe dos que passam pelo tamanho na tela (altura em pixels).
+
+        Returns:
+            tuple: (mundo, visivel, niveis): matrizes de mundo (N, 4, 4),
+                   máscara (N,) dos nós com malha que ficam (ao menos em
+                   parte) dentro e nível de detalhe (N,) de cada nó
+        """
+        arrays = self.arrays
+        mundo = self.matrizes_mundo(modelo)
+        centros = np.einsum("nij,nj->ni", mundo[:, :3, :3], arrays["centros"]) + mundo[:, :3, 3]
+        # Escala não uniforme: o raio cresce com a maior escala dos eixos
+        raios = arrays["raios"] * np.linalg.norm(mundo[:, :3, :3], axis=1).max(axis=1)
+        planos = planos_frustum(projecao @ view)
+        distancias = centros @ planos[:, :3].T + planos[:, 3]
+        visivel = arrays["com_malha"] & (distancias >= -raios[:, None]).all(axis=1)
+
+        # Nós fora do frustum perdem a histerese: voltam no nível ideal
+        niveis = np.zeros(len(visivel), dtype=np.int64)
+        centros_olho = centros[visivel] @ view[:3, :3].T + view[:3, 3]
+        tamanhos = tamanho_na_tela(centros_olho, raios[visivel], projecao, altura)
+        niveis[visivel] = escolher_niveis_lod(tamanhos, self._niveis[visivel],
+                                              arrays["num_niveis"][visivel])
+        self._niveis = np.where(visivel, niveis, -1)
+        return mundo, visivel, niveis
+
+    def lotes(self, visivel, niveis):
+        """
+        Nós visíveis separados por malha e nível de detalhe.
+
+        Returns:
+            list: (grupo, nivel, malha, indices) de cada lote não vazio
+        """
+        lotes = []
+        for grupo, (malhas, indices) in enumerate(self.arrays["grupos"]):
+            indices = indices[visivel[indices]]
+            for nivel in np.unique(niveis[indices]).tolist():
+                lotes.append((grupo, nivel, malhas[nivel], indices[niveis[indices] == nivel]))
+        return lotes
+
+    def picking(self, origem, direcao):
+        """
+        Ponto atingido primeiro por um raio (no espaço acima da raiz), entre
+        os nós desenhados no último visiveis(), na malha do nível de
+        detalhe em que cada um foi desenhado.
+
+        Só os nós cuja esfera envolvente o raio cruza são testados (na BVH
+        da malha, com o raio levado ao espaço do nó), dos mais próximos aos
+        mais distantes, parando quando a esfera seguinte começa depois do
+        ponto já achado.
+
+        Returns:
+            tuple: (no, triangulo, ponto, normal), com ponto e normal no
+                   espaço acima da raiz; None se o raio não atinge nenhum nó
+        """
+        if self._niveis is None:
+            return None
+        arrays = self.arrays
+        origem = np.asarray(origem, dtype=np.float64)
+        direcao = np.asarray(direcao, dtype=np.float64)
+        mundo = self.matrizes_mundo()
+        centros = np.einsum("nij,nj->ni", mundo[:, :3, :3], arrays["centros"]) + mundo[:, :3, 3]
+        raios = arrays["raios"] * np.linalg.norm(mundo[:, :3, :3], axis=1).max(axis=1)
+
+        unitaria = direcao / np.linalg.norm(direcao)
+        relativos = centros - origem
+        ao_longo = relativos @ unitaria
+        distancias2 = (relativos ** 2).sum(axis=1) - ao_longo ** 2
+        candidatos = np.flatnonzero((self._niveis >= 0) & (distancias2 <= raios ** 2)
+                                    & (ao_longo + raios > 0.0))
+        entradas = ao_longo[candidatos] - raios[candidatos]
+        melhor, distancia_melhor = None, np.inf
+        for i, entrada in zip(candidatos[np.argsort(entradas)].tolist(), np.sort(entradas).tolist()):
+            if entrada > distancia_melhor:
+                break
+            inversa = np.linalg.inv(mundo[i])
+            acerto = picking_malha(arrays["malhas"][i][self._niveis[i]],
+                                   inversa[:3, :3] @ origem + inversa[:3, 3],
+                                   inversa[:3, :3] @ direcao)
+            if acerto is None:
+                continue
+            triangulo, ponto, normal = acerto
+            ponto = mundo[i, :3, :3] @ ponto + mundo[i, :3, 3]
+            distancia = float((ponto - origem) @ unitaria)
+            if distancia < distancia_melhor:
+                normal = inversa[:3, :3].T @ normal
+                normal /= max(np.linalg.norm(normal), 1e-12)
+                melhor, distancia_melhor = (i, triangulo, ponto, normal), distancia
+        return melhor
+
+
+def criar_cena_demonstracao(lado=40, espacamento=3.0, semente=0):
+    """
+    Cena de lado × lado objetos (os 5 objetos padrão, alternados) num chão
+    em y = -2, à frente da câmera fixa e estendendo-se para além do plano
+    longe da projeção. Cada fileira é um nó de grupo com os objetos como
+    filhos, com rotação, escala e cor sorteadas.
+    """
+    aleatorio = np.random.default_rng(semente)
+    niveis = [malhas_lod(objeto) for objeto in sorted(MALHAS_OBJETOS)]
+    raiz = NoCena(transformacao=matriz_translacao(0.0, -2.0, 0.0))
+    for linha in range(lado):
+        fileira = raiz.adicionar(NoCena(transformacao=matriz_translacao(
+            0.0, 0.0, 5.0 - linha * espacamento)))
+        for coluna in range(lado):
+            x = (coluna - (lado - 1) / 2.0) * espacamento
+            transformacao = (matriz_translacao(x, 0.0, 0.0)
+                             @ matriz_rotacao(aleatorio.uniform(0.0, 360.0), 0.0, 1.0, 0.0)
+                             @ matriz_escala(*[aleatorio.uniform(0.5, 1.0)] * 3))
+            malhas = niveis[(linha + coluna) % len(niveis)]
+            fileira.adicionar(NoCena(malhas[0], transformacao, aleatorio.uniform(0.2, 1.0, 3),
+                                     malhas))
+    return GrafoCena(raiz)
+
+
+# Cena do objeto 8 (criada na primeira vez que é desenhada)
+grafo_cena = None
+
+
+def obter_grafo_cena():
+    global grafo_cena
+    if grafo_cena is None:
+        grafo_cena = criar_cena_demonstracao()
+    return grafo_cena
+
+
+# ==========================================
+# GEOMETRIA NA GPU (VBO / VAO)
+# ==========================================
+_suporte_gpu = {"vbo": None, "vao": None}
+
+
+def vbo_disponivel():
+    """True se o contexto OpenGL atual suporta vertex buffer objects (GL 1.5+)."""
+    if _suporte_gpu["vbo"] is None:
+        try:
+            _suporte_gpu["vbo"] = bool(glGenBuffers) and bool(glBufferData)
+        except Exception:
+            _suporte_gpu["vbo"] = False
+    return _suporte_gpu["vbo"]
+
+
+def vao_disponivel():
+    """True se o contexto suporta vertex array objects (GL 3.0+ / ARB_vertex_array_object)."""
+    if _suporte_gpu["vao"] is None:
+        try:
+            _suporte_gpu["vao"] = bool(glGenVertexArrays) and bool(glBindVertexArray)
+        except Exception:
+            _suporte_gpu["vao"] = False
+    return _suporte_gpu["vao"]
+
+
+class GeometriaGPU:
+    """
+    Cópia de uma Malha em buffers na GPU (modo retido).
+
+    - VBO intercalado (posição + normal, float32) e buffer de índices
+      (uint32) para as faces, desenhados com glDrawElements(GL_TRIANGLES)
+    - VBO separado com as arestas do wireframe, desenhado com
+      glDrawArrays(GL_LINES)
+
+    Os dados só são enviados de novo (glBufferData) quando a versão da
+    malha muda. Se houver suporte a VAO, o estado dos vertex arrays fica
+    gravado em um VAO por tipo de desenho, e cada frame custa apenas o
+    bind e o draw call. Funciona no perfil de compatibilidade (pipeline
+    fixa), inclusive no Mesa llvmpipe.
+    """
+
+    def __init__(self):
+        self.versao = None
+        self.vbo_vertices = None
+        self.ibo = None
+        self.vbo_segmentos = None
+        self.vao_triangulos = None
+        self.vao_segmentos = None
+        self.num_indices = 0
+        self.num_segmentos = 0
+
+    def atualizar(self, malha):
+        """Envia a malha para a GPU se ela mudou desde o último envio."""
+        if self.versao == malha.versao:
+            return
+        if self.vbo_vertices is None:
+            self.vbo_vertices, self.ibo, self.vbo_segmentos = glGenBuffers(3)
+
+        intercalado = np.empty((len(malha.vertices), 6), dtype=np.float32)
+        intercalado[:, :3] = malha.vertices
+        intercalado[:, 3:] = malha.normais
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_vertices)
+        glBufferData(GL_ARRAY_BUFFER, intercalado, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, malha.indices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_segmentos)
+        glBufferData(GL_ARRAY_BUFFER, malha.segmentos.astype(np.float32), GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.num_indices = len(malha.indices)
+        self.num_segmentos = len(malha.segmentos)
+        self.versao = malha.versao
+
+        if vao_disponivel() and self.vao_triangulos is None:
+            self.vao_triangulos, self.vao_segmentos = glGenVertexArrays(2)
+            glBindVertexArray(self.vao_triangulos)
+            self._ligar_triangulos()
+            glBindVertexArray(self.vao_segmentos)
+            self._ligar_segmentos()
+            glBindVertexArray(0)
+            self._desligar()
+
+    def _ligar_triangulos(self):
+        stride = 6 * 4
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_vertices)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, stride, None)
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glNormalPointer(GL_FLOAT, stride, ctypes.c_void_p(3 * 4))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ibo)
+
+    def _ligar_segmentos(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo_segmentos)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+
+    def _desligar(self):
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    def desenhar_triangulos(self, instancias=None):
+        """Desenha as faces; com instancias (InstanciasGPU), uma cópia por instância."""
+        if self.num_indices == 0:
+            return
+        if self.vao_triangulos is not None:
+            glBindVertexArray(self.vao_triangulos)
+        else:
+            self._ligar_triangulos()
+        if instancias is None:
+            glDrawElements(GL_TRIANGLES, self.num_indices, GL_UNSIGNED_INT, None)
+        else:
+            instancias.ligar()
+            glDrawElementsInstanced(GL_TRIANGLES, self.num_indices, GL_UNSIGNED_INT, None,
+                                    instancias.quantidade)
+            instancias.desligar()
+        if self.vao_triangulos is not None:
+            glBindVertexArray(0)
+        else:
+            self._desligar()
+
+    def desenhar_segmentos(self):
+        if self.num_segmentos == 0:
+            return
+        if self.vao_segmentos is not None:
+            glBindVertexArray(self.vao_segmentos)
+            glDrawArrays(GL_LINES, 0, 2 * self.num_segmentos)
+            glBindVertexArray(0)
+        else:
+            self._ligar_segmentos()
+            glDrawArrays(GL_LINES, 0, 2 * self.num_segmentos)
+            self._desligar()
+
+
+# Geometrias na GPU por "slot" (ex.: "extrusao", "perfil"); cada slot guarda
+# a última malha enviada e é atualizado quando ela é substituída
+geometrias_gpu = {}
+
+
+def instancias_disponiveis():
+    """True se o contexto suporta desenho instanciado (GL 3.3+ / ARB_instanced_arrays)."""
+    if _suporte_gpu.get("instancias") is None:
+        try:
+            _suporte_gpu["instancias"] = (bool(glDrawElementsInstanced)
+                                          and bool(glVertexAttribDivisor))
+        except Exception:
+            _suporte_gpu["instancias"] = False
+    return _suporte_gpu["instancias"]
+
+
+class InstanciasGPU:
+    """
+    Atributos por instância num VBO de streaming: matriz do modelo, matriz
+    das normais (inversa transposta) e cor de cada cópia da malha.
+
+    Lidos pelo SHADER_VERTICE_INSTANCIAS com glVertexAttribDivisor(1), ou
+    seja, avançam um registro por instância em vez de por vértice. Os
+    dados são reenviados a cada quadro (só as instâncias visíveis).
+    """
+
+    # (atributo do shader, componentes), nas posições PRIMEIRO_ATRIBUTO, ...
+    # Na NVIDIA, as posições 0 a 5 são apelidos de gl_Vertex, do peso, de
+    # gl_Normal, gl_Color, da cor secundária e da neblina: o shader lê
+    # gl_Vertex e gl_Normal, então os atributos genéricos começam na 6
+    PRIMEIRO_ATRIBUTO = 6
+    ATRIBUTOS = (("modelo0", 4), ("modelo1", 4), ("modelo2", 4), ("modelo3", 4),
+                 ("matriz_normal0", 3), ("matriz_normal1", 3), ("matriz_normal2", 3),
+                 ("cor", 3))
+    COMPONENTES = sum(n for _, n in ATRIBUTOS)
+
+    def __init__(self):
+        self.vbo = None
+        self.quantidade = 0
+
+    @classmethod
+    def posicoes(cls):
+        """(atributo, posição) de cada atributo por instância, para glBindAttribLocation."""
+        return [(nome, posicao) for posicao, (nome, _) in
+                enumerate(cls.ATRIBUTOS, start=cls.PRIMEIRO_ATRIBUTO)]
+
+    @classmethod
+    def registros(cls, mundo, cores):
+        """Registros (N, COMPONENTES) float32; as matrizes vão em ordem de colunas."""
+        registros = np.empty((len(mundo), cls.COMPONENTES), dtype=np.float32)
+        registros[:, :16] = mundo.transpose(0, 2, 1).reshape(-1, 16)
+        normais = np.linalg.inv(mundo[:, :3, :3]).transpose(0, 2, 1)
+        registros[:, 16:25] = normais.transpose(0, 2, 1).reshape(-1, 9)
+        registros[:, 25:] = cores
+        return registros
+
+    def enviar(self, mundo, cores):
+        if self.vbo is None:
+            self.vbo = glGenBuffers(1)
+        registros = self.registros(mundo, cores)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, registros, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.quantidade = len(registros)
+
+    def ligar(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        stride = 4 * self.COMPONENTES
+        deslocamento = 0
+        for posicao, (_, componentes) in enumerate(self.ATRIBUTOS, start=self.PRIMEIRO_ATRIBUTO):
+            glEnableVertexAttribArray(posicao)
+            glVertexAttribPointer(posicao, componentes, GL_FLOAT, GL_FALSE, stride,
+                                  ctypes.c_void_p(deslocamento))
+            glVertexAttribDivisor(posicao, 1)
+            deslocamento += 4 * componentes
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def desligar(self):
+        # Desfaz o estado (guardado no VAO, se houver) para os desenhos sem instâncias
+        for posicao in range(self.PRIMEIRO_ATRIBUTO, self.PRIMEIRO_ATRIBUTO + len(self.ATRIBUTOS)):
+            glVertexAttribDivisor(posicao, 0)
+            glDisableVertexAttribArray(posicao)
+
+
+# Atributos por instância por "slot", como geometrias_gpu
+instancias_gpu = {}
+
+
+def desenhar_malha_imediato(malha, wireframe=False):
+    """Desenha uma Malha em modo imediato (glBegin/glEnd), um vértice por chamada."""
+    if wireframe:
+        glBegin(GL_LINES)
+        for inicio, fim in malha.segmentos.tolist():
+            glVertex3f(*inicio); glVertex3f(*fim)
+        glEnd()
+        return
+
+    vertices = malha.vertices.tolist()
+    normais = malha.normais.tolist()
+    glBegin(GL_TRIANGLES)
+    for i in malha.indices.tolist():
+        glNormal3f(*normais[i])
+        glVertex3f(*vertices[i])
+    glEnd()
+
+
+def desenhar_malha(malha, slot, wireframe=False):
+    """
+    Desenha uma Malha pelo caminho retido (VBO) ou em modo imediato.
+
+    Usa VBOs quando usar_vbo está ligado e o contexto os suporta; a cópia
+    na GPU do slot só é reenviada quando a malha muda. Caso contrário (ou
+    se a criação dos buffers falhar), desenha em modo imediato.
+
+    Args:
+        malha: Malha a desenhar
+        slot: nome da geometria na GPU (uma por objeto desenhado)
+        wireframe: True desenha as arestas (malha.segmentos) em vez das faces
+    """
+    global usar_vbo
+
+    if usar_vbo and vbo_disponivel():
+        try:
+            geometria = geometrias_gpu.setdefault(slot, GeometriaGPU())
+            geometria.atualizar(malha)
+            if wireframe:
+                geometria.desenhar_segmentos()
+            else:
+                geometria.desenhar_triangulos()
+            return
+        except Exception as erro:
+            print(f"VBO indisponível ({erro}); usando modo imediato")
+            _suporte_gpu["vbo"] = False
+
+    desenhar_malha_imediato(malha, wireframe)
+
+
+# ==========================================
+# PHONG POR FRAGMENTO (GLSL)
+# ==========================================
+# Mesmo modelo de ContextoSombreamento.shade / phong_shading_point, avaliado
+# por fragmento. GLSL 1.20 (perfil de compatibilidade): os atributos vêm de
+# gl_Vertex/gl_Normal/gl_Color, então os mesmos VBOs (glVertexPointer) e o
+# modo imediato servem ao shader e à pipeline fixa. A iluminação é feita no
+# espaço da câmera, com luz e olho transformados pela view na CPU: como a
+# view é rígida, dá o mesmo resultado que no espaço do mundo.
+SHADER_VERTICE_PHONG = """
+#version 120
+varying vec3 posicao;
+varying vec3 normal;
+
+void main() {
+    posicao = vec3(gl_ModelViewMatrix * gl_Vertex);
+    normal = gl_NormalMatrix * gl_Normal;
+    gl_FrontColor = gl_Color;
+    gl_Position = ftransform();
+}
+"""
+
+# Variante do vertex shader para desenho instanciado (grafo de cena): a
+# matriz do modelo, a das normais e a cor vêm por instância (InstanciasGPU);
+# gl_ModelViewMatrix tem só a view
+SHADER_VERTICE_INSTANCIAS = """
+#version 120
+attribute vec4 modelo0;
+attribute vec4 modelo1;
+attribute vec4 modelo2;
+attribute vec4 modelo3;
+attribute vec3 matriz_normal0;
+attribute vec3 matriz_normal1;
+attribute vec3 matriz_normal2;
+attribute vec3 cor;
+varying vec3 posicao;
+varying vec3 normal;
+
+void main() {
+    mat4 modelo = mat4(modelo0, modelo1, modelo2, modelo3);
+    mat3 matriz_normal = mat3(matriz_normal0, matriz_normal1, matriz_normal2);
+    vec4 olho = gl_ModelViewMatrix * (modelo * gl_Vertex);
+    posicao = olho.xyz;
+    normal = gl_NormalMatrix * (matriz_normal * gl_Normal);
+    gl_FrontColor = vec4(cor, 1.0);
+    gl_Position = gl_ProjectionMatrix * olho;
+}
+"""
+
+SHADER_FRAGMENTO_PHONG = """
+#version 120
+uniform vec3 luz;
+uniform vec3 olho;
+uniform float ka;
+uniform float kd;
+uniform float ks;
+uniform float shininess;
+varying vec3 posicao;
+varying vec3 normal;
+
+void main() {
+    vec3 N = length(normal) > 0.0 ? normalize(normal) : vec3(0.0, 0.0, 1.0);
+    vec3 L = normalize(luz - posicao);
+    vec3 V = normalize(olho - posicao);
+
+    // Ambiente + Difuso
+    float NdotL = max(dot(N, L), 0.0);
+    float I = ka + kd * NdotL;
+
+    // Especular (apenas onde a face recebe luz)
+    if (NdotL > 0.0) {
+        vec3 R = 2.0 * NdotL * N - L;
+        I += ks * pow(max(dot(R, V), 0.0), shininess);
+    }
+
+    gl_FragColor = vec4(clamp(I, 0.0, 1.0) * gl_Color.rgb, gl_Color.a);
+}
+"""
+
+
+class ProgramaPhongGLSL:
+    """
+    Programa GLSL do modelo de iluminação 3 (Phong por fragmento).
+
+    Compilado na primeira vez que é usado. Se o contexto não suportar
+    shaders ou a compilação falhar, disponivel() retorna False e o modo 3
+    usa o Phong da pipeline fixa (como o modo 2, sem o scanline).
+
+    Args:
+        fonte_vertice: vertex shader (o fragment shader é sempre o Phong)
+        atributos: pares (nome, posição) dos atributos do vertex shader,
+                   ligados antes do link
+        alternativa: o que é usado no lugar do programa, para a mensagem
+                     de erro
+    """
+
+    UNIFORMES = ("luz", "olho", "ka", "kd", "ks", "shininess")
+
+    def __init__(self, fonte_vertice=SHADER_VERTICE_PHONG, atributos=(), nome="Phong GLSL",
+                 alternativa="Phong da pipeline fixa"):
+        self.fonte_vertice = fonte_vertice
+        self.atributos = tuple(atributos)
+        self.nome = nome
+        self.alternativa = alternativa
+        self.programa = None
+        self.erro = None
+        self.locais = {}
+
+    def disponivel(self):
+        """True se o programa foi (ou pôde ser) compilado e ligado."""
+        if self.programa is None and self.erro is None:
+            try:
+                self.programa = self._compilar()
+            except Exception as erro:
+                self.erro = str(erro)
+                print(f"{self.nome} indisponível ({erro}); usando {self.alternativa}")
+        return self.programa is not None
+
+    @staticmethod
+    def _compilar_shader(tipo, fonte):
+        shader = glCreateShader(tipo)
+        glShaderSource(shader, fonte)
+        glCompileShader(shader)
+        if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+            log = glGetShaderInfoLog(shader)
+            glDeleteShader(shader)
+            raise RuntimeError(log.decode(errors="replace") if isinstance(log, bytes) else log)
+        return shader
+
+    def _compilar(self):
+        vertice = self._compilar_shader(GL_VERTEX_SHADER, self.fonte_vertice)
+        fragmento = self._compilar_shader(GL_FRAGMENT_SHADER, SHADER_FRAGMENTO_PHONG)
+        programa = glCreateProgram()
+        glAttachShader(programa, vertice)
+        glAttachShader(programa, fragmento)
+        for atributo, posicao in self.atributos:
+            glBindAttribLocation(programa, posicao, atributo)
+        glLinkProgram(programa)
+        # Os shaders ficam presos ao programa; só são liberados com ele
+        glDeleteShader(vertice)
+        glDeleteShader(fragmento)
+        if not glGetProgramiv(programa, GL_LINK_STATUS):
+            log = glGetProgramInfoLog(programa)
+            glDeleteProgram(programa)
+            raise RuntimeError(log.decode(errors="replace") if isinstance(log, bytes) else log)
+        self.locais = {nome: glGetUniformLocation(programa, nome) for nome in self.UNIFORMES}
+        return programa
+
+    def ativar(self, contexto, view):
+        """
+        Liga o programa com as constantes do frame.
+
+        Args:
+            contexto: ContextoSombreamento (luz e olho no espaço do mundo,
+                      coeficientes do material)
+            view: matriz 4x4 mundo → câmera
+        """
+        luz = view[:3, :3] @ contexto.luz + view[:3, 3]
+        olho = view[:3, :3] @ contexto.olho + view[:3, 3]
+        glUseProgram(self.programa)
+        glUniform3f(self.locais["luz"], *luz.tolist())
+        glUniform3f(self.locais["olho"], *olho.tolist())
+        glUniform1f(self.locais["ka"], contexto.ka)
+        glUniform1f(self.locais["kd"], contexto.kd)
+        glUniform1f(self.locais["ks"], contexto.ks)
+        glUniform1f(self.locais["shininess"], contexto.shininess)
+
+    def desativar(self):
+        glUseProgram(0)
+
+
+programa_phong = ProgramaPhongGLSL()
+programa_instancias = ProgramaPhongGLSL(
+    SHADER_VERTICE_INSTANCIAS, InstanciasGPU.posicoes(),
+    "Desenho instanciado", "um desenho por objeto")
+
+
+def desenhar_malha_iluminada(malha, slot):
+    """
+    Desenha as faces de uma Malha com o modelo de iluminação atual.
+
+    No modo 3 (Phong GLSL) as faces passam pelo programa_phong; nos demais
+    (ou sem suporte a shaders), pela pipeline fixa.
+    """
+    global modelo_iluminacao
+
+    if modelo_iluminacao != 3 or not programa_phong.disponivel():
+        desenhar_malha(malha, slot)
+        return
+    programa_phong.ativar(contexto_quadro, view_quadro)
+    try:
+        desenhar_malha(malha, slot)
+    finally:
+        programa_phong.desativar()
+
+
+# ==========================================
+# TRIANGULAÇÃO DE POLÍGONOS (PARTIÇÃO MONÓTONA)
+# ==========================================
+class PoligonoNaoSimples(ValueError):
+    """O contorno ou um furo cruza (ou toca) a si mesmo ou a outro anel."""
+
+
+# Diferença relativa máxima entre a área dos triângulos e a do polígono
+TOLERANCIA_AREA_TRIANGULACAO = 1e-9
+
+
+def area_sinalizada(pontos):
+    """Área com sinal de um anel 2D (positiva = anti-horário)."""
+    pontos = np.asarray(pontos, dtype=np.float64)
+    # Centralizar evita o cancelamento numérico com coordenadas grandes
+    x, y = (pontos - pontos.mean(axis=0)).T
+    return 0.5 * float(np.dot(x, np.roll(y, -1) - np.roll(y, 1)))
+
+
+def limpar_anel(anel):
+    """Remove pontos repetidos consecutivos e o fechamento (último == primeiro)."""
+    limpo = []
+    for ponto in anel:
+        ponto = (float(ponto[0]), float(ponto[1]))
+        if not limpo or ponto != limpo[-1]:
+            limpo.append(ponto)
+    while len(limpo) > 1 and limpo[0] == limpo[-1]:
+        limpo.pop()
+    return limpo
+
+
+def remover_pontas(anel):
+    """
+    limpar_anel mais a remoção das pontas de área zero: pontos em que o
+    anel vai até lá e volta pelo mesmo segmento (a aresta seguinte é
+    colinear e no sentido oposto). Tirar uma ponta pode criar uma
+    repetição ou outra ponta, então repete até estabilizar.
+    """
+    anel = limpar_anel(anel)
+    while len(anel) >= 3:
+        P = np.array(anel)
+        ida = P - np.roll(P, 1, axis=0)
+        volta = np.roll(P, -1, axis=0) - P
+        ponta = ((ida[:, 0] * volta[:, 1] - ida[:, 1] * volta[:, 0] == 0)
+                 & ((ida * volta).sum(axis=1) <= 0))
+        if not ponta.any():
+            break
+        if ponta.all():
+            return []
+        # Pontas vizinhas saem em passadas diferentes
+        ponta &= ~np.roll(ponta, 1)
+        anel = limpar_anel([p for p, sai in zip(anel, ponta.tolist()) if not sai])
+    return anel
+
+
+def orientar_anel(anel, anti_horario=True):
+    """Anel sem repetições e na orientação pedida (contorno: anti-horário; furo: horário)."""
+    anel = limpar_anel(anel)
+    if len(anel) >= 3 and (area_sinalizada(anel) > 0) != anti_horario:
+        anel.reverse()
+    return anel
+
+
+def _acima(p, q):
+    """True se p vem antes de q na varredura (maior y; em empate, menor x)."""
+    return p[1] > q[1] or (p[1] == q[1] and p[0] < q[0])
+
+
+def _cruzamento(o, a, b):
+    """Componente Z de (a - o) × (b - o)."""
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _diagonais_monotonas(pontos, proximo, anterior):
+    """
+    Varredura de cima para baixo que divide o polígono em partes y-monótonas.
+
+    Classifica cada vértice (início, fim, divisão, junção ou regular) e
+    mantém na estrutura de status as arestas com o interior à direita,
+    ordenadas da esquerda para a direita, cada uma com seu "ajudante".
+    Vértices de divisão e de junção recebem diagonais para o ajudante da
+    aresta à esquerda (de Berg et al., Computational Geometry, cap. 3).
+
+    Returns:
+        list: pares (a, b) de vértices ligados por diagonais
+    """
+    INICIO, FIM, DIVISAO, JUNCAO, REGULAR = range(5)
+
+    n = len(pontos)
+    tipo = [REGULAR] * n
+    for v in range(n):
+        a, p, b = pontos[anterior[v]], pontos[v], pontos[proximo[v]]
+        convexo = _cruzamento(a, p, b) > 0
+        if _acima(p, a) and _acima(p, b):
+            tipo[v] = INICIO if convexo else DIVISAO
+        elif _acima(a, p) and _acima(b, p):
+            tipo[v] = FIM if convexo else JUNCAO
+
+    # Aresta e = (e, proximo[e]); x dela na altura y da varredura
+    def x_aresta(e, y):
+        (x1, y1), (x2, y2) = pontos[e], pontos[proximo[e]]
+        if y1 == y2:
+            return max(x1, x2)
+        return x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+
+    status = []    # arestas ordenadas da esquerda para a direita
+    ajudante = {}
+    diagonais = []
+
+    def posicao(x, y):
+        # Número de arestas do status com x <= x na altura y (busca binária)
+        baixo, alto = 0, len(status)
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if x_aresta(status[meio], y) <= x:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def aresta_a_esquerda(v):
+        x, y = pontos[v]
+        k = posicao(x, y)
+        if k == 0:
+            raise PoligonoNaoSimples("nenhuma aresta à esquerda do vértice")
+        return status[k - 1]
+
+    def inserir(e, v):
+        status.insert(posicao(*pontos[v]), e)
+        ajudante[e] = v
+
+    def ligar_se_juncao(v, e):
+        if tipo[ajudante[e]] == JUNCAO:
+            diagonais.append((v, ajudante[e]))
+
+    ordem = sorted(range(n), key=lambda v: (-pontos[v][1], pontos[v][0]))
+    for v in ordem:
+        t = tipo[v]
+        anterior_v = anterior[v]
+        if t == INICIO:
+            inserir(v, v)
+        elif t == FIM:
+            ligar_se_juncao(v, anterior_v)
+            status.remove(anterior_v)
+        elif t == DIVISAO:
+            e = aresta_a_esquerda(v)
+            diagonais.append((v, ajudante[e]))
+            ajudante[e] = v
+            inserir(v, v)
+        elif t == JUNCAO:
+            ligar_se_juncao(v, anterior_v)
+            status.remove(anterior_v)
+            e = aresta_a_esquerda(v)
+            ligar_se_juncao(v, e)
+            ajudante[e] = v
+        elif _acima(pontos[anterior_v], pontos[v]):
+            # Regular na cadeia esquerda (interior à direita)
+            ligar_se_juncao(v, anterior_v)
+            status.remove(anterior_v)
+            inserir(v, v)
+        else:
+            # Regular na cadeia direita
+            e = aresta_a_esquerda(v)
+            ligar_se_juncao(v, e)
+            ajudante[e] = v
+    return diagonais
+
+
+def _faces_com_diagonais(pontos, proximo, diagonais):
+    """
+    Percorre as faces formadas pelos anéis mais as diagonais.
+
+    Cada face é retornada como lista de vértices em ordem anti-horária. Só
+    os vértices que recebem diagonais precisam da ordenação angular dos
+    vizinhos; nos demais, a face segue o próprio anel.
+    """
+    vizinhos = {}
+    for a, b in diagonais:
+        vizinhos.setdefault(a, []).append(b)
+        vizinhos.setdefault(b, []).append(a)
+    anterior = {b: a for a, b in enumerate(proximo)}
+    for v, lista in vizinhos.items():
+        lista += [proximo[v], anterior[v]]
+        x, y = pontos[v]
+        lista.sort(key=lambda w: math.atan2(pontos[w][1] - y, pontos[w][0] - x))
+
+    def seguinte(u, v):
+        # A partir de u -> v, a próxima aresta da face à esquerda é o
+        # primeiro vizinho de v no sentido horário depois de u
+        if v not in vizinhos:
+            return proximo[v]
+        lista = vizinhos[v]
+        return lista[lista.index(u) - 1]
+
+    semi_arestas = [(v, proximo[v]) for v in range(len(pontos))]
+    semi_arestas += [(a, b) for a, b in diagonais] + [(b, a) for a, b in diagonais]
+    visitadas = set()
+    faces = []
+    for inicio in semi_arestas:
+        if inicio in visitadas:
+            continue
+        face = []
+        u, v = inicio
+        while (u, v) not in visitadas:
+            visitadas.add((u, v))
+            face.append(u)
+            u, v = v, seguinte(u, v)
+        faces.append(face)
+    return faces
+
+
+def _triangular_monotono(pontos, face):
+    """Triangula uma face y-monótona (anti-horária) em O(n) com uma pilha."""
+    if len(face) == 3:
+        return [tuple(face)]
+    chave = lambda v: (-pontos[v][1], pontos[v][0])
+    k_topo = min(range(len(face)), key=lambda k: chave(face[k]))
+    k_base = max(range(len(face)), key=lambda k: chave(face[k]))
+
+    # Do topo até a base, no sentido anti-horário, fica a cadeia esquerda
+    esquerda = set()
+    k = k_topo
+    while k != k_base:
+        esquerda.add(face[k])
+        k = (k + 1) % len(face)
+
+    ordem = sorted(face, key=chave)
+    triangulos = []
+    pilha = [ordem[0], ordem[1]]
+    for u in ordem[2:-1]:
+        if (u in esquerda) != (pilha[-1] in esquerda):
+            # Cadeia oposta: liga u a todos os vértices da pilha
+            for k in range(len(pilha) - 1):
+                triangulos.append((u, pilha[k], pilha[k + 1]))
+            pilha = [pilha[-1], u]
+        else:
+            # Mesma cadeia: corta enquanto o vértice do meio for convexo
+            ultimo = pilha.pop()
+            pu = pontos[u]
+            while pilha:
+                s = pilha[-1]
+                if u in esquerda:
+                    convexo = _cruzamento(pontos[s], pontos[ultimo], pu) > 0
+                else:
+                    convexo = _cruzamento(pu, pontos[ultimo], pontos[s]) > 0
+                if not convexo:
+                    break
+                triangulos.append((u, ultimo, s))
+                ultimo = pilha.pop()
+            pilha += [ultimo, u]
+    u = ordem[-1]
+    for k in range(len(pilha) - 1):
+        triangulos.append((u, pilha[k], pilha[k + 1]))
+    return triangulos
+
+
+def triangular_poligono(contorno, furos=()):
+    """
+    Triangula um polígono simples (côncavo ou convexo), com furos opcionais.
+
+    Partição em partes y-monótonas por varredura seguida da triangulação
+    linear de cada parte. A varredura faz O(n log n) comparações (busca
+    binária no status), mas o status é uma lista Python: inserir e remover
+    deslocam as arestas seguintes, O(n) cópias em C cada, então o pior
+    caso é O(n²) (na prática, pequeno perto do resto até dezenas de
+    milhares de pontos). Os anéis podem vir em qualquer orientação: o
+    contorno é tratado como anti-horário e os furos como horários.
+    Pontos repetidos e pontas de área zero são removidos antes
+    (remover_pontas).
+
+    Args:
+        contorno: lista de pontos (x, y) do contorno externo
+        furos: lista de anéis (listas de pontos) dentro do contorno
+
+    Returns:
+        tuple: (pontos, indices) - pontos (n, 2) com o contorno seguido dos
+               furos (já limpos e orientados) e indices (T, 3) int64 com
+               os triângulos, todos anti-horários
+
+    Raises:
+        PoligonoNaoSimples: se um anel cruza ou toca a si mesmo ou a outro
+    """
+    aneis = [orientar_anel(remover_pontas(contorno), True)]
+    aneis += [orientar_anel(remover_pontas(furo), False) for furo in furos]
+    aneis = [anel for anel in aneis if len(anel) >= 3]
+    if not aneis or area_sinalizada(aneis[0]) <= 0:
+        return np.empty((0, 2)), np.empty((0, 3), dtype=np.int64)
+
+    pontos = [p for anel in aneis for p in anel]
+    proximo, anterior = [], []
+    inicio = 0
+    for anel in aneis:
+        m = len(anel)
+        proximo += [inicio + (k + 1) % m for k in range(m)]
+        anterior += [inicio + (k - 1) % m for k in range(m)]
+        inicio += m
+
+    diagonais = _diagonais_monotonas(pontos, proximo, anterior)
+    triangulos = []
+    for face in _faces_com_diagonais(pontos, proximo, diagonais):
+        if len(face) < 3:
+            raise PoligonoNaoSimples("face com menos de 3 vértices")
+        triangulos += _triangular_monotono(pontos, face)
+
+    P = np.array(pontos)
+    T = np.array(triangulos, dtype=np.int64).reshape(-1, 3)
+    A, B, C = P[T[:, 0]], P[T[:, 1]], P[T[:, 2]]
+    cruzamentos = (B[:, 0] - A[:, 0]) * (C[:, 1] - A[:, 1]) - (B[:, 1] - A[:, 1]) * (C[:, 0] - A[:, 0])
+    # Garante a orientação anti-horária (as cadeias podem inverter a ordem)
+    horario = cruzamentos < 0
+    T[horario] = T[horario][:, [0, 2, 1]]
+
+    # Anéis que se cruzam podem passar pela varredura: os triângulos então
+    # não cobrem exatamente a área do contorno menos a dos furos
+    areas = [abs(area_sinalizada(anel)) for anel in aneis]
+    coberta = 0.5 * float(np.abs(cruzamentos).sum())
+    if abs(coberta - (areas[0] - sum(areas[1:]))) > TOLERANCIA_AREA_TRIANGULACAO * sum(areas):
+        raise PoligonoNaoSimples("a área dos triângulos difere da área do polígono")
+    return P, T
+
+
+def triangular_em_leque(contorno):
+    """Triangulação em leque a partir do ponto [0] (só é correta para polígonos convexos)."""
+    P = np.array(limpar_anel(contorno), dtype=np.float64).reshape(-1, 2)
+    j = np.arange(1, len(P) - 1)
+    return P, np.column_stack([np.zeros_like(j), j, j + 1])
+
+
+# Triangulações das tampas, por perfil (contorno + furos); mudar a altura ou
+# os segmentos da extrusão não refaz a triangulação
+_cache_triangulacao = {}
+LIMITE_CACHE_TRIANGULACAO = 32
+
+
+def _triangulacao_perfil(contorno, furos):
+    """(pontos, indices, simples) do perfil, em cache por conteúdo."""
+    chave = (tuple(map(tuple, contorno)), tuple(tuple(map(tuple, furo)) for furo in furos))
+    resultado = _cache_triangulacao.get(chave)
+    if resultado is None:
+        try:
+            resultado = triangular_poligono(contorno, furos) + (True,)
+        except PoligonoNaoSimples:
+            resultado = triangular_em_leque(contorno) + (False,)
+        if len(_cache_triangulacao) >= LIMITE_CACHE_TRIANGULACAO:
+            _cache_triangulacao.clear()
+        _cache_triangulacao[chave] = resultado
+    return resultado
+
+
+def triangular_perfil(contorno, furos=()):
+    """
+    triangular_poligono com cache por conteúdo do perfil.
+
+    Se o perfil não for simples (PoligonoNaoSimples: um anel cruza ou
+    toca a si mesmo ou a outro), usa o leque a partir do ponto [0], como
+    as tampas eram feitas antes.
+    """
+    return _triangulacao_perfil(contorno, furos)[:2]
+
+
+def perfil_simples(contorno, furos=()):
+    """True se triangular_perfil usa a partição monótona (e não o leque)."""
+    return _triangulacao_perfil(contorno, furos)[2]
+
+
+# ==========================================
+# AUXILIARES PARA EXTRUSÃO
+# ==========================================
+def calcular_normal_face(p1, p2, p3):
+    """
+    Calcula o vetor normal de uma face triangular.
+    
+    Usa o produto vetorial (cross product) de dois vetores da face:
+    N = (p2 - p1) × (p3 - p1)
+    
+    O vetor normal é perpendicular à superfície e aponta "para fora" da face.
+    Essencial para cálculos de iluminação (determina quanto de luz atinge a face).
+    
+    Args:
         p1, p2, p3: Vértices do triângulo [x, y, z] em ordem anti-horária
         
     Returns:
@@ -460,6 +4033,221 @@ def calcular_normal_face(p1, p2, p3):
     return [0, 0, 1]  # Fallback para face degenerada
 
 
+def calcular_normais_faces(p1, p2, p3):
+    """
+    Versão vetorizada de calcular_normal_face para vários triângulos.
+
+    Args:
+        p1, p2, p3: arrays (T, 3) com os vértices de cada triângulo
+
+    Returns:
+        np.ndarray: array (T, 3) de normais normalizadas ([0, 0, 1] nas
+                    faces degeneradas)
+    """
+    N = np.cross(p2 - p1, p3 - p1)
+    length = np.sqrt(N[:, 0]**2 + N[:, 1]**2 + N[:, 2]**2)
+    degeneradas = length == 0
+    N[~degeneradas] /= length[~degeneradas, None]
+    N[degeneradas] = (0.0, 0.0, 1.0)
+    return N
+
+
+def fechar_perfil(perfil):
+    """Retorna o perfil como array (n, 2), repetindo o 1º ponto no final."""
+    perfil = list(perfil)
+    if perfil[0] != perfil[-1]:
+        perfil.append(perfil[0])
+    return np.array(perfil, dtype=np.float64)
+
+
+def gerar_laterais_extrusao(pontos, altura, num_seg):
+    """Faces laterais de um anel fechado (n, 2): (vertices (T, 3, 3), normais (T, 3))."""
+    num_pontos = len(pontos)
+
+    # Faces laterais: quads (j, j+1) entre os níveis i e i+1
+    zs = (np.arange(num_seg + 1) / num_seg) * altura
+    a = pontos[:-1]
+    b = pontos[1:]
+    z1 = np.repeat(zs[:-1], num_pontos - 1)
+    z2 = np.repeat(zs[1:], num_pontos - 1)
+    a = np.tile(a, (num_seg, 1))
+    b = np.tile(b, (num_seg, 1))
+    p1 = np.column_stack([a, z1])
+    p2 = np.column_stack([b, z1])
+    p3 = np.column_stack([a, z2])
+    p4 = np.column_stack([b, z2])
+    n1 = calcular_normais_faces(p1, p2, p3)
+    n2 = calcular_normais_faces(p2, p4, p3)
+    laterais = np.stack([np.stack([p1, p2, p3], axis=1),
+                         np.stack([p2, p4, p3], axis=1)], axis=1).reshape(-1, 3, 3)
+    normais_laterais = np.stack([n1, n2], axis=1).reshape(-1, 3)
+    return laterais, normais_laterais
+
+
+def gerar_triangulos_extrusao(perfil, altura, num_seg, furos=()):
+    """
+    Gera os triângulos da extrusão linear de um perfil 2D.
+
+    Laterais: cada quad entre dois níveis vira 2 triângulos; o contorno é
+    percorrido no sentido anti-horário e os furos no horário, para que as
+    normais apontem para fora do sólido. Base e topo: triangulação por
+    partição monótona (triangular_perfil), correta para perfis côncavos e
+    com furos e guardada em cache junto com o perfil.
+
+    Args:
+        perfil: lista de pontos (x, y) (pelo menos 3)
+        altura: altura da extrusão ao longo de Z
+        num_seg: número de segmentos ao longo da altura
+        furos: lista de anéis (x, y) recortados do perfil
+
+    Returns:
+        tuple: (vertices, normais) - vertices (T, 3, 3) com os 3 vértices de
+               cada triângulo e normais (T, 3) com a normal de cada face
+    """
+    aneis = [orientar_anel(perfil, True)] + [orientar_anel(furo, False) for furo in furos]
+    partes = [gerar_laterais_extrusao(fechar_perfil(anel), altura, num_seg)
+              for anel in aneis if len(anel) >= 3]
+
+    # Base (z=0) e topo (z=altura) a partir dos índices em cache
+    pontos, indices = triangular_perfil(perfil, furos)
+    for z, invertida in ((0.0, True), (altura, False)):
+        nivel = np.column_stack([pontos, np.full(len(pontos), z)])
+        q1, q2, q3 = nivel[indices[:, 0]], nivel[indices[:, 1]], nivel[indices[:, 2]]
+        # A base aponta para -Z (normal calculada com a ordem invertida)
+        partes.append((np.stack([q1, q2, q3], axis=1),
+                       calcular_normais_faces(q1, q3, q2) if invertida
+                       else calcular_normais_faces(q1, q2, q3)))
+
+    vertices = np.concatenate([v for v, _ in partes]).reshape(-1, 3, 3)
+    normais = np.concatenate([n for _, n in partes]).reshape(-1, 3)
+    return vertices, normais
+
+
+def gerar_segmentos_extrusao(perfil, altura, num_seg, furos=()):
+    """
+    Gera as arestas do wireframe da extrusão (anéis + verticais).
+
+    Returns:
+        np.ndarray: array (S, 2, 3) com os dois extremos de cada segmento
+    """
+    if furos:
+        return np.concatenate([gerar_segmentos_extrusao(anel, altura, num_seg)
+                               for anel in [perfil] + list(furos)])
+    pontos = fechar_perfil(perfil)
+    zs = (np.arange(num_seg + 1) / num_seg) * altura
+    grade = np.empty((num_seg + 1, len(pontos), 3))
+    grade[:, :, :2] = pontos
+    grade[:, :, 2] = zs[:, None]
+
+    # Anéis: pontos consecutivos de cada nível (o perfil já está fechado)
+    aneis = np.stack([grade[:, :-1], grade[:, 1:]], axis=2).reshape(-1, 2, 3)
+    # Verticais: o mesmo ponto em níveis consecutivos
+    verticais = np.stack([grade[:-1], grade[1:]], axis=2).reshape(-1, 2, 3)
+    return np.concatenate([aneis, verticais])
+
+
+def _mesclar_niveis(zs, grade):
+    """
+    Níveis de uma grade de anéis (L, n, 3) que não podem ser removidos.
+
+    Um nível intermediário é descartado quando, em todas as colunas, ele é
+    colinear com os vizinhos (os quads acima e abaixo são coplanares). Na
+    extrusão linear só restam a base e o topo.
+    """
+    manter = [0]
+    for k in range(1, len(zs) - 1):
+        antes = grade[k] - grade[manter[-1]]
+        depois = grade[k + 1] - grade[k]
+        if not np.allclose(np.cross(antes, depois), 0.0, atol=1e-12):
+            manter.append(k)
+    manter.append(len(zs) - 1)
+    return manter
+
+
+def gerar_malha_extrusao_indexada(perfil, altura, num_seg, furos=(), angulo_suavizacao=30.0):
+    """
+    Malha indexada da extrusão, com vértices compartilhados.
+
+    - Laterais: um anel de vértices por nível, compartilhado entre os quads
+      vizinhos; níveis coplanares são mesclados (_mesclar_niveis), então a
+      extrusão linear usa só os anéis da base e do topo
+    - Normais por vértice: em cada ponto do perfil, se o ângulo entre as
+      faces vizinhas for menor ou igual a angulo_suavizacao (graus), o
+      vértice é único e recebe a média das normais; senão é duplicado,
+      um com a normal de cada face (aresta viva)
+    - Base e topo: os pontos do perfil com os índices de triangular_perfil
+
+    O wireframe mantém os num_seg segmentos de gerar_segmentos_extrusao.
+    """
+    aneis = [orientar_anel(perfil, True)] + [orientar_anel(furo, False) for furo in furos]
+    aneis = [np.array(anel) for anel in aneis if len(anel) >= 3]
+    zs = (np.arange(num_seg + 1) / num_seg) * altura
+    limite = math.cos(math.radians(angulo_suavizacao))
+
+    vertices, normais, indices = [], [], []
+    inicio = 0
+    for anel in aneis:
+        n = len(anel)
+        # Normal (para fora) da face entre os pontos j e j+1
+        aresta = np.roll(anel, -1, axis=0) - anel
+        faces = np.column_stack([aresta[:, 1], -aresta[:, 0], np.zeros(n)])
+        faces = _normalizar_linhas(faces)
+        anteriores = np.roll(faces, 1, axis=0)
+        suave = np.sum(faces * anteriores, axis=1) >= limite
+
+        # Colunas: 1 por ponto suave, 2 por ponto em aresta viva
+        fim_face_anterior = np.empty(n, dtype=np.int64)
+        inicio_face = np.empty(n, dtype=np.int64)
+        colunas_pontos, colunas_normais = [], []
+        for j in range(n):
+            if suave[j]:
+                fim_face_anterior[j] = inicio_face[j] = len(colunas_pontos)
+                colunas_pontos.append(anel[j])
+                colunas_normais.append(faces[j] + anteriores[j])
+            else:
+                fim_face_anterior[j] = len(colunas_pontos)
+                inicio_face[j] = len(colunas_pontos) + 1
+                colunas_pontos += [anel[j], anel[j]]
+                colunas_normais += [anteriores[j], faces[j]]
+        colunas_pontos = np.array(colunas_pontos)
+        colunas_normais = _normalizar_linhas(np.array(colunas_normais))
+        num_colunas = len(colunas_pontos)
+
+        grade = np.empty((len(zs), num_colunas, 3))
+        grade[:, :, :2] = colunas_pontos
+        grade[:, :, 2] = zs[:, None]
+        niveis = _mesclar_niveis(zs, grade)
+        grade = grade[niveis]
+        vertices.append(grade.reshape(-1, 3))
+        normais.append(np.tile(colunas_normais, (len(niveis), 1)))
+
+        # Quad da face j entre os níveis k e k+1: mesmos 2 triângulos de
+        # gerar_laterais_extrusao, (a, b, c) e (b, d, c)
+        k = np.arange(len(niveis) - 1)[:, None]
+        a = inicio + k * num_colunas + inicio_face[None, :]
+        b = inicio + k * num_colunas + np.roll(fim_face_anterior, -1)[None, :]
+        c = a + num_colunas
+        d = b + num_colunas
+        indices.append(np.stack([a, b, c, b, d, c], axis=-1).ravel())
+        inicio += grade.shape[0] * num_colunas
+
+    # Base (normal -Z, ordem invertida) e topo (normal +Z)
+    pontos, triangulos = triangular_perfil(perfil, furos)
+    if len(triangulos):
+        a, b, c = pontos[triangulos[:, 0]], pontos[triangulos[:, 1]], pontos[triangulos[:, 2]]
+        horario = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]) < 0
+        triangulos = triangulos.copy()
+        triangulos[horario] = triangulos[horario][:, [0, 2, 1]]
+    for z, normal, ordem in ((0.0, -1.0, [0, 2, 1]), (altura, 1.0, [0, 1, 2])):
+        vertices.append(np.column_stack([pontos, np.full(len(pontos), z)]))
+        normais.append(np.tile([0.0, 0.0, normal], (len(pontos), 1)))
+        indices.append((inicio + triangulos[:, ordem]).ravel())
+        inicio += len(pontos)
+
+    return Malha(np.concatenate(vertices), np.concatenate(normais), np.concatenate(indices),
+                 gerar_segmentos_extrusao(perfil, altura, num_seg, furos))
+
+
 def desenhar_perfil_2d():
     """Desenha o perfil 2D como linhas no plano XY"""
     global perfil_extrusao
@@ -471,10 +4259,7 @@ def desenhar_perfil_2d():
     glColor3f(1.0, 1.0, 0.0)  # Amarelo
     glLineWidth(2.0)
     
-    glBegin(GL_LINE_STRIP)
-    for ponto in perfil_extrusao:
-        glVertex3f(ponto[0], ponto[1], 0.0)
-    glEnd()
+    desenhar_malha(obter_malha_perfil(), "perfil", wireframe=True)
     
     glEnable(GL_LIGHTING)
     glLineWidth(1.0)
@@ -490,8 +4275,9 @@ def desenhar_extrusao():
     3. Replicação: Copia o perfil em múltiplos níveis ao longo do eixo Z
     4. Geração de Faces:
        - Laterais: Conecta pontos correspondentes entre níveis (quads → triângulos)
-       - Base: Triangulação em leque a partir do ponto [0]
-       - Topo: Triangulação em leque a partir do ponto [0]
+       - Base e Topo: Triangulação por partição monótona
+         (triangular_poligono), correta para perfis côncavos, com
+         milhares de pontos, com furos e com pontos repetidos
     
     ESTADOS:
     - extrusao_ativa = False: Mostra apenas o perfil 2D (linhas amarelas)
@@ -501,10 +4287,15 @@ def desenhar_extrusao():
     - Wireframe: Desenha apenas arestas (anéis + verticais)
     - Sólido: Renderiza faces triangulares com iluminação
     
-    LIMITAÇÃO: A triangulação em leque funciona melhor para perfis convexos.
-               Perfis côncavos ou auto-intersectantes podem gerar artefatos visuais.
+    LIMITAÇÃO: Perfis auto-intersectantes não são polígonos simples; neles
+               as tampas voltam ao leque a partir do ponto [0] e podem
+               gerar artefatos visuais.
                
-    Usa: Pipeline fixo do OpenGL (sem scanline)
+    A geometria vem de obter_malha_extrusao(), que só a reconstrói quando o
+    perfil, a altura ou o número de segmentos mudam, e é desenhada a partir
+    de VBOs (desenhar_malha), com modo imediato como alternativa.
+               
+    Usa: Pipeline fixo do OpenGL (sem scanline), ou o shader no Phong GLSL
     """
     global perfil_extrusao, altura_extrusao
     global num_segmentos_extrusao, modo_wireframe, extrusao_ativa
@@ -518,81 +4309,121 @@ def desenhar_extrusao():
         desenhar_perfil_2d()
         return
     
-    # Fecha perfil
-    perfil = perfil_extrusao.copy()
-    if perfil[0] != perfil[-1]:
-        perfil.append(perfil[0])
-    
-    num_pontos = len(perfil)
-    num_seg = num_segmentos_extrusao
+    # Malha em cache: só é reconstruída quando perfil, altura ou segmentos mudam
+    malha = obter_malha_extrusao()
     
     if modo_wireframe:
+        # Anéis + verticais
         glDisable(GL_LIGHTING)
-        # Anéis
-        for i in range(num_seg + 1):
-            z = (i / num_seg) * altura_extrusao
-            glBegin(GL_LINE_LOOP)
-            for ponto in perfil:
-                glVertex3f(ponto[0], ponto[1], z)
-            glEnd()
-        
-        # Verticais
-        for ponto in perfil:
-            glBegin(GL_LINE_STRIP)
-            for i in range(num_seg + 1):
-                z = (i / num_seg) * altura_extrusao
-                glVertex3f(ponto[0], ponto[1], z)
-            glEnd()
+        desenhar_malha(malha, "extrusao", wireframe=True)
         glEnable(GL_LIGHTING)
     else:
-        # Faces sólidas (OpenGL normal)
-        glBegin(GL_TRIANGLES)
-        
-        # Faces laterais
-        for i in range(num_seg):
-            z1 = (i / num_seg) * altura_extrusao
-            z2 = ((i + 1) / num_seg) * altura_extrusao
-            
-            for j in range(num_pontos - 1):
-                p1 = [perfil[j][0],     perfil[j][1],     z1]
-                p2 = [perfil[j+1][0],   perfil[j+1][1],   z1]
-                p3 = [perfil[j][0],     perfil[j][1],     z2]
-                p4 = [perfil[j+1][0],   perfil[j+1][1],   z2]
-                
-                n1 = calcular_normal_face(p1, p2, p3)
-                n2 = calcular_normal_face(p2, p4, p3)
-                
-                glNormal3f(*n1)
-                glVertex3f(*p1); glVertex3f(*p2); glVertex3f(*p3)
-                
-                glNormal3f(*n2)
-                glVertex3f(*p2); glVertex3f(*p4); glVertex3f(*p3)
-        
-        # Base inferior
-        if num_pontos > 2:
-            z_base = 0.0
-            for j in range(1, num_pontos - 1):
-                p1 = [perfil[0][0], perfil[0][1], z_base]
-                p2 = [perfil[j][0], perfil[j][1], z_base]
-                p3 = [perfil[j+1][0], perfil[j+1][1], z_base]
-                
-                normal = calcular_normal_face(p1, p3, p2)
-                glNormal3f(*normal)
-                glVertex3f(*p1); glVertex3f(*p2); glVertex3f(*p3)
-        
-        # Face superior (topo)
-        if num_pontos > 2:
-            z_topo = altura_extrusao
-            for j in range(1, num_pontos - 1):
-                p1 = [perfil[0][0], perfil[0][1], z_topo]
-                p2 = [perfil[j][0], perfil[j][1], z_topo]
-                p3 = [perfil[j+1][0], perfil[j+1][1], z_topo]
-                
-                normal = calcular_normal_face(p1, p2, p3)
-                glNormal3f(*normal)
-                glVertex3f(*p1); glVertex3f(*p2); glVertex3f(*p3)
-        
-        glEnd()
+        # Perfis longos: nível de detalhe pelo tamanho da extrusão na tela
+        nivel = nivel_lod("extrusao", malha, num_niveis_extrusao(), pilha_modelview.topo,
+                          pilha_projecao.topo, viewport_atual[3])
+        malha = obter_malha_extrusao(nivel)
+        estatisticas_lod["triangulos"] = malha.num_triangulos
+        # Faces sólidas (pipeline fixa ou Phong GLSL)
+        desenhar_malha_iluminada(malha, "extrusao" if nivel == 0 else ("extrusao", nivel))
+
+
+_cache_extrusao = {"chave": None, "malha": None, "niveis": {}}
+
+
+def obter_malha_extrusao(nivel=0):
+    """
+    Retorna a Malha da extrusão atual, reconstruindo-a só quando necessário.
+
+    A chave do cache é formada pelo conteúdo do perfil, pela altura, pelo
+    número de segmentos e pelo tipo de malha; mover a câmera ou o objeto
+    reaproveita a malha. A malha guarda tanto as faces sólidas quanto as
+    arestas do wireframe.
+
+    Com extrusao_indexada, usa gerar_malha_extrusao_indexada (no Flat sem
+    suavização, para manter as facetas); senão, triângulos soltos com a
+    normal de cada face.
+
+    nivel > 0 retorna a malha de um nível de detalhe mais grosso, com o
+    perfil e os furos decimados (decimar_anel); os níveis ficam no mesmo
+    cache e são descartados junto com o nível 0. Como cada anel é
+    decimado sozinho, um furo pode cruzar o contorno decimado (ou sair
+    dele): se o perfil decimado não for simples (perfil_simples), o
+    nível usa a malha do nível anterior.
+    """
+    global perfil_extrusao, furos_extrusao, altura_extrusao, num_segmentos_extrusao
+    global extrusao_indexada, angulo_suavizacao, modelo_iluminacao
+
+    furos = tuple(tuple(furo) for furo in furos_extrusao)
+    angulo = None
+    if extrusao_indexada:
+        angulo = 0.0 if modelo_iluminacao == 0 else angulo_suavizacao
+    chave = (tuple(perfil_extrusao), furos, altura_extrusao, num_segmentos_extrusao, angulo)
+    if _cache_extrusao["chave"] != chave:
+        _cache_extrusao["malha"] = _gerar_malha_extrusao(perfil_extrusao, furos, angulo)
+        _cache_extrusao["niveis"] = {}
+        _cache_extrusao["chave"] = chave
+    if nivel == 0:
+        return _cache_extrusao["malha"]
+    if nivel not in _cache_extrusao["niveis"]:
+        perfil = decimar_anel(perfil_extrusao, nivel)
+        furos_nivel = tuple(decimar_anel(furo, nivel) for furo in furos)
+        if perfil_simples(perfil, furos_nivel):
+            malha = _gerar_malha_extrusao(perfil, furos_nivel, angulo)
+        else:
+            malha = obter_malha_extrusao(nivel - 1)
+        _cache_extrusao["niveis"][nivel] = malha
+    return _cache_extrusao["niveis"][nivel]
+
+
+def _gerar_malha_extrusao(perfil, furos, angulo):
+    global altura_extrusao, num_segmentos_extrusao
+
+    if angulo is not None:
+        return gerar_malha_extrusao_indexada(perfil, altura_extrusao,
+                                             num_segmentos_extrusao, furos, angulo)
+    vertices, normais = gerar_triangulos_extrusao(perfil, altura_extrusao,
+                                                  num_segmentos_extrusao, furos)
+    segmentos = gerar_segmentos_extrusao(perfil, altura_extrusao,
+                                         num_segmentos_extrusao, furos)
+    return Malha.de_triangulos(vertices, normais, segmentos)
+
+
+def decimar_anel(pontos, nivel):
+    """
+    1 a cada 2^nivel pontos do anel, sem passar de PONTOS_MINIMOS_LOD
+    pontos (anéis já menores que isso ficam inteiros).
+    """
+    passo = 2 ** nivel
+    while passo > 1 and -(-len(pontos) // passo) < PONTOS_MINIMOS_LOD:
+        passo //= 2
+    return list(pontos[::passo])
+
+
+def num_niveis_extrusao():
+    """Níveis de detalhe distintos da extrusão atual (até um por limiar, mais o 0)."""
+    global perfil_extrusao, limiares_lod
+
+    niveis = 1
+    while (niveis <= len(limiares_lod)
+           and -(-len(perfil_extrusao) // 2 ** niveis) >= PONTOS_MINIMOS_LOD):
+        niveis += 1
+    return niveis
+
+
+_cache_perfil = {"chave": None, "malha": None}
+
+
+def obter_malha_perfil():
+    """Malha (só arestas) da linha do perfil 2D, em cache pelo conteúdo do perfil."""
+    global perfil_extrusao
+
+    chave = tuple(perfil_extrusao)
+    if _cache_perfil["chave"] != chave:
+        pontos = np.array([(x, y, 0.0) for x, y in perfil_extrusao]).reshape(-1, 3)
+        segmentos = np.stack([pontos[:-1], pontos[1:]], axis=1)
+        _cache_perfil["malha"] = Malha(np.empty((0, 3)), np.empty((0, 3)), [], segmentos)
+        _cache_perfil["chave"] = chave
+    return _cache_perfil["malha"]
 
 
 def adicionar_ponto_perfil(x, y):
@@ -603,15 +4434,95 @@ def adicionar_ponto_perfil(x, y):
 
 
 def limpar_perfil():
-    """Limpa o perfil de extrusão"""
-    global perfil_extrusao
+    """Limpa o perfil de extrusão (e os furos)"""
+    global perfil_extrusao, furos_extrusao
     perfil_extrusao = []
+    furos_extrusao = []
     print("Perfil limpo")
 
 
 # ==========================================
 # OBJETOS PADRÃO + EXTRUSÃO
 # ==========================================
+# Contagens do último quadro da cena (objeto 8), mostradas no HUD
+estatisticas_cena = {"objetos": 0, "desenhados": 0, "descartados": 0, "chamadas": 0,
+                     "instanciado": False, "triangulos": 0}
+
+
+def desenhar_cena():
+    """
+    Desenha a cena do objeto 8 (grafo de cena) só com os nós cuja esfera
+    envolvente está no frustum da câmera atual (fixa ou primeira pessoa).
+
+    Cada nó usa o nível de detalhe do seu tamanho na tela. Nos modos
+    Phong (2 e 3), sólidos e com VBO, os nós que compartilham malha e
+    nível saem numa única chamada instanciada (programa_instancias, Phong
+    por fragmento): no modo 2 a cena usa esse shader, não o scanline nem
+    a pipeline fixa, e o HUD indica isso. Flat, Gouraud e o wireframe não
+    têm variante instanciada (são da pipeline fixa): cada nó é desenhado
+    com sua modelview, reaproveitando a malha na GPU.
+    """
+    global modo_wireframe, modelo_iluminacao, usar_vbo
+
+    grafo = obter_grafo_cena()
+    modelo = PilhaMatrizes()
+    aplicar_transformacoes_objeto(modelo)
+    mundo, visivel, niveis = grafo.visiveis(modelo.topo, view_quadro, pilha_projecao.topo,
+                                            viewport_atual[3])
+    cores = grafo.arrays["cores"]
+    lotes = grafo.lotes(visivel, niveis)
+
+    instanciado = (not modo_wireframe and modelo_iluminacao in (2, 3) and usar_vbo
+                   and vbo_disponivel() and instancias_disponiveis()
+                   and programa_instancias.disponivel())
+    chamadas = 0
+    if instanciado:
+        # As matrizes dos nós vão por instância: a modelview fica só com a view
+        pilha_modelview.empilhar()
+        pilha_modelview.carregar(view_quadro)
+        pilha_modelview.carregar_no_gl()
+        programa_instancias.ativar(contexto_quadro, view_quadro)
+        try:
+            for grupo, nivel, malha, indices in lotes:
+                slot = ("cena", grupo, nivel, False)
+                geometria = geometrias_gpu.setdefault(slot, GeometriaGPU())
+                geometria.atualizar(malha)
+                instancias = instancias_gpu.setdefault(slot, InstanciasGPU())
+                instancias.enviar(mundo[indices], cores[indices])
+                geometria.desenhar_triangulos(instancias)
+                chamadas += 1
+        finally:
+            programa_instancias.desativar()
+            pilha_modelview.desempilhar()
+    else:
+        if modo_wireframe:
+            glDisable(GL_LIGHTING)
+        for grupo, nivel, malha, indices in lotes:
+            slot = ("cena", grupo, nivel, modo_wireframe)
+            desenho = arame_malha(malha) if modo_wireframe else malha
+            for i in indices.tolist():
+                pilha_modelview.empilhar()
+                pilha_modelview.carregar(view_quadro @ mundo[i])
+                pilha_modelview.carregar_no_gl()
+                glColor3f(*cores[i].tolist())
+                if modo_wireframe:
+                    desenhar_malha(desenho, slot, wireframe=True)
+                else:
+                    desenhar_malha_iluminada(desenho, slot)
+                pilha_modelview.desempilhar()
+                chamadas += 1
+        if modo_wireframe:
+            glEnable(GL_LIGHTING)
+    pilha_modelview.carregar_no_gl()
+
+    desenhados = int(visivel.sum())
+    estatisticas_cena.update(objetos=grafo.num_objetos, desenhados=desenhados,
+                             descartados=grafo.num_objetos - desenhados, chamadas=chamadas,
+                             instanciado=instanciado,
+                             triangulos=sum(malha.num_triangulos * len(indices)
+                                            for _, _, malha, indices in lotes))
+
+
 def desenhar_objeto():
     """Desenha o objeto padrão selecionado ou extrusão."""
     global objeto_selecionado, modo_wireframe, modo_extrusao, modelo_iluminacao
@@ -620,48 +4531,51 @@ def desenhar_objeto():
         desenhar_extrusao()
         return
     
-    glColor3f(0.0, 0.5, 1.0) # Azul
+    if objeto_selecionado == OBJETO_CENA:
+        desenhar_cena()
+        return
     
-    if objeto_selecionado == 1:  # Esfera
-        if modo_wireframe:
-            glutWireSphere(1.0, 10, 10)
-        else:
-            glutSolidSphere(1.0, 20, 20)
+    glColor3f(0.0, 0.5, 1.0) # Azul
     
-    elif objeto_selecionado == 2:  # Cubo
-        if modo_wireframe:
-            glutWireCube(2.0)
-        else:
-            # Em modo Phong, usamos nosso cubo com scanline
-            if modelo_iluminacao == 2:
+    # Em modo Phong, os objetos padrão sólidos usam nosso scanline (ou o
+    # resultado do frame anterior, se nada mudou), no nível de detalhe do
+    # tamanho na tela. O modelo carregado (7) fica na pipeline fixa: pode ter
+    # milhões de triângulos, e o scanline trata um por vez em Python
+    if objeto_selecionado in MALHAS_OBJETOS and not modo_wireframe and modelo_iluminacao == 2:
+        malhas = malhas_lod(objeto_selecionado)
+        nivel = nivel_lod(objeto_selecionado, malhas[0], len(malhas), pilha_modelview.topo,
+                          pilha_projecao.topo, viewport_atual[3])
+        estatisticas_lod["triangulos"] = malhas[nivel].num_triangulos
+        if not cache_quadro_software.reaproveitar(chave_quadro_software()):
+            if objeto_selecionado == 2:
                 desenhar_cubo_scanline_phong()
             else:
-                glutSolidCube(2.0)
-    
-    elif objeto_selecionado == 3:  # Cone
-        if modo_wireframe:
-            glutWireCone(1.0, 2.0, 15, 15)
-        else:
-            glutSolidCone(1.0, 2.0, 15, 15)
-    
-    elif objeto_selecionado == 4:  # Torus
-        if modo_wireframe:
-            glutWireTorus(0.5, 1.0, 15, 15)
-        else:
-            glutSolidTorus(0.5, 1.0, 15, 15)
+                desenhar_malha_scanline_phong(malhas[nivel], (0.0, 0.5, 1.0))
+        return
     
-    elif objeto_selecionado == 5:  # Teapot
-        if modo_wireframe:
-            glutWireTeapot(1.0)
-        else:
-            # Teapot
-            glutSolidTeapot(1.0)
+    # Esfera, Cubo, Cone, Torus e Teapot: malhas procedurais em cache
+    malha = malha_objeto(objeto_selecionado, modo_wireframe)
+    if malha is None:
+        return
+    if modo_wireframe:
+        # Arestas sem normais: desenhadas sem iluminação, como na extrusão
+        glDisable(GL_LIGHTING)
+        desenhar_malha(malha, ("objeto", objeto_selecionado, True), wireframe=True)
+        glEnable(GL_LIGHTING)
+        return
+    # Nível de detalhe pelo tamanho do objeto na tela (o modelo tem um só)
+    malhas = malhas_lod(objeto_selecionado) if objeto_selecionado in NIVEIS_LOD else [malha]
+    nivel = nivel_lod(objeto_selecionado, malha, len(malhas), pilha_modelview.topo,
+                      pilha_projecao.topo, viewport_atual[3])
+    malha = malhas[nivel]
+    estatisticas_lod["triangulos"] = malha.num_triangulos
+    desenhar_malha_iluminada(malha, ("objeto", objeto_selecionado, False, nivel))
 
 
 # ==========================================
 # CÂMERA EM PRIMEIRA PESSOA
 # ==========================================
-def atualizar_camera():
+def atualizar_camera(pilha=None):
     """
     Atualiza a matriz de visualização para câmera em primeira pessoa.
     
@@ -676,10 +4590,14 @@ def atualizar_camera():
     
     Calcula ponto de foco (look_at) = posição_câmera + direção
     
-    Aplica transformação usando gluLookAt(eye, center, up)
+    Aplica a transformação na pilha (padrão: pilha_modelview), equivalente
+    a gluLookAt(eye, center, up)
     """
     global camera_x, camera_y, camera_z, camera_yaw, camera_pitch
     
+    if pilha is None:
+        pilha = pilha_modelview
+    
     yaw_rad = math.radians(camera_yaw)
     pitch_rad = math.radians(camera_pitch)
     
@@ -691,44 +4609,85 @@ def atualizar_camera():
     look_at_y = camera_y + direcao_y
     look_at_z = camera_z + direcao_z
     
-    gluLookAt(camera_x, camera_y, camera_z,
-              look_at_x, look_at_y, look_at_z,
-              0.0, 1.0, 0.0)
+    pilha.look_at(camera_x, camera_y, camera_z,
+                  look_at_x, look_at_y, look_at_z,
+                  0.0, 1.0, 0.0)
+
+
+def aplicar_camera(pilha):
+    """Configura a câmera (fixa ou primeira pessoa) a partir da identidade."""
+    global modo_camera
+    
+    pilha.carregar_identidade()
+    if modo_camera:
+        # Câmera em primeira pessoa (FPS)
+        atualizar_camera(pilha)
+    else:
+        # Câmera fixa olhando para a origem
+        pilha.look_at(0.0, 0.0, 10.0,  # Posição da câmera
+                      0.0, 0.0, 0.0,   # Ponto focal (origem)
+                      0.0, 1.0, 0.0)   # Vetor "up" (Y positivo)
+
+
+def aplicar_transformacoes_objeto(pilha):
+    """Aplica posição, rotações e escala do objeto (passo 6 do display)."""
+    global pos_x, pos_y, pos_z, rot_x, rot_y, scale
+    
+    pilha.transladar(pos_x, pos_y, pos_z)  # Posição
+    pilha.rotacionar(rot_x, 1.0, 0.0, 0.0)    # Rotação X
+    pilha.rotacionar(rot_y, 0.0, 1.0, 0.0)    # Rotação Y
+    pilha.escalar(scale, scale, scale)       # Escala uniforme
+
+
+def aplicar_projecao(pilha, w, h):
+    """Configura a projeção perspectiva ou ortográfica para uma janela w x h."""
+    global projecao_ortografica
+    
+    pilha.carregar_identidade()
+    aspecto = float(w) / float(h)
+    
+    if projecao_ortografica:
+        if w <= h:
+            pilha.ortografica(-10, 10, -10/aspecto, 10/aspecto, 0.1, 100.0)
+        else:
+            pilha.ortografica(-10*aspecto, 10*aspecto, -10, 10, 0.1, 100.0)
+    else:
+        pilha.perspectiva(45, aspecto, 0.1, 100.0)
 
 
-def mover_camera_frente():
+def mover_camera_frente(distancia):
     """Move a câmera para frente na direção em que está olhando (tecla W)."""
-    global camera_x, camera_y, camera_z, camera_yaw, velocidade_camera
+    global camera_x, camera_y, camera_z, camera_yaw
     yaw_rad = math.radians(camera_yaw)
     # Move apenas no plano XZ (horizontal), Y permanece constante
-    camera_x += math.sin(yaw_rad) * velocidade_camera
-    camera_z += math.cos(yaw_rad) * velocidade_camera
+    camera_x += math.sin(yaw_rad) * distancia
+    camera_z += math.cos(yaw_rad) * distancia
 
 
-def mover_camera_tras():
+def mover_camera_tras(distancia):
     """Move a câmera para trás, oposto à direção de visão (tecla S)."""
-    global camera_x, camera_y, camera_z, camera_yaw, velocidade_camera
+    global camera_x, camera_y, camera_z, camera_yaw
     yaw_rad = math.radians(camera_yaw)
-    camera_x -= math.sin(yaw_rad) * velocidade_camera
-    camera_z -= math.cos(yaw_rad) * velocidade_camera
+    camera_x -= math.sin(yaw_rad) * distancia
+    camera_z -= math.cos(yaw_rad) * distancia
 
 
-def mover_camera_esquerda():
+def mover_camera_esquerda(distancia):
     """Movimento lateral para a esquerda (strafe) - tecla A."""
-    global camera_x, camera_y, camera_z, camera_yaw, velocidade_camera
+    global camera_x, camera_y, camera_z, camera_yaw
     # Adiciona 90° ao yaw para obter direção perpendicular (esquerda)
     yaw_rad = math.radians(camera_yaw + 90)
-    camera_x += math.sin(yaw_rad) * velocidade_camera
-    camera_z += math.cos(yaw_rad) * velocidade_camera
+    camera_x += math.sin(yaw_rad) * distancia
+    camera_z += math.cos(yaw_rad) * distancia
 
 
-def mover_camera_direita():
+def mover_camera_direita(distancia):
     """Movimento lateral para a direita (strafe) - tecla D."""
-    global camera_x, camera_y, camera_z, camera_yaw, velocidade_camera
+    global camera_x, camera_y, camera_z, camera_yaw
     # Subtrai 90° do yaw para obter direção perpendicular (direita)
     yaw_rad = math.radians(camera_yaw - 90)
-    camera_x += math.sin(yaw_rad) * velocidade_camera
-    camera_z += math.cos(yaw_rad) * velocidade_camera
+    camera_x += math.sin(yaw_rad) * distancia
+    camera_z += math.cos(yaw_rad) * distancia
 
 
 # ==========================================
@@ -740,21 +4699,79 @@ def desenhar_texto_2d(x, y, texto):
         glutBitmapCharacter(GLUT_BITMAP_9_BY_15, ord(ch))
 
 
-def desenhar_hud():
-    global mostrar_comandos, modo_camera, modelo_iluminacao
-    global modo_wireframe, projecao_ortografica, modo_extrusao, extrusao_ativa, objeto_selecionado
+class CacheHUD:
+    """
+    HUD compilado em uma display list.
 
-    if not mostrar_comandos:
-        return
+    Desenhar o texto custa um glutBitmapCharacter por caractere (~400
+    chamadas por quadro). A lista só é recompilada quando muda algum valor
+    exibido ou o tamanho da janela (a chave do HUD); nos outros quadros as
+    linhas fixas do HUD são um único glCallList. Os contadores que mudam a
+    cada quadro (scanline, cena) ficam fora da lista: são desenhados logo
+    depois dela (linhas_contadores_hud).
+
+    Com ativo = False (--sem-cache-hud), o texto é desenhado caractere a
+    caractere em todo quadro.
+    """
+
+    # A tabela do perfil muda a cada quadro; é atualizada no máximo 2x/s
+    INTERVALO_PERFIL = 0.5
+
+    def __init__(self):
+        self.ativo = True
+        self.lista = None
+        self.chave = None
+        self.num_linhas = 0
+        self.recompilacoes = 0
+        self._linhas_perfil = ()
+        self._instante_perfil = None
+
+    def linhas_perfil(self):
+        """Tabela do perfilador, recalculada a cada INTERVALO_PERFIL segundos."""
+        agora = time.perf_counter()
+        if self._instante_perfil is None or agora - self._instante_perfil >= self.INTERVALO_PERFIL:
+            self._linhas_perfil = tuple(perfilador.linhas_hud())
+            self._instante_perfil = agora
+        return self._linhas_perfil
+
+    def invalidar(self):
+        self.chave = None
+
+    def desenhar(self, chave, gerar_linhas, largura, altura):
+        """
+        Chama a display list, recompilando-a se a chave mudou.
 
+        Returns:
+            int: número de linhas da lista
+        """
+        if self.lista is None:
+            self.lista = glGenLists(1)
+        if chave != self.chave:
+            linhas = gerar_linhas()
+            glNewList(self.lista, GL_COMPILE)
+            try:
+                desenhar_linhas_hud(linhas, largura, altura)
+            finally:
+                glEndList()
+            self.chave = chave
+            self.num_linhas = len(linhas)
+            self.recompilacoes += 1
+        glCallList(self.lista)
+        return self.num_linhas
+
+
+cache_hud = CacheHUD()
+
+
+def desenhar_linhas_hud(linhas, largura, altura, primeira=0):
+    """
+    Desenha as linhas de texto do HUD em projeção ortográfica de tela, a
+    partir da posição da linha `primeira` (0 é o topo).
+    """
     glMatrixMode(GL_PROJECTION)
     glPushMatrix()
     glLoadIdentity()
-
-    width = glutGet(GLUT_WINDOW_WIDTH)
-    height = glutGet(GLUT_WINDOW_HEIGHT)
-
-    glOrtho(0, width, 0, height, -1, 1)
+    glOrtho(0, largura, 0, altura, -1, 1)
 
     glMatrixMode(GL_MODELVIEW)
     glPushMatrix()
@@ -765,50 +4782,333 @@ def desenhar_hud():
 
     glColor3f(1.0, 1.0, 1.0)
 
-    y = height - 20
+    y = altura - 20 * (primeira + 1)
     x = 10
+    for linha in linhas:
+        desenhar_texto_2d(x, y, linha)
+        y -= 20
+
+    glEnable(GL_DEPTH_TEST)
+    glEnable(GL_LIGHTING)
+
+    glMatrixMode(GL_MODELVIEW)
+    glPopMatrix()
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+
+
+def chave_hud():
+    """
+    Todos os valores que as linhas fixas do HUD exibem, mais o tamanho da
+    janela (os contadores por quadro estão em contadores_hud).
+    """
+    global mostrar_comandos, modo_camera, modelo_iluminacao
+    global modo_wireframe, projecao_ortografica, modo_extrusao, extrusao_ativa, objeto_selecionado
+    global usar_vbo, extrusao_indexada, mostrar_perfil, usar_lod
+
+    # Nível de detalhe do objeto sólido do último quadro
+    lod = (usar_lod, None)
+    chave_lod = "extrusao" if modo_extrusao else objeto_selecionado
+    if (mostrar_comandos and not modo_wireframe and estatisticas_lod["chave"] == chave_lod
+            and (not modo_extrusao or extrusao_ativa)):
+        lod = (usar_lod, (estatisticas_lod["nivel"], estatisticas_lod["niveis"],
+                          estatisticas_lod["triangulos"]))
+    return (viewport_atual[2], viewport_atual[3], mostrar_comandos, modo_camera,
+            modelo_iluminacao, modo_wireframe, projecao_ortografica, modo_extrusao,
+            extrusao_ativa, objeto_selecionado, usar_vbo and vbo_disponivel(),
+            extrusao_indexada, lod, cache_hud.linhas_perfil() if mostrar_perfil else None)
+
+
+def contadores_hud():
+    """Valores do HUD que mudam a cada quadro: estatísticas do scanline e da cena."""
+    global mostrar_comandos, objeto_selecionado, modo_extrusao, modo_wireframe, modelo_iluminacao
+
+    estatisticas = None
+    if mostrar_comandos and estatisticas_software["pixels"] > 0:
+        estatisticas = (estatisticas_software["pixels"], estatisticas_software["chamadas_gl"],
+                        estatisticas_software["chamadas_imediato"],
+                        estatisticas_software["descartados"],
+                        rasterizador_ladrilhos.processos if rasterizacao_ladrilhos else 0,
+                        estatisticas_software["cache"], sombreamento_diferido)
+    cena = None
+    if mostrar_comandos and objeto_selecionado == OBJETO_CENA and not modo_extrusao:
+        cena = (estatisticas_cena["objetos"], estatisticas_cena["desenhados"],
+                estatisticas_cena["descartados"], estatisticas_cena["chamadas"],
+                estatisticas_cena["instanciado"], estatisticas_cena["triangulos"],
+                modo_wireframe, modelo_iluminacao)
+    return estatisticas, cena
+
+
+# Como o HUD indica um frame do scanline reaproveitado (CacheQuadroSoftware)
+ROTULOS_CACHE_SOFTWARE = {"redesenhar": " [quadro em cache]", "resombrear": " [so iluminacao]"}
 
-    modo_str = "CAMERA" if modo_camera else "OBJETO"
-    modos_ilum = ["Flat", "Gouraud", "Phong"]
-    ilum_str = modos_ilum[modelo_iluminacao]
-    wire_str = "Wireframe" if modo_wireframe else "Solido"
-    proj_str = "Ortografica" if projecao_ortografica else "Perspectiva"
+
+def linhas_hud(chave):
+    """Monta as linhas fixas do HUD a partir de uma chave de chave_hud()."""
+    (_, _, comandos, camera, iluminacao, wireframe, ortografica, extrusao,
+     ativa, objeto, vbo, indexada, lod, perfil) = chave
+
+    modo_str = "CAMERA" if camera else "OBJETO"
+    modos_ilum = ["Flat", "Gouraud", "Phong", "Phong GLSL"]
+    ilum_str = modos_ilum[iluminacao]
+    wire_str = "Wireframe" if wireframe else "Solido"
+    proj_str = "Ortografica" if ortografica else "Perspectiva"
     extru_str = "OFF"
-    if modo_extrusao:
-        extru_str = "Perfil 2D" if not extrusao_ativa else "Extrusao 3D"
+    if extrusao:
+        extru_str = "Perfil 2D" if not ativa else "Extrusao 3D"
 
     obj_nomes = {
         1: "Esfera",
         2: "Cubo",
         3: "Cone",
         4: "Torus",
-        5: "Teapot"
+        5: "Teapot",
+        7: "Modelo",
+        8: "Cena"
     }
-    obj_str = obj_nomes.get(objeto_selecionado, "-")
-    if modo_extrusao:
+    obj_str = obj_nomes.get(objeto, "-")
+    if extrusao:
         obj_str = "Extrusao"
 
-    linhas = [
-        f"Modo: {modo_str}   |   Objeto: {obj_str}",
+    usar_lod, detalhe = lod
+    lod_str = "ON" if usar_lod else "OFF"
+    if detalhe is not None:
+        nivel, niveis, triangulos = detalhe
+        lod_str += f" (nivel {nivel} de 0-{niveis - 1}, {triangulos} triangulos)"
+
+    linhas = [] if not comandos else [
+        f"Modo: {modo_str}   |   Objeto: {obj_str}   |   Niveis de detalhe [Q]: {lod_str}",
         f"Iluminacao [M]: {ilum_str}   |   Renderizacao [F]: {wire_str}   |   Projecao [P]: {proj_str}",
-        f"[0] Camera/Objeto  |  [1-5] Objetos  |  [6] Modo Extrusao ({extru_str})",
-        "[WASD] (Obj: rotacao / Cam: movimento)  |  Setas: mover objeto",
-        "[IJKL/UO] mover luz   |   [T] mostrar/ocultar ajuda na tela",
-        "[Extrusao] Clique: adiciona ponto  |  [E] ativa extrusao  |  [C] limpa  |  [H/N] altura"
+        f"[0] Camera/Objeto  |  [1-5] Objetos  |  [7] Modelo  |  [8] Cena  |  [6] Modo Extrusao ({extru_str})",
+        "[WASD] (Obj: rotacao / Cam: movimento)  |  Setas: mover objeto  |  Clique: picking",
+        "[IJKL/UO] mover luz   |   [T] mostrar/ocultar ajuda na tela   |   [R] perfil   |   "
+        f"[V] geometria: {'VBO' if vbo else 'Imediato'}",
+        "[Extrusao] Clique: adiciona ponto  |  [E] ativa extrusao  |  [C] limpa  |  [H/N] altura  |  "
+        f"[X] malha {'indexada' if indexada else 'por face'}  |  [Z] exporta STL"
     ]
 
-    for linha in linhas:
-        desenhar_texto_2d(x, y, linha)
-        y -= 20
+    if perfil is not None:
+        linhas += perfil
 
-    glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING)
+    return linhas
 
-    glMatrixMode(GL_MODELVIEW)
-    glPopMatrix()
-    glMatrixMode(GL_PROJECTION)
-    glPopMatrix()
-    glMatrixMode(GL_MODELVIEW)
+
+def linhas_contadores_hud(contadores):
+    """Monta as linhas dos contadores por quadro a partir de contadores_hud()."""
+    estatisticas, cena = contadores
+    linhas = []
+    if estatisticas is not None:
+        pixels, chamadas_gl, chamadas_imediato, descartados, processos, cache, diferido = estatisticas
+        linhas.append(
+            f"Scanline: {pixels} pixels ({descartados} poligonos descartados)"
+            f"{ROTULOS_CACHE_SOFTWARE.get(cache, '')}  |  "
+            f"{chamadas_gl} chamadas GL/frame  "
+            f"(modo imediato: {chamadas_imediato})  |  "
+            f"[B] ladrilhos: {f'{processos} processos' if processos else 'OFF'}  |  "
+            f"[G] diferido: {'ON' if diferido else 'OFF'}"
+        )
+
+    if cena is not None:
+        objetos, desenhados, descartados, chamadas, instanciado, triangulos, wireframe, iluminacao = cena
+        if instanciado:
+            # Também no modo 2: as instâncias usam o Phong por fragmento do
+            # GLSL, não o scanline nem a pipeline fixa
+            desenho_str = "instanciadas, Phong por fragmento GLSL"
+        elif wireframe or iluminacao not in (2, 3):
+            desenho_str = "uma por objeto; instancias so nos modos Phong solidos"
+        else:
+            desenho_str = "uma por objeto; sem suporte a instancias"
+        linhas.append(
+            f"Cena: {objetos} objetos  |  {desenhados} desenhados, {descartados} fora do frustum  |  "
+            f"{chamadas} chamadas de desenho ({desenho_str})  |  {triangulos} triangulos"
+        )
+    return linhas
+
+
+def desenhar_hud():
+    """
+    Desenha o HUD: as linhas fixas pela display list em cache (ver
+    CacheHUD) e, logo abaixo delas, os contadores do quadro.
+
+    Sem suporte a display lists (ou com cache_hud.ativo desligado) as
+    linhas fixas são desenhadas caractere a caractere, como antes.
+    """
+    global mostrar_comandos, mostrar_perfil
+
+    if not mostrar_comandos and not mostrar_perfil:
+        return
+
+    chave = chave_hud()
+    largura, altura = viewport_atual[2], viewport_atual[3]
+    num_linhas = None
+    if cache_hud.ativo:
+        try:
+            num_linhas = cache_hud.desenhar(chave, lambda: linhas_hud(chave), largura, altura)
+        except Exception:
+            cache_hud.invalidar()
+    if num_linhas is None:
+        linhas = linhas_hud(chave)
+        desenhar_linhas_hud(linhas, largura, altura)
+        num_linhas = len(linhas)
+    contadores = linhas_contadores_hud(contadores_hud())
+    if contadores:
+        desenhar_linhas_hud(contadores, largura, altura, primeira=num_linhas)
+
+
+# ==========================================
+# PERFIL DE DESEMPENHO POR ETAPA
+# ==========================================
+# Etapas de display(), na ordem em que são executadas
+ETAPAS_QUADRO = ("limpar", "camera", "luz", "gizmo_luz", "iluminacao",
+                 "transformacoes", "objeto", "hud", "swap")
+
+
+class PerfiladorQuadros:
+    """
+    Mede o tempo de cada etapa de display().
+
+    - CPU: tempo de parede (time.perf_counter) de cada etapa
+    - GPU: consultas GL_TIME_ELAPSED em volta de cada etapa, quando o
+      contexto as suporta (GL 3.3 / ARB_timer_query). Os resultados são
+      lidos alguns quadros depois, quando ficam disponíveis, para não
+      bloquear a CPU esperando a GPU
+
+    Guarda os últimos `janela` quadros de cada etapa para os percentis
+    (p50/p95/p99) e pode gravar um registro por quadro em CSV.
+    """
+
+    MAX_QUADROS_PENDENTES = 8
+
+    def __init__(self, janela=300):
+        nomes = ETAPAS_QUADRO + ("total",)
+        self.cpu = {nome: deque(maxlen=janela) for nome in nomes}
+        self.gpu = {nome: deque(maxlen=janela) for nome in nomes}
+        self.quadro = 0
+        self._gpu_disponivel = None
+        self._consultas_livres = []
+        self._pendentes = deque()  # (registro, {etapa: consulta})
+        self._registro = None
+        self._consultas = None
+        self._arquivo_csv = None
+        self._escritor_csv = None
+
+    def gpu_disponivel(self):
+        """True se há consultas de tempo na GPU (testado na primeira chamada)."""
+        if self._gpu_disponivel is None:
+            try:
+                consulta = self._nova_consulta()
+                glBeginQuery(GL_TIME_ELAPSED, consulta)
+                glEndQuery(GL_TIME_ELAPSED)
+                self._consultas_livres.append(consulta)
+                self._gpu_disponivel = True
+            except Exception:
+                self._gpu_disponivel = False
+        return self._gpu_disponivel
+
+    @staticmethod
+    def _nova_consulta():
+        # glGenQueries(1) pode retornar um array ou um escalar, conforme a versão
+        return int(np.ravel(glGenQueries(1))[0])
+
+    def gravar_csv(self, caminho):
+        """Passa a gravar um registro por quadro em CSV (tempos em ms)."""
+        self._arquivo_csv = open(caminho, "w", newline="", buffering=1)
+        self._escritor_csv = csv.writer(self._arquivo_csv)
+        self._escritor_csv.writerow(
+            ["quadro", "inicio_s"] + [f"{nome}_cpu_ms" for nome in ETAPAS_QUADRO] + ["total_cpu_ms"]
+            + [f"{nome}_gpu_ms" for nome in ETAPAS_QUADRO] + ["total_gpu_ms"])
+
+    def iniciar_quadro(self):
+        self.quadro += 1
+        self._registro = {"quadro": self.quadro, "inicio": time.perf_counter(),
+                          "cpu": {}, "gpu": {}}
+        self._consultas = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        """Bloco `with` medido como a etapa `nome` do quadro atual."""
+        consulta = None
+        if self._registro is not None and self.gpu_disponivel():
+            consulta = self._consultas_livres.pop() if self._consultas_livres else self._nova_consulta()
+            glBeginQuery(GL_TIME_ELAPSED, consulta)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._registro is not None:
+                self._registro["cpu"][nome] = (time.perf_counter() - inicio) * 1000.0
+            if consulta is not None:
+                glEndQuery(GL_TIME_ELAPSED)
+                self._consultas[nome] = consulta
+
+    def finalizar_quadro(self):
+        registro = self._registro
+        if registro is None:
+            return
+        self._registro = None
+        registro["cpu"]["total"] = (time.perf_counter() - registro["inicio"]) * 1000.0
+        for nome, ms in registro["cpu"].items():
+            self.cpu[nome].append(ms)
+        self._pendentes.append((registro, self._consultas))
+        self._coletar_gpu()
+
+    def _coletar_gpu(self):
+        """Lê as consultas já prontas (do quadro mais antigo para o mais novo)."""
+        while self._pendentes:
+            registro, consultas = self._pendentes[0]
+            if consultas:
+                # As consultas terminam em ordem: basta olhar a última
+                ultima = consultas[ETAPAS_QUADRO[-1]] if ETAPAS_QUADRO[-1] in consultas \
+                    else list(consultas.values())[-1]
+                forcar = len(self._pendentes) > self.MAX_QUADROS_PENDENTES
+                if not forcar and not glGetQueryObjectiv(ultima, GL_QUERY_RESULT_AVAILABLE):
+                    break
+                total = 0.0
+                for nome, consulta in consultas.items():
+                    nanossegundos = int(glGetQueryObjectuiv(consulta, GL_QUERY_RESULT))
+                    self._consultas_livres.append(consulta)
+                    if nanossegundos >= 0xFFFFFFFF:
+                        continue  # Valor inválido (alguns drivers, 1ª consulta)
+                    registro["gpu"][nome] = nanossegundos / 1e6
+                    total += nanossegundos / 1e6
+                registro["gpu"]["total"] = total
+                for nome, ms in registro["gpu"].items():
+                    self.gpu[nome].append(ms)
+            self._pendentes.popleft()
+            self._escrever_csv(registro)
+
+    def _escrever_csv(self, registro):
+        if self._escritor_csv is None:
+            return
+        nomes = ETAPAS_QUADRO + ("total",)
+        self._escritor_csv.writerow(
+            [registro["quadro"], f"{registro['inicio']:.6f}"]
+            + [f"{registro['cpu'][n]:.4f}" if n in registro["cpu"] else "" for n in nomes]
+            + [f"{registro['gpu'][n]:.4f}" if n in registro["gpu"] else "" for n in nomes])
+
+    def percentis(self, nome, fonte="cpu"):
+        """(p50, p95, p99) em ms da etapa na janela recente, ou None sem amostras."""
+        amostras = (self.cpu if fonte == "cpu" else self.gpu)[nome]
+        if not amostras:
+            return None
+        return tuple(np.percentile(np.fromiter(amostras, dtype=np.float64), (50, 95, 99)))
+
+    def linhas_hud(self):
+        """Tabela de percentis para o HUD (fonte de largura fixa)."""
+        linhas = [f"Perfil ({len(self.cpu['total'])} quadros)   CPU ms p50/p95/p99"
+                  "        GPU ms p50/p95/p99"]
+        for nome in ETAPAS_QUADRO + ("total",):
+            cpu = self.percentis(nome, "cpu")
+            if cpu is None:
+                continue
+            gpu = self.percentis(nome, "gpu")
+            texto_gpu = "-" if gpu is None else "{:7.2f} {:7.2f} {:7.2f}".format(*gpu)
+            linhas.append("  {:<15}{:7.2f} {:7.2f} {:7.2f}      {}".format(nome, *cpu, texto_gpu))
+        return linhas
+
+
+perfilador = PerfiladorQuadros()
 
 
 # ==========================================
@@ -823,85 +5123,109 @@ def display():
     2. Configura câmera (fixa ou primeira pessoa)
     3. Posiciona fonte de luz
     4. Desenha indicador visual da luz (esfera amarela)
-    5. Configura modelo de iluminação
+    5. Configura modelo de iluminação (no Phong GLSL, o shader é ligado
+       só durante o desenho das faces)
     6. Aplica transformações no objeto (translação, rotação, escala)
     7. Desenha o objeto selecionado
     8. Desenha HUD (texto 2D) por cima
     9. Troca buffers (double buffering)
+    
+    As transformações são montadas na pilha_modelview (CPU) e enviadas ao
+    OpenGL com glLoadMatrixd; o scanline reaproveita essas matrizes sem
+    consultar o driver.
+
+    Cada etapa é medida pelo perfilador (CPU e, se houver, GPU); [R]
+    mostra os percentis no HUD.
+    """
+    perfilador.iniciar_quadro()
+
+    # 1-7. Cena 3D
+    desenhar_quadro()
+
+    # 8. Desenha HUD (interface 2D) por cima da cena 3D
+    with perfilador.etapa("hud"):
+        desenhar_hud()
+
+    # 9. Troca buffers (exibe frame renderizado)
+    with perfilador.etapa("swap"):
+        glutSwapBuffers()
+
+    perfilador.finalizar_quadro()
+
+
+def desenhar_quadro():
+    """
+    Etapas 1 a 7 de display(): a cena 3D do estado atual, sem HUD nem
+    troca de buffers (usada também sem janela, num contexto offscreen).
     """
     global modo_camera, luz_x, luz_y, luz_z
     global pos_x, pos_y, pos_z, rot_x, rot_y, scale
-    
+    global modelview_objeto, contexto_quadro, contexto_objeto, view_quadro
+
     # 1. Limpa a tela e o buffer de profundidade
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    glLoadIdentity()
+    with perfilador.etapa("limpar"):
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
     
     # 2. Configura câmera
-    if modo_camera:
-        # Câmera em primeira pessoa (FPS)
-        atualizar_camera()
-    else:
-        # Câmera fixa olhando para a origem
-        gluLookAt(0.0, 0.0, 10.0,  # Posição da câmera
-                  0.0, 0.0, 0.0,   # Ponto focal (origem)
-                  0.0, 1.0, 0.0)   # Vetor "up" (Y positivo)
+    with perfilador.etapa("camera"):
+        # Luz, olho e material do Phong por software, fixos durante o frame
+        contexto_quadro = ContextoSombreamento.do_estado_atual()
+        aplicar_camera(pilha_modelview)
+        pilha_modelview.carregar_no_gl()
+        view_quadro = pilha_modelview.topo.copy()
     
     # 3. Posiciona a fonte de luz (deve ser após configurar câmera)
-    posicao_luz = [luz_x, luz_y, luz_z, 1.0]  # w=1.0 = luz posicional
-    glLightfv(GL_LIGHT0, GL_POSITION, posicao_luz)
+    with perfilador.etapa("luz"):
+        posicao_luz = [luz_x, luz_y, luz_z, 1.0]  # w=1.0 = luz posicional
+        glLightfv(GL_LIGHT0, GL_POSITION, posicao_luz)
     
     # 4. Desenha esfera amarela para visualizar posição da luz
-    glPushMatrix()
-    glTranslatef(luz_x, luz_y, luz_z)
-    glDisable(GL_LIGHTING)  # Esfera não é afetada por iluminação
-    glColor3f(1.0, 1.0, 0.0)  # Amarelo
-    glutSolidSphere(0.2, 10, 10)
-    glEnable(GL_LIGHTING)
-    glPopMatrix()
+    with perfilador.etapa("gizmo_luz"):
+        pilha_modelview.empilhar()
+        pilha_modelview.transladar(luz_x, luz_y, luz_z)
+        pilha_modelview.carregar_no_gl()
+        glDisable(GL_LIGHTING)  # Esfera não é afetada por iluminação
+        glColor3f(1.0, 1.0, 0.0)  # Amarelo
+        desenhar_malha(malha_procedural("esfera", 0.2, 10, 10), "luz")
+        glEnable(GL_LIGHTING)
+        pilha_modelview.desempilhar()
     
     # 5. Configura modelo de iluminação (Flat/Gouraud/Phong)
-    configurar_iluminacao_renderizacao()
+    with perfilador.etapa("iluminacao"):
+        configurar_iluminacao_renderizacao()
     
-    # 6-7. Aplica transformações e desenha o objeto
-    glPushMatrix()
-    glTranslatef(pos_x, pos_y, pos_z)  # Posição
-    glRotatef(rot_x, 1.0, 0.0, 0.0)    # Rotação X
-    glRotatef(rot_y, 0.0, 1.0, 0.0)    # Rotação Y
-    glScalef(scale, scale, scale)       # Escala uniforme
+    # 6. Aplica transformações no objeto
+    with perfilador.etapa("transformacoes"):
+        pilha_modelview.empilhar()
+        aplicar_transformacoes_objeto(pilha_modelview)
+        pilha_modelview.carregar_no_gl()
+        modelview_objeto = pilha_modelview.topo.copy()
+        contexto_objeto = contexto_quadro.no_espaco(np.linalg.inv(view_quadro) @ modelview_objeto)
     
-    desenhar_objeto()  # Desenha objeto selecionado
+    # 7. Desenha o objeto selecionado
+    with perfilador.etapa("objeto"):
+        desenhar_objeto()  # Desenha objeto selecionado
+        desenhar_marcador_picking()  # Ponto escolhido com o mouse
+        submeter_pontos_software()  # Pixels do scanline Phong (1 draw call)
     
-    glPopMatrix()
-
-    # 8. Desenha HUD (interface 2D) por cima da cena 3D
-    desenhar_hud()
-
-    # 9. Troca buffers (exibe frame renderizado)
-    glutSwapBuffers()
+    pilha_modelview.desempilhar()
+    pilha_modelview.carregar_no_gl()
 
 
 # ==========================================
 # RESHAPE
 # ==========================================
 def reshape(w, h):
-    global projecao_ortografica
+    global projecao_ortografica, viewport_atual
     
     if h == 0: 
         h = 1
     glViewport(0, 0, w, h)
-    glMatrixMode(GL_PROJECTION)
-    glLoadIdentity()
-    
-    aspecto = float(w) / float(h)
-    
-    if projecao_ortografica:
-        if w <= h:
-            glOrtho(-10, 10, -10/aspecto, 10/aspecto, 0.1, 100.0)
-        else:
-            glOrtho(-10*aspecto, 10*aspecto, -10, 10, 0.1, 100.0)
-    else:
-        gluPerspective(45, aspecto, 0.1, 100.0)
+    viewport_atual = (0, 0, w, h)
+    aplicar_projecao(pilha_projecao, w, h)
         
+    glMatrixMode(GL_PROJECTION)
+    pilha_projecao.carregar_no_gl()
     glMatrixMode(GL_MODELVIEW)
 
 
@@ -915,8 +5239,9 @@ def keyboard(key, x, y):
     global modo_camera, mouse_capturado
     global camera_x, camera_y, camera_z, camera_yaw, camera_pitch
     global ultimo_mouse_x, ultimo_mouse_y
-    global altura_extrusao
-    global mostrar_comandos
+    global altura_extrusao, extrusao_indexada
+    global mostrar_comandos, mostrar_perfil, usar_vbo, rasterizacao_ladrilhos
+    global sombreamento_diferido, usar_lod
     
     # Alternar entre modo câmera e modo objeto
     if key == b'0':
@@ -937,7 +5262,7 @@ def keyboard(key, x, y):
         else:
             print("Modo: OBJETO (WASD move objeto)")
             glutSetCursor(GLUT_CURSOR_INHERIT)
-        glutPostRedisplay()
+        pedir_redesenho()
         return
     
     # Seleção de Objetos Padrões
@@ -966,31 +5291,29 @@ def keyboard(key, x, y):
         modo_extrusao = False
         extrusao_ativa = False
         print("Objeto: Teapot")
+    elif key == b'7':
+        if modelo_externo["malha"] is None:
+            print("Nenhum modelo carregado (--modelo ARQUIVO)")
+        else:
+            objeto_selecionado = OBJETO_MODELO
+            modo_extrusao = False
+            extrusao_ativa = False
+            print(f"Objeto: Modelo ({os.path.basename(modelo_externo['caminho'])})")
+    elif key == b'8':
+        objeto_selecionado = OBJETO_CENA
+        modo_extrusao = False
+        extrusao_ativa = False
+        print(f"Objeto: Cena ({obter_grafo_cena().num_objetos} objetos)")
     elif key == b'6':
         modo_extrusao = True
         extrusao_ativa = False
         print("Modo Extrusão ativado - Clique com o mouse para adicionar pontos ao perfil")
         print("Controles: [E] Ativar/Desativar extrusão 3D | [C] Limpar perfil | [H] Aumentar altura | [N] Diminuir altura")
     
-    # WASD
-    if modo_camera:
-        if key in (b'w', b'W'):
-            mover_camera_frente()
-        elif key in (b's', b'S'):
-            mover_camera_tras()
-        elif key in (b'a', b'A'):
-            mover_camera_esquerda()
-        elif key in (b'd', b'D'):
-            mover_camera_direita()
-    else:
-        if key in (b'w', b'W'):
-            rot_x -= 5.0
-        elif key in (b's', b'S'):
-            rot_x += 5.0
-        elif key in (b'a', b'A'):
-            rot_y -= 5.0
-        elif key in (b'd', b'D'):
-            rot_y += 5.0
+    # WASD: movimento contínuo enquanto a tecla estiver pressionada
+    # (aplicado por avancar_simulacao, proporcional ao tempo decorrido)
+    if key.lower() in TECLAS_MOVIMENTO:
+        teclas_pressionadas.add(key.lower())
     
     # Escala
     if key == b'+': 
@@ -1013,8 +5336,8 @@ def keyboard(key, x, y):
         
     # Iluminação
     elif key in (b'm', b'M'):
-        modelo_iluminacao = (modelo_iluminacao + 1) % 3
-        nomes = ["Flat", "Gouraud", "Phong"]
+        modelo_iluminacao = (modelo_iluminacao + 1) % 4
+        nomes = ["Flat", "Gouraud", "Phong", "Phong GLSL"]
         print(f"Modo Iluminacao: {nomes[modelo_iluminacao]}")
     
     # Wireframe
@@ -1026,6 +5349,33 @@ def keyboard(key, x, y):
     elif key in (b't', b'T'):
         mostrar_comandos = not mostrar_comandos
 
+    # Perfil de desempenho no HUD
+    elif key in (b'r', b'R'):
+        mostrar_perfil = not mostrar_perfil
+
+    # VBO / modo imediato
+    elif key in (b'v', b'V'):
+        usar_vbo = not usar_vbo
+        print(f"Geometria: {'VBO' if usar_vbo else 'Modo imediato'}")
+
+    # Phong por software em ladrilhos (pool de processos)
+    elif key in (b'b', b'B'):
+        rasterizacao_ladrilhos = not rasterizacao_ladrilhos
+        if rasterizacao_ladrilhos:
+            print(f"Scanline em ladrilhos: {rasterizador_ladrilhos.processos} processos")
+        else:
+            print("Scanline em ladrilhos: OFF")
+
+    # Phong por software diferido (G-buffer)
+    elif key in (b'g', b'G'):
+        sombreamento_diferido = not sombreamento_diferido
+        print(f"Sombreamento diferido: {'ON' if sombreamento_diferido else 'OFF'}")
+
+    # Níveis de detalhe (LOD)
+    elif key in (b'q', b'Q'):
+        usar_lod = not usar_lod
+        print(f"Níveis de detalhe: {'ON' if usar_lod else 'OFF'}")
+
     # Controles do Modo Extrusão
     if modo_extrusao:
         if key in (b'e', b'E'):
@@ -1034,38 +5384,44 @@ def keyboard(key, x, y):
                 print("Extrusão 3D ATIVADA")
             else:
                 print("Extrusão 3D DESATIVADA - Modo edição de perfil 2D")
-            glutPostRedisplay()
+            pedir_redesenho()
         elif key in (b'c', b'C'):
             limpar_perfil()
             extrusao_ativa = False
-            glutPostRedisplay()
+            pedir_redesenho()
         elif key in (b'h', b'H'):
             altura_extrusao += 0.2
             print(f"Altura extrusão: {altura_extrusao:.2f}")
-            glutPostRedisplay()
+            pedir_redesenho()
         elif key in (b'n', b'N'):
             altura_extrusao = max(0.1, altura_extrusao - 0.2)
             print(f"Altura extrusão: {altura_extrusao:.2f}")
-            glutPostRedisplay()
+            pedir_redesenho()
+        elif key in (b'x', b'X'):
+            extrusao_indexada = not extrusao_indexada
+            print(f"Malha da extrusão: {'Indexada' if extrusao_indexada else 'Por face'}")
+            pedir_redesenho()
+        elif key in (b'z', b'Z'):
+            if extrusao_ativa and len(perfil_extrusao) >= 3:
+                triangulos = exportar_stl(ARQUIVO_STL_EXTRUSAO, obter_malha_extrusao())
+                print(f"Extrusão exportada: {ARQUIVO_STL_EXTRUSAO} ({triangulos} triângulos)")
+            else:
+                print("Ative a extrusão 3D [E] para exportar em STL")
 
-    glutPostRedisplay()
+    pedir_redesenho()
 
 
 def mouse_motion(x, y):
     """Função chamada quando o mouse se move no modo câmera"""
-    global camera_yaw, camera_pitch, ultimo_mouse_x, ultimo_mouse_y
-    global mouse_capturado, sensibilidade_mouse, modo_camera
+    global mouse_dx_pendente, mouse_dy_pendente, ultimo_mouse_x, ultimo_mouse_y
+    global mouse_capturado, modo_camera
     
     if not modo_camera or not mouse_capturado:
         return
     
-    dx = x - ultimo_mouse_x
-    dy = y - ultimo_mouse_y
-    
-    camera_yaw -= dx * sensibilidade_mouse
-    camera_pitch -= dy * sensibilidade_mouse
-    
-    camera_pitch = max(-89.0, min(89.0, camera_pitch))
+    # Só acumula: o laço de quadros aplica a soma uma vez por quadro
+    mouse_dx_pendente += x - ultimo_mouse_x
+    mouse_dy_pendente += y - ultimo_mouse_y
     
     centro_x = glutGet(GLUT_WINDOW_WIDTH) // 2
     centro_y = glutGet(GLUT_WINDOW_HEIGHT) // 2
@@ -1077,93 +5433,1228 @@ def mouse_motion(x, y):
     else:
         ultimo_mouse_x = x
         ultimo_mouse_y = y
-    
-    glutPostRedisplay()
 
 
 def special_keys(key, x, y):
-    global pos_x, pos_y
-    if key == GLUT_KEY_UP: pos_y += 0.1
-    elif key == GLUT_KEY_DOWN: pos_y -= 0.1
-    elif key == GLUT_KEY_LEFT: pos_x -= 0.1
-    elif key == GLUT_KEY_RIGHT: pos_x += 0.1
-    glutPostRedisplay()
+    # Setas: movem o objeto enquanto pressionadas (ver avancar_simulacao)
+    if key in TECLAS_SETAS:
+        teclas_pressionadas.add(key)
+
+
+# ==========================================
+# LAÇO DE QUADROS (PASSO FIXO + ENTRADA ACUMULADA)
+# ==========================================
+# Teclas de movimento contínuo (enquanto pressionadas)
+TECLAS_MOVIMENTO = (b'w', b'a', b's', b'd')
+TECLAS_SETAS = (GLUT_KEY_UP, GLUT_KEY_DOWN, GLUT_KEY_LEFT, GLUT_KEY_RIGHT)
+
+teclas_pressionadas = set()   # bytes (WASD) e códigos GLUT (setas)
+mouse_dx_pendente = 0         # Deslocamento do mouse ainda não aplicado
+mouse_dy_pendente = 0
+redesenho_pendente = True     # Algo mudou desde o último quadro
+_relogio_quadros = {"anterior": None, "acumulado": 0.0}
+
+
+def pedir_redesenho():
+    """Marca o quadro como sujo; o próximo tique do laço chama glutPostRedisplay uma vez."""
+    global redesenho_pendente
+    redesenho_pendente = True
+
+
+def keyboard_up(key, x, y):
+    """Solta uma tecla de movimento (glutKeyboardUpFunc)."""
+    teclas_pressionadas.discard(key.lower())
+
+
+def special_keys_up(key, x, y):
+    """Solta uma seta (glutSpecialUpFunc)."""
+    teclas_pressionadas.discard(key)
+
+
+def avancar_simulacao(dt):
+    """
+    Aplica as teclas seguradas durante dt segundos (um passo fixo).
+
+    Modo câmera: WASD move a câmera (velocidade_camera unidades/s).
+    Modo objeto: WASD gira o objeto (velocidade_rotacao graus/s).
+    Setas: movem o objeto (velocidade_objeto unidades/s).
+
+    Returns:
+        bool: True se alguma tecla de movimento estava pressionada
+    """
+    global rot_x, rot_y, pos_x, pos_y, modo_camera
+    global velocidade_camera, velocidade_rotacao, velocidade_objeto
+
+    if not teclas_pressionadas:
+        return False
+
+    if modo_camera:
+        distancia = velocidade_camera * dt
+        if b'w' in teclas_pressionadas: mover_camera_frente(distancia)
+        if b's' in teclas_pressionadas: mover_camera_tras(distancia)
+        if b'a' in teclas_pressionadas: mover_camera_esquerda(distancia)
+        if b'd' in teclas_pressionadas: mover_camera_direita(distancia)
+    else:
+        angulo = velocidade_rotacao * dt
+        if b'w' in teclas_pressionadas: rot_x -= angulo
+        if b's' in teclas_pressionadas: rot_x += angulo
+        if b'a' in teclas_pressionadas: rot_y -= angulo
+        if b'd' in teclas_pressionadas: rot_y += angulo
+
+    distancia = velocidade_objeto * dt
+    if GLUT_KEY_UP in teclas_pressionadas: pos_y += distancia
+    if GLUT_KEY_DOWN in teclas_pressionadas: pos_y -= distancia
+    if GLUT_KEY_LEFT in teclas_pressionadas: pos_x -= distancia
+    if GLUT_KEY_RIGHT in teclas_pressionadas: pos_x += distancia
+    return True
+
+
+def aplicar_mouse_pendente():
+    """Aplica de uma vez todo o deslocamento do mouse acumulado desde o último quadro."""
+    global camera_yaw, camera_pitch, mouse_dx_pendente, mouse_dy_pendente
+    global sensibilidade_mouse
+
+    if mouse_dx_pendente == 0 and mouse_dy_pendente == 0:
+        return False
+    camera_yaw -= mouse_dx_pendente * sensibilidade_mouse
+    camera_pitch -= mouse_dy_pendente * sensibilidade_mouse
+    camera_pitch = max(-89.0, min(89.0, camera_pitch))
+    mouse_dx_pendente = 0
+    mouse_dy_pendente = 0
+    return True
+
+
+def tique_quadro(agora):
+    """
+    Um tique do laço: simula em passos fixos o tempo decorrido e aplica o mouse.
+
+    O tempo real é acumulado e consumido em passos de passo_simulacao, de
+    modo que o movimento independe da taxa de quadros e da repetição de
+    teclas do sistema (no máximo 0.25 s por tique, para não "saltar" após
+    uma pausa).
+
+    Returns:
+        bool: True se o quadro precisa ser redesenhado
+    """
+    global redesenho_pendente, passo_simulacao
+
+    anterior = _relogio_quadros["anterior"]
+    _relogio_quadros["anterior"] = agora
+    if anterior is not None:
+        _relogio_quadros["acumulado"] += min(agora - anterior, 0.25)
+
+    mudou = False
+    while _relogio_quadros["acumulado"] >= passo_simulacao:
+        mudou = avancar_simulacao(passo_simulacao) or mudou
+        _relogio_quadros["acumulado"] -= passo_simulacao
+    if not teclas_pressionadas:
+        _relogio_quadros["acumulado"] = 0.0
+
+    mudou = aplicar_mouse_pendente() or mudou
+    redesenhar = mudou or redesenho_pendente
+    redesenho_pendente = False
+    return redesenhar
+
+
+def quadro_temporizado(valor=0):
+    """
+    Callback de glutTimerFunc: processa a entrada e agenda o próximo tique.
+
+    Redesenha no máximo uma vez por tique e só se algo mudou; o intervalo
+    entre tiques respeita fps_maximo (0 = sem limite), o que limita o uso
+    de CPU mesmo com o mouse gerando centenas de eventos por segundo.
+    """
+    global fps_maximo
+
+    inicio = time.perf_counter()
+    if tique_quadro(inicio):
+        glutPostRedisplay()
+
+    intervalo = 1.0 / fps_maximo if fps_maximo > 0 else 0.0
+    espera = max(0.0, intervalo - (time.perf_counter() - inicio))
+    glutTimerFunc(int(espera * 1000), quadro_temporizado, 0)
+
+
+def raio_do_clique(x, y):
+    """
+    Raio que passa pelo pixel (x, y), no espaço do objeto.
+
+    Desprojeta o clique nos planos perto e longe com as matrizes do último
+    frame (câmera real, projeção e transformações do objeto).
+
+    Returns:
+        tuple: (origem, direcao), arrays (3,)
+    """
+    perto, longe = desprojetar_pontos([(x, y, 0.0), (x, y, 1.0)], modelview_objeto)
+    return perto, longe - perto
+
+
+def clique_para_plano_perfil(x, y):
+    """
+    Converte um clique (pixels) no ponto correspondente do plano z=0 do objeto.
+
+    Returns:
+        tuple: (x, y) no espaço do objeto, ou None se o raio do clique não
+               atinge o plano à frente da câmera
+    """
+    perto, direcao = raio_do_clique(x, y)
+    if abs(direcao[2]) < 1e-12:
+        return None
+    t = -perto[2] / direcao[2]
+    if t < 0.0:
+        return None
+    ponto = perto + t * direcao
+    return float(ponto[0]), float(ponto[1])
+
+
+def clique_para_perfil(x, y):
+    """
+    Ponto do perfil sob um clique.
+
+    Com a extrusão 3D visível, o ponto encaixa na superfície atingida pelo
+    raio (picking na BVH da malha da extrusão), em vez do plano z=0 atrás
+    dela; senão, é o ponto do plano z=0 (clique_para_plano_perfil).
+    """
+    global extrusao_ativa, perfil_extrusao
+
+    if extrusao_ativa and len(perfil_extrusao) >= 3:
+        acerto = picking_malha(obter_malha_extrusao(), *raio_do_clique(x, y))
+        if acerto is not None:
+            return float(acerto[1][0]), float(acerto[1][1])
+    return clique_para_plano_perfil(x, y)
 
 
 def mouse_click_extrusao(button, state, x, y):
     """
     Manipula cliques do mouse para adicionar pontos ao perfil de extrusão.
     
-    Converte coordenadas de clique (pixels) para coordenadas do mundo 3D:
-    1. Normaliza x, y de pixels para [-1, 1]
-    2. Ajusta pela proporção da tela (aspect ratio)
-    3. Escala para o tamanho da cena (baseado em projeção ortográfica/perspectiva)
-    4. Adiciona o ponto (x_world, y_world) ao perfil 2D
+    Converte coordenadas de clique (pixels) para coordenadas do perfil:
+    1. Desprojeta o clique com as matrizes do último frame (câmera real +
+       transformações do objeto), gerando um raio
+    2. Intersecta o raio com a extrusão 3D, se visível, ou com o plano z=0
+       do objeto (plano do perfil)
+    3. Adiciona o ponto (x, y) ao perfil 2D
+    
+    Cliques cujo raio não atinge o plano à frente da câmera (vista de
+    perfil) são ignorados.
     
     Apenas no modo extrusão (tecla [6]) e com botão esquerdo do mouse.
     """
-    global modo_extrusao, projecao_ortografica
+    global modo_extrusao
     
     if not modo_extrusao:
         return
     
     if button == GLUT_LEFT_BUTTON and state == GLUT_DOWN:
-        width = glutGet(GLUT_WINDOW_WIDTH)
-        height = glutGet(GLUT_WINDOW_HEIGHT)
-        aspecto = float(width) / float(height)
-        
-        x_norm = (x / width) * 2.0 - 1.0
-        y_norm = ((height - y) / height) * 2.0 - 1.0
-        
-        escala = 5.0
-        if projecao_ortografica:
-            if width <= height:
-                x_world = x_norm * escala
-                y_world = y_norm * (escala / aspecto)
+        ponto = clique_para_perfil(x, y)
+        if ponto is None:
+            print("Clique fora do plano do perfil")
+            return
+        adicionar_ponto_perfil(*ponto)
+        pedir_redesenho()
+
+
+# Último ponto escolhido com o mouse no objeto: triângulo, ponto e segmento
+# da normal (espaço do objeto) e a versão da malha em que foi escolhido
+ponto_picking = None
+
+
+def chave_picking():
+    """Identifica o que está na tela: o objeto e a versão da sua malha (ou a cena)."""
+    global objeto_selecionado
+
+    if objeto_selecionado == OBJETO_CENA:
+        return objeto_selecionado, id(obter_grafo_cena())
+    malha = malha_objeto(objeto_selecionado)
+    return objeto_selecionado, None if malha is None else malha.versao
+
+
+def mouse_click_picking(button, state, x, y):
+    """
+    Clique esquerdo fora do modo extrusão: escolhe o ponto do objeto
+    selecionado sob o cursor (picking na BVH da malha que está na tela, no
+    nível de detalhe do último quadro; na cena, nos nós desenhados) e o
+    marca na cena.
+    """
+    global ponto_picking, objeto_selecionado, view_quadro
+
+    if button != GLUT_LEFT_BUTTON or state != GLUT_DOWN:
+        return
+    no = None
+    if objeto_selecionado == OBJETO_CENA:
+        acerto = obter_grafo_cena().picking(*raio_do_clique(x, y))
+        if acerto is not None:
+            no, *acerto = acerto
+    else:
+        acerto = picking_malha(malha_desenhada(objeto_selecionado), *raio_do_clique(x, y))
+    if acerto is None:
+        ponto_picking = None
+        print("Picking: nenhum triângulo sob o cursor")
+    else:
+        triangulo, ponto, normal = acerto
+        ponto_picking = {"chave": chave_picking(), "triangulo": triangulo, "ponto": ponto,
+                         "normal": Malha(np.empty((0, 3)), np.empty((0, 3)), [],
+                                         [(ponto, ponto + 0.4 * normal)])}
+        # Objeto → mundo: modelo = view⁻¹ · modelview do objeto
+        modelo = np.linalg.inv(view_quadro) @ modelview_objeto
+        mundo = modelo[:3, :3] @ ponto + modelo[:3, 3]
+        normal_mundo = np.linalg.inv(modelo[:3, :3]).T @ normal
+        normal_mundo /= max(np.linalg.norm(normal_mundo), 1e-12)
+        print(f"Picking: {'' if no is None else f'nó {no}, '}triângulo {triangulo}, ponto ({mundo[0]:.3f}, {mundo[1]:.3f}, "
+              f"{mundo[2]:.3f}), normal ({normal_mundo[0]:.3f}, {normal_mundo[1]:.3f}, "
+              f"{normal_mundo[2]:.3f})")
+    pedir_redesenho()
+
+
+def mouse_click(button, state, x, y):
+    """Callback de glutMouseFunc: perfil no modo extrusão, picking nos objetos."""
+    global modo_extrusao
+
+    if modo_extrusao:
+        mouse_click_extrusao(button, state, x, y)
+    else:
+        mouse_click_picking(button, state, x, y)
+
+
+def desenhar_marcador_picking():
+    """
+    Desenha o ponto escolhido por mouse_click_picking (esfera pequena e
+    segmento ao longo da normal), se ele é do objeto que está na tela.
+    Chamada com as transformações do objeto aplicadas.
+    """
+    global ponto_picking, objeto_selecionado, modo_extrusao
+
+    if ponto_picking is None or modo_extrusao or ponto_picking["chave"] != chave_picking():
+        return
+
+    glDisable(GL_LIGHTING)
+    glColor3f(1.0, 0.2, 0.2)  # Vermelho
+    desenhar_malha(ponto_picking["normal"], "picking_normal", wireframe=True)
+    pilha_modelview.empilhar()
+    pilha_modelview.transladar(*ponto_picking["ponto"])
+    pilha_modelview.carregar_no_gl()
+    desenhar_malha(malha_procedural("esfera", 0.05, 8, 8), "picking")
+    pilha_modelview.desempilhar()
+    pilha_modelview.carregar_no_gl()
+    glEnable(GL_LIGHTING)
+
+
+# ==========================================
+# RENDERIZAÇÃO POR SOFTWARE (SEM JANELA)
+# ==========================================
+class RenderizadorSoftware:
+    """
+    Rasterizador 100% em CPU, com framebuffer e z-buffer próprios.
+
+    Não depende de GLUT nem de contexto OpenGL: transforma os vértices com
+    as matrizes da CPU (PilhaMatrizes), rasteriza triângulos por funções de
+    aresta (vetorizado com NumPy na bounding box de cada triângulo) e faz
+    o teste de profundidade como GL_LESS. A interpolação é corrigida pela
+    perspectiva.
+
+    A iluminação usa o modelo de phong_shading_point (ContextoSombreamento)
+    no espaço do mundo, com a luz em luz_x/luz_y/luz_z:
+    - 0 Flat: uma cor por triângulo, calculada no último vértice (como
+      GL_FLAT), sem especular
+    - 1 Gouraud: cor calculada nos vértices e interpolada, sem especular
+    - 2 Phong e 3 Phong GLSL: P e N interpolados e iluminação por pixel,
+      com especular (o mesmo cálculo do shader de ProgramaPhongGLSL)
+    """
+
+    def __init__(self, largura, altura, cor_fundo=(0.0, 0.0, 0.0)):
+        self.largura = largura
+        self.altura = altura
+        self.cor_fundo = cor_fundo
+        self.cor = np.empty((altura, largura, 3))
+        self.profundidade = np.empty((altura, largura))
+        self.limpar()
+
+    def limpar(self):
+        """Equivalente a glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)."""
+        self.cor[:] = self.cor_fundo
+        self.profundidade[:] = 1.0
+
+    def _para_janela(self, clip):
+        """Converte coordenadas de recorte (..., 4) em (x, y, z) de janela."""
+        ndc = clip[..., :3] / clip[..., 3:4]
+        janela = np.empty_like(ndc)
+        janela[..., 0] = (ndc[..., 0] + 1.0) / 2.0 * self.largura
+        janela[..., 1] = self.altura - (ndc[..., 1] + 1.0) / 2.0 * self.altura
+        janela[..., 2] = (ndc[..., 2] + 1.0) / 2.0
+        return janela
+
+    def desenhar_triangulos(self, vertices, normais, modelo, view, projecao, base_color,
+                            modelo_iluminacao=2, iluminado=True, contexto=None):
+        """
+        Rasteriza e ilumina triângulos.
+
+        Args:
+            vertices: array (T, 3, 3) com os vértices no espaço do objeto
+            normais: array (T, 3, 3) com a normal de cada vértice
+            modelo: matriz 4x4 objeto → mundo
+            view: matriz 4x4 mundo → câmera
+            projecao: matriz 4x4 de projeção
+            base_color: (r, g, b) cor do material
+            modelo_iluminacao: 0 Flat, 1 Gouraud, 2 ou 3 Phong
+            iluminado: False pinta com base_color sem iluminação
+            contexto: ContextoSombreamento do frame (padrão: estado atual)
+        """
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3, 3)
+        normais = np.asarray(normais, dtype=np.float64).reshape(-1, 3, 3)
+        if len(vertices) == 0:
+            return
+
+        mundo = vertices @ modelo[:3, :3].T + modelo[:3, 3]
+        normais_mundo = normais @ np.linalg.inv(modelo[:3, :3])
+        mundo_h = np.concatenate([mundo, np.ones(mundo.shape[:2] + (1,))], axis=2)
+        clip = mundo_h @ (projecao @ view).T
+
+        # Triângulos que cruzam o plano near são descartados inteiros
+        visiveis = np.all((clip[..., 3] > 0) & (clip[..., 2] >= -clip[..., 3]), axis=1)
+        janela = self._para_janela(clip)
+        inv_w = 1.0 / clip[..., 3]
+
+        if contexto is None:
+            contexto = ContextoSombreamento.do_estado_atual()
+        base = np.asarray(base_color, dtype=np.float64)
+        if not iluminado:
+            cores_vertices = np.broadcast_to(base, mundo.shape)
+        elif modelo_iluminacao == 0:
+            cores_face = contexto.shade(mundo[:, 2], normais_mundo[:, 2], base_color,
+                                        especular=False)
+            cores_vertices = np.repeat(cores_face[:, None], 3, axis=1)
+        elif modelo_iluminacao == 1:
+            cores_vertices = contexto.shade(mundo.reshape(-1, 3),
+                                            normais_mundo.reshape(-1, 3), base_color,
+                                            especular=False).reshape(-1, 3, 3)
+        else:
+            cores_vertices = None
+
+        for t in np.nonzero(visiveis)[0]:
+            fragmentos = self._rasterizar(janela[t])
+            if fragmentos is None:
+                continue
+            linhas, colunas, b, z = fragmentos
+
+            # Interpolação corrigida pela perspectiva
+            q = b * inv_w[t]
+            q /= (q[:, 0] + q[:, 1] + q[:, 2])[:, None]
+
+            if cores_vertices is None:
+                P = q @ mundo[t]
+                N = q @ normais_mundo[t]
+                cores = contexto.shade(P, N, base_color)
             else:
-                x_world = x_norm * (escala * aspecto)
-                y_world = y_norm * escala
+                cores = q @ cores_vertices[t]
+
+            self.cor[linhas, colunas] = cores
+            self.profundidade[linhas, colunas] = z
+
+    def _rasterizar(self, janela):
+        """
+        Encontra os pixels cobertos por um triângulo em coordenadas de janela
+        que passam no teste de profundidade.
+
+        Returns:
+            tuple: (linhas, colunas, baricentricas (N, 3), z) ou None
+        """
+        (x0, y0, z0), (x1, y1, z1), (x2, y2, z2) = janela
+        area = (x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0)
+        if area == 0:
+            return None
+
+        # Centros de pixel (c + 0.5) dentro da bounding box, limitados à tela
+        x_min = max(int(math.ceil(min(x0, x1, x2) - 0.5)), 0)
+        x_max = min(int(math.floor(max(x0, x1, x2) - 0.5)), self.largura - 1)
+        y_min = max(int(math.ceil(min(y0, y1, y2) - 0.5)), 0)
+        y_max = min(int(math.floor(max(y0, y1, y2) - 0.5)), self.altura - 1)
+        if x_min > x_max or y_min > y_max:
+            return None
+
+        colunas, linhas = np.meshgrid(np.arange(x_min, x_max + 1), np.arange(y_min, y_max + 1))
+        colunas = colunas.ravel()
+        linhas = linhas.ravel()
+        px = colunas + 0.5
+        py = linhas + 0.5
+
+        # Funções de aresta (cada uma oposta a um vértice)
+        w0 = (x2 - x1) * (py - y1) - (y2 - y1) * (px - x1)
+        w1 = (x0 - x2) * (py - y2) - (y0 - y2) * (px - x2)
+        w2 = (x1 - x0) * (py - y0) - (y1 - y0) * (px - x0)
+        if area < 0:
+            w0, w1, w2, area = -w0, -w1, -w2, -area
+        dentro = (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+
+        b = np.stack([w0[dentro], w1[dentro], w2[dentro]], axis=1) / area
+        linhas = linhas[dentro]
+        colunas = colunas[dentro]
+        z = b[:, 0] * z0 + b[:, 1] * z1 + b[:, 2] * z2
+
+        # Teste de profundidade (GL_LESS)
+        passou = z < self.profundidade[linhas, colunas]
+        if not passou.any():
+            return None
+        return linhas[passou], colunas[passou], b[passou], z[passou]
+
+    def desenhar_linhas(self, segmentos, modelview, projecao, cor):
+        """
+        Desenha segmentos de reta (largura de 1 pixel) com teste de profundidade.
+
+        Args:
+            segmentos: array (S, 2, 3) com os extremos no espaço do objeto
+            modelview: matriz 4x4 objeto → câmera
+            projecao: matriz 4x4 de projeção
+            cor: (r, g, b)
+        """
+        segmentos = np.asarray(segmentos, dtype=np.float64).reshape(-1, 2, 3)
+        if len(segmentos) == 0:
+            return
+        homogeneos = np.concatenate([segmentos, np.ones((len(segmentos), 2, 1))], axis=2)
+        clip = homogeneos @ (projecao @ modelview).T
+        visiveis = np.all((clip[..., 3] > 0) & (clip[..., 2] >= -clip[..., 3]), axis=1)
+        janela = self._para_janela(clip[visiveis])
+        if len(janela) == 0:
+            return
+
+        # Amostra cada segmento a cada pixel ao longo do maior eixo (DDA)
+        delta = janela[:, 1] - janela[:, 0]
+        passos = np.ceil(np.maximum(np.abs(delta[:, 0]), np.abs(delta[:, 1]))).astype(np.int64) + 1
+        segmento = np.repeat(np.arange(len(janela)), passos)
+        inicio = np.cumsum(passos) - passos
+        k = np.arange(len(segmento)) - inicio[segmento]
+        t = (k / np.maximum(passos[segmento] - 1, 1))[:, None]
+        pontos = janela[segmento, 0] + t * delta[segmento]
+
+        colunas = np.floor(pontos[:, 0]).astype(np.int64)
+        linhas = np.floor(pontos[:, 1]).astype(np.int64)
+        na_tela = (colunas >= 0) & (colunas < self.largura) & (linhas >= 0) & (linhas < self.altura)
+        colunas, linhas, z = colunas[na_tela], linhas[na_tela], pontos[na_tela, 2]
+
+        passou = z <= self.profundidade[linhas, colunas]
+        self.cor[linhas[passou], colunas[passou]] = cor
+        self.profundidade[linhas[passou], colunas[passou]] = z[passou]
+
+    def imagem(self):
+        """Retorna o framebuffer como array (altura, largura, 3) uint8."""
+        return (np.clip(self.cor, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def desenhar_objeto_software(renderizador, modelo, view, projecao, contexto=None):
+    """
+    Equivalente de desenhar_objeto() para o RenderizadorSoftware.
+
+    Returns:
+        bool: False se o objeto selecionado não tem malha
+    """
+    global objeto_selecionado, modo_wireframe, modo_extrusao, modelo_iluminacao
+    global perfil_extrusao, altura_extrusao, num_segmentos_extrusao, extrusao_ativa
+
+    base_color = (0.0, 0.5, 1.0)  # Azul
+    modelview = view @ modelo
+
+    if modo_extrusao:
+        if not extrusao_ativa or len(perfil_extrusao) < 3:
+            # Perfil 2D em amarelo
+            if len(perfil_extrusao) >= 2:
+                renderizador.desenhar_linhas(obter_malha_perfil().segmentos,
+                                             modelview, projecao, (1.0, 1.0, 0.0))
+        elif modo_wireframe:
+            renderizador.desenhar_linhas(obter_malha_extrusao().segmentos,
+                                         modelview, projecao, base_color)
         else:
-            x_world = x_norm * escala * aspecto
-            y_world = y_norm * escala
-        
-        adicionar_ponto_perfil(x_world, y_world)
-        glutPostRedisplay()
+            nivel = nivel_lod("extrusao", obter_malha_extrusao(), num_niveis_extrusao(),
+                              modelview, projecao, renderizador.altura)
+            vertices, normais = obter_malha_extrusao(nivel).triangulos()
+            renderizador.desenhar_triangulos(vertices, normais, modelo, view, projecao,
+                                             base_color, modelo_iluminacao, contexto=contexto)
+        return True
+
+    if objeto_selecionado == OBJETO_CENA:
+        grafo = obter_grafo_cena()
+        mundo, visivel, niveis = grafo.visiveis(modelo, view, projecao, renderizador.altura)
+        cores = grafo.arrays["cores"]
+        for _, _, malha, indices in grafo.lotes(visivel, niveis):
+            vertices, normais = malha.triangulos()
+            for i in indices.tolist():
+                if modo_wireframe:
+                    renderizador.desenhar_linhas(arame_malha(malha).segmentos, view @ mundo[i],
+                                                 projecao, tuple(cores[i]))
+                else:
+                    renderizador.desenhar_triangulos(vertices, normais, mundo[i], view, projecao,
+                                                     tuple(cores[i]), modelo_iluminacao,
+                                                     contexto=contexto)
+        return True
+
+    # Esfera, Cubo, Cone, Torus e Teapot: as mesmas malhas do caminho OpenGL
+    malha = malha_objeto(objeto_selecionado, modo_wireframe)
+    if malha is None:
+        return False
+    if modo_wireframe:
+        renderizador.desenhar_linhas(malha.segmentos, modelview, projecao, base_color)
+    else:
+        malhas = malhas_lod(objeto_selecionado) if objeto_selecionado in NIVEIS_LOD else [malha]
+        nivel = nivel_lod(objeto_selecionado, malha, len(malhas), modelview, projecao,
+                          renderizador.altura)
+        vertices, normais = malhas[nivel].triangulos()
+        renderizador.desenhar_triangulos(vertices, normais, modelo, view, projecao,
+                                         base_color, modelo_iluminacao, contexto=contexto)
+    return True
+
+
+def renderizar_cena_software(largura=800, altura=600, renderizador=None):
+    """
+    Renderiza, sem janela, a mesma cena que display() monta com o estado atual.
+
+    Mesma câmera (fixa ou primeira pessoa), mesma projeção de reshape(),
+    indicador da luz (esfera amarela em luz_x/luz_y/luz_z) e o objeto com
+    as transformações de posição, rotação e escala. O HUD não é desenhado.
+
+    Returns:
+        np.ndarray: imagem (altura, largura, 3) uint8
+    """
+    global luz_x, luz_y, luz_z
+
+    if renderizador is None:
+        renderizador = RenderizadorSoftware(largura, altura)
+    renderizador.limpar()
+
+    projecao = PilhaMatrizes()
+    aplicar_projecao(projecao, renderizador.largura, renderizador.altura)
+    view = PilhaMatrizes()
+    aplicar_camera(view)
+
+    # Indicador da luz (sem iluminação)
+    esfera_luz, normais_luz = malha_procedural("esfera", 0.2, 10, 10).triangulos()
+    renderizador.desenhar_triangulos(esfera_luz, normais_luz, matriz_translacao(luz_x, luz_y, luz_z),
+                                     view.topo, projecao.topo, (1.0, 1.0, 0.0), iluminado=False)
+
+    modelo = PilhaMatrizes()
+    aplicar_transformacoes_objeto(modelo)
+    contexto = ContextoSombreamento.do_estado_atual()
+    if not desenhar_objeto_software(renderizador, modelo.topo, view.topo, projecao.topo, contexto):
+        print(f"Aviso: objeto {objeto_selecionado} não existe", file=sys.stderr)
+
+    return renderizador.imagem()
+
+
+def salvar_imagem(caminho, imagem):
+    """Salva uma imagem (altura, largura, 3) uint8 como PNG ou PPM (pela extensão)."""
+    imagem = np.ascontiguousarray(imagem, dtype=np.uint8)
+    altura, largura = imagem.shape[:2]
+
+    if caminho.lower().endswith(".png"):
+        def bloco(tipo, dados):
+            return (struct.pack(">I", len(dados)) + tipo + dados +
+                    struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF))
+
+        # Cada linha começa com o byte de filtro 0 (nenhum)
+        linhas = np.zeros((altura, 1 + 3 * largura), dtype=np.uint8)
+        linhas[:, 1:] = imagem.reshape(altura, -1)
+        dados = (b"\x89PNG\r\n\x1a\n" +
+                 bloco(b"IHDR", struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0)) +
+                 bloco(b"IDAT", zlib.compress(linhas.tobytes(), 6)) +
+                 bloco(b"IEND", b""))
+    else:
+        dados = f"P6\n{largura} {altura}\n255\n".encode("ascii") + imagem.tobytes()
+
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(dados)
+
+
+def carregar_ppm(caminho):
+    """Lê uma imagem PPM binária (P6, 8 bits) como array (altura, largura, 3) uint8."""
+    with open(caminho, "rb") as arquivo:
+        dados = arquivo.read()
+    campos = []
+    posicao = 0
+    while len(campos) < 4:
+        while dados[posicao:posicao + 1].isspace():
+            posicao += 1
+        if dados[posicao:posicao + 1] == b"#":
+            posicao = dados.index(b"\n", posicao)
+            continue
+        fim = posicao
+        while not dados[fim:fim + 1].isspace():
+            fim += 1
+        campos.append(dados[posicao:fim])
+        posicao = fim
+    if campos[0] != b"P6" or campos[3] != b"255":
+        raise ValueError(f"{caminho}: apenas PPM P6 de 8 bits é suportado")
+    largura, altura = int(campos[1]), int(campos[2])
+    pixels = np.frombuffer(dados, dtype=np.uint8, count=largura * altura * 3, offset=posicao + 1)
+    return pixels.reshape(altura, largura, 3)
+
+
+def main_headless(argv=None):
+    """
+    Renderiza a cena sem janela e salva a imagem (uso em CI / render farm).
+
+    Exemplo:
+        python "Mod python Nick 1.py" --headless --objeto 2 --iluminacao 2 \\
+            --rotacao 20 30 -o cubo.png
+    """
+    global objeto_selecionado, modelo_iluminacao, modo_wireframe, projecao_ortografica
+    global rot_x, rot_y, pos_x, pos_y, pos_z, scale, luz_x, luz_y, luz_z
+    global modo_camera, camera_x, camera_y, camera_z, camera_yaw, camera_pitch
+    global modo_extrusao, extrusao_ativa, perfil_extrusao, altura_extrusao, num_segmentos_extrusao
+    global furos_extrusao, extrusao_indexada, angulo_suavizacao, usar_lod, limiares_lod
+
+    parser = argparse.ArgumentParser(
+        prog='"Mod python Nick 1.py" --headless',
+        description="Renderiza a cena na CPU, sem GLUT nem contexto OpenGL")
+    parser.add_argument("-o", "--saida", default="cena.png", help="arquivo .png ou .ppm")
+    parser.add_argument("--largura", type=int, default=800)
+    parser.add_argument("--altura", type=int, default=600)
+    parser.add_argument("--objeto", type=int, choices=range(1, 9), default=objeto_selecionado,
+                        help="1-5 objetos padrão, 6 extrusão, 7 modelo (--modelo), 8 cena")
+    parser.add_argument("--modelo", metavar="ARQUIVO",
+                        help="malha .obj, .ply ou .stl (binários) desenhada como objeto 7")
+    parser.add_argument("--stl", metavar="ARQUIVO", help="exporta a extrusão em STL binário")
+    parser.add_argument("--iluminacao", type=int, choices=range(4), default=modelo_iluminacao,
+                        help="0 Flat, 1 Gouraud, 2 Phong, 3 Phong GLSL (por pixel, como 2)")
+    parser.add_argument("--wireframe", action="store_true")
+    parser.add_argument("--ortografica", action="store_true")
+    parser.add_argument("--rotacao", type=float, nargs=2, metavar=("X", "Y"), default=(rot_x, rot_y))
+    parser.add_argument("--posicao", type=float, nargs=3, metavar=("X", "Y", "Z"),
+                        default=(pos_x, pos_y, pos_z))
+    parser.add_argument("--escala", type=float, default=scale)
+    parser.add_argument("--luz", type=float, nargs=3, metavar=("X", "Y", "Z"),
+                        default=(luz_x, luz_y, luz_z))
+    parser.add_argument("--camera", type=float, nargs=5, metavar=("X", "Y", "Z", "YAW", "PITCH"),
+                        help="usa a câmera em primeira pessoa nesta pose")
+    parser.add_argument("--perfil", help='pontos da extrusão: "x,y x,y x,y ..."')
+    parser.add_argument("--furo", action="append", default=[],
+                        help='furo no perfil (mesmo formato; pode repetir)')
+    parser.add_argument("--altura-extrusao", type=float, default=altura_extrusao)
+    parser.add_argument("--segmentos", type=int, default=num_segmentos_extrusao)
+    parser.add_argument("--por-face", action="store_true",
+                        help="extrusão com triângulos soltos (sem malha indexada)")
+    parser.add_argument("--angulo-suavizacao", type=float, default=angulo_suavizacao,
+                        help="ângulo (graus) até o qual as normais da extrusão são suavizadas")
+    parser.add_argument("--repeticoes", type=int, default=1,
+                        help="renderiza N vezes e mostra o tempo médio por frame")
+    parser.add_argument("--referencia", help="imagem PPM para comparar com o resultado")
+    parser.add_argument("--lod-limiares", type=float, nargs="+", metavar="PIXELS",
+                        default=limiares_lod,
+                        help="diâmetro mínimo na tela (pixels) de cada nível de detalhe, "
+                             "do mais fino ao mais grosso")
+    parser.add_argument("--sem-lod", action="store_true",
+                        help="desenha sempre a tesselação mais fina")
+    args = parser.parse_args(argv)
+
+    objeto_selecionado = args.objeto
+    modo_extrusao = args.objeto == 6
+    modelo_iluminacao = args.iluminacao
+    modo_wireframe = args.wireframe
+    projecao_ortografica = args.ortografica
+    rot_x, rot_y = args.rotacao
+    pos_x, pos_y, pos_z = args.posicao
+    scale = args.escala
+    luz_x, luz_y, luz_z = args.luz
+    if args.camera is not None:
+        modo_camera = True
+        camera_x, camera_y, camera_z, camera_yaw, camera_pitch = args.camera
+    if args.perfil:
+        perfil_extrusao = [tuple(float(v) for v in ponto.split(",")) for ponto in args.perfil.split()]
+        extrusao_ativa = True
+    furos_extrusao = [[tuple(float(v) for v in ponto.split(",")) for ponto in furo.split()]
+                      for furo in args.furo]
+    altura_extrusao = args.altura_extrusao
+    num_segmentos_extrusao = args.segmentos
+    extrusao_indexada = not args.por_face
+    angulo_suavizacao = args.angulo_suavizacao
+    usar_lod = not args.sem_lod
+    limiares_lod = sorted(args.lod_limiares, reverse=True)
+    if args.modelo:
+        definir_modelo_externo(args.modelo)
+    elif objeto_selecionado == OBJETO_MODELO:
+        parser.error("--objeto 7 requer --modelo ARQUIVO")
+    if args.stl:
+        if not extrusao_ativa:
+            parser.error("--stl requer --perfil")
+        triangulos = exportar_stl(args.stl, obter_malha_extrusao())
+        print(f"{args.stl}: {triangulos} triângulos")
+
+    renderizador = RenderizadorSoftware(args.largura, args.altura)
+    inicio = time.perf_counter()
+    for _ in range(max(1, args.repeticoes)):
+        imagem = renderizar_cena_software(renderizador=renderizador)
+    duracao = (time.perf_counter() - inicio) / max(1, args.repeticoes)
+
+    salvar_imagem(args.saida, imagem)
+    print(f"{args.saida}: {args.largura}x{args.altura}, {duracao * 1000:.1f} ms/frame")
+
+    if args.referencia:
+        referencia = carregar_ppm(args.referencia)
+        if referencia.shape != imagem.shape:
+            print(f"Referência com tamanho diferente: {referencia.shape[1]}x{referencia.shape[0]}")
+            return 1
+        diferenca = np.abs(referencia.astype(np.int16) - imagem.astype(np.int16))
+        pixels = int(np.count_nonzero(diferenca.max(axis=2)))
+        print(f"Comparação com {args.referencia}: {pixels} pixels diferentes, "
+              f"diferença máxima {int(diferenca.max())}")
+        return 1 if pixels else 0
+    return 0
+
+
+# ==========================================
+# RENDERIZAÇÃO EM LOTE (ROTEIRO DE QUADROS)
+# ==========================================
+# Propriedades de uma pose do roteiro (as mesmas variáveis do teclado e do
+# --headless); as contínuas são interpoladas linearmente entre as chaves,
+# as demais valem a partir da chave em que aparecem
+PROPRIEDADES_POSE = ("objeto", "iluminacao", "rotacao", "posicao", "escala", "luz", "camera",
+                     "wireframe", "ortografica", "lod", "perfil", "furos", "altura_extrusao",
+                     "segmentos", "modelo")
+PROPRIEDADES_CONTINUAS = ("rotacao", "posicao", "escala", "luz", "camera", "altura_extrusao")
+
+# Motores do lote: CPU (RenderizadorSoftware) ou OpenGL num contexto sem janela
+MOTORES_LOTE = ("cpu", "egl", "osmesa")
+
+
+def aplicar_pose(pose):
+    """Define o estado da cena a partir de uma pose (dict) do roteiro."""
+    global objeto_selecionado, modelo_iluminacao, modo_wireframe, projecao_ortografica
+    global rot_x, rot_y, pos_x, pos_y, pos_z, scale, luz_x, luz_y, luz_z
+    global modo_camera, camera_x, camera_y, camera_z, camera_yaw, camera_pitch
+    global modo_extrusao, extrusao_ativa, perfil_extrusao, furos_extrusao
+    global altura_extrusao, num_segmentos_extrusao, usar_lod
+
+    if "objeto" in pose:
+        objeto_selecionado = pose["objeto"]
+        modo_extrusao = objeto_selecionado == 6
+    if "iluminacao" in pose:
+        modelo_iluminacao = pose["iluminacao"]
+    if "rotacao" in pose:
+        rot_x, rot_y = pose["rotacao"]
+    if "posicao" in pose:
+        pos_x, pos_y, pos_z = pose["posicao"]
+    if "escala" in pose:
+        scale = pose["escala"]
+    if "luz" in pose:
+        luz_x, luz_y, luz_z = pose["luz"]
+    if "camera" in pose:
+        # null volta à câmera fixa
+        modo_camera = pose["camera"] is not None
+        if modo_camera:
+            camera_x, camera_y, camera_z, camera_yaw, camera_pitch = pose["camera"]
+    if "wireframe" in pose:
+        modo_wireframe = bool(pose["wireframe"])
+    if "ortografica" in pose:
+        projecao_ortografica = bool(pose["ortografica"])
+    if "lod" in pose:
+        usar_lod = bool(pose["lod"])
+    if "perfil" in pose:
+        perfil_extrusao = [tuple(ponto) for ponto in pose["perfil"]]
+        extrusao_ativa = len(perfil_extrusao) >= 3
+    if "furos" in pose:
+        furos_extrusao = [[tuple(ponto) for ponto in furo] for furo in pose["furos"]]
+    if "altura_extrusao" in pose:
+        altura_extrusao = pose["altura_extrusao"]
+    if "segmentos" in pose:
+        num_segmentos_extrusao = pose["segmentos"]
+    if "modelo" in pose and pose["modelo"] != modelo_externo["caminho"]:
+        definir_modelo_externo(pose["modelo"])
+
+
+def poses_roteiro(roteiro):
+    """
+    Expande um roteiro nas poses de cada quadro.
+
+    O roteiro (um dict, normalmente lido de JSON) tem:
+        pose: propriedades comuns a todos os quadros
+        chaves: lista de poses com "quadro"; entre duas chaves, as
+                propriedades contínuas (rotação, câmera, luz...) são
+                interpoladas linearmente; antes da primeira e depois da
+                última, valem as da chave mais próxima
+        quadros: número de quadros (padrão: último quadro das chaves + 1)
+        variar: {propriedade: [valores]}: cada quadro é renderizado uma
+                vez por combinação (ex.: {"iluminacao": [0, 1, 2]})
+
+    Exemplo (volta completa do teapot em Flat, Gouraud e Phong):
+        {"quadros": 36, "pose": {"objeto": 5},
+         "chaves": [{"quadro": 0, "rotacao": [20, 0]},
+                    {"quadro": 36, "rotacao": [20, 360]}],
+         "variar": {"iluminacao": [0, 1, 2]}}
+
+    Returns:
+        list: (quadro, variacao, pose) na ordem de saída; variacao é o dict
+              com os valores de "variar" daquele quadro
+    """
+    conhecidas = {"pose", "chaves", "quadros", "variar", "largura", "altura"}
+    desconhecidas = set(roteiro) - conhecidas
+    if desconhecidas:
+        raise ValueError(f"campos desconhecidos no roteiro: {', '.join(sorted(desconhecidas))}")
+    comum = dict(roteiro.get("pose", {}))
+    chaves = sorted(roteiro.get("chaves", []), key=lambda chave: chave["quadro"])
+    variar = roteiro.get("variar", {})
+    for pose in [comum, variar] + [{n: v for n, v in c.items() if n != "quadro"} for c in chaves]:
+        invalidas = set(pose) - set(PROPRIEDADES_POSE)
+        if invalidas:
+            raise ValueError(f"propriedades desconhecidas: {', '.join(sorted(invalidas))}")
+    quadros = roteiro.get("quadros", chaves[-1]["quadro"] + 1 if chaves else 1)
+
+    # Por propriedade: os quadros das chaves que a definem e seus valores
+    trilhas = {}
+    for chave in chaves:
+        for nome, valor in chave.items():
+            if nome != "quadro":
+                trilhas.setdefault(nome, ([], []))
+                trilhas[nome][0].append(chave["quadro"])
+                trilhas[nome][1].append(valor)
+
+    nomes_variar = list(variar)
+    combinacoes = [{}]
+    for nome in nomes_variar:
+        combinacoes = [dict(c, **{nome: valor}) for c in combinacoes for valor in variar[nome]]
+
+    poses = []
+    for quadro in range(quadros):
+        pose = dict(comum)
+        for nome, (momentos, valores) in trilhas.items():
+            if nome in PROPRIEDADES_CONTINUAS and valores[0] is not None:
+                valores = np.asarray(valores, dtype=np.float64).reshape(len(momentos), -1)
+                valor = [float(np.interp(quadro, momentos, coluna)) for coluna in valores.T]
+                pose[nome] = valor if np.ndim(trilhas[nome][1][0]) else valor[0]
+            else:
+                anteriores = [i for i, momento in enumerate(momentos) if momento <= quadro]
+                pose[nome] = valores[anteriores[-1] if anteriores else 0]
+        for variacao in combinacoes:
+            poses.append((quadro, variacao, dict(pose, **variacao)))
+    return poses
+
+
+def padrao_saida_lote(nomes_variar, extensao=".png"):
+    """Padrão de nome dos arquivos: quadro_0000.png, ou quadro_0000_iluminacao0.png ao variar."""
+    return "quadro_{quadro:04d}" + "".join(f"_{nome}{{{nome}}}" for nome in nomes_variar) + extensao
+
+
+def criar_contexto_offscreen(motor, largura, altura):
+    """
+    Contexto OpenGL sem janela, tornado atual no processo: EGL com uma
+    superfície pbuffer, ou OSMesa renderizando num buffer em memória.
+
+    Só funciona se o PyOpenGL foi importado com PYOPENGL_PLATFORM igual a
+    motor (ver main_lote, que o define antes de criar os processos).
+
+    Returns:
+        tuple: os objetos do contexto (mantidos vivos pelo chamador)
+    """
+    if motor == "egl":
+        from OpenGL import EGL
+
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        versao = (EGL.EGLint(), EGL.EGLint())
+        if not EGL.eglInitialize(display, ctypes.pointer(versao[0]), ctypes.pointer(versao[1])):
+            raise RuntimeError("EGL: eglInitialize falhou")
+        atributos = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                     EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+                     EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_STENCIL_SIZE, 8,
+                     EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE]
+        configuracao, encontradas = EGL.EGLConfig(), EGL.EGLint()
+        if not EGL.eglChooseConfig(display, (EGL.EGLint * len(atributos))(*atributos),
+                                   ctypes.pointer(configuracao), 1,
+                                   ctypes.pointer(encontradas)) or encontradas.value == 0:
+            raise RuntimeError("EGL: nenhuma configuração RGB com profundidade e estêncil")
+        superficie = EGL.eglCreatePbufferSurface(
+            display, configuracao,
+            (EGL.EGLint * 5)(EGL.EGL_WIDTH, largura, EGL.EGL_HEIGHT, altura, EGL.EGL_NONE))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        contexto = EGL.eglCreateContext(display, configuracao, EGL.EGL_NO_CONTEXT, None)
+        if not EGL.eglMakeCurrent(display, superficie, superficie, contexto):
+            raise RuntimeError("EGL: eglMakeCurrent falhou")
+        return display, superficie, contexto
+
+    from OpenGL import arrays, osmesa
+
+    contexto = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 8, 0, None)
+    if not contexto:
+        raise RuntimeError("OSMesa: OSMesaCreateContextExt falhou")
+    buffer = arrays.GLubyteArray.zeros((altura, largura, 4))
+    if not osmesa.OSMesaMakeCurrent(contexto, buffer, GL_UNSIGNED_BYTE, largura, altura):
+        raise RuntimeError("OSMesa: OSMesaMakeCurrent falhou")
+    return contexto, buffer
+
+
+def ler_quadro_gl(largura, altura):
+    """Desenha o quadro do estado atual no contexto corrente e retorna a imagem (altura, largura, 3)."""
+    reshape(largura, altura)  # a projeção depende de projecao_ortografica
+    desenhar_quadro()
+    glPixelStorei(GL_PACK_ALIGNMENT, 1)
+    dados = glReadPixels(0, 0, largura, altura, GL_RGB, GL_UNSIGNED_BYTE)
+    return np.frombuffer(dados, dtype=np.uint8).reshape(altura, largura, 3)[::-1]
+
+
+# Estado de cada processo do lote: cada um tem seu motor, seu renderizador
+# (ou contexto OpenGL) e os caches de malhas do próprio módulo
+_trabalhador_lote = {"motor": None, "largura": 0, "altura": 0, "renderizador": None,
+                     "contexto": None}
+
+
+def _iniciar_trabalhador_lote(motor, largura, altura):
+    # A saída padrão pode ser o vídeo: mensagens vão para stderr
+    sys.stdout = sys.stderr
+    _trabalhador_lote.update(motor=motor, largura=largura, altura=altura)
+    if motor == "cpu":
+        _trabalhador_lote["renderizador"] = RenderizadorSoftware(largura, altura)
+    else:
+        _trabalhador_lote["contexto"] = criar_contexto_offscreen(motor, largura, altura)
+        init()
+
+
+def _testar_motor_lote(motor, largura, altura, conexao):
+    """Processo de teste: inicia um trabalhador do lote e envia None ou a mensagem de erro."""
+    try:
+        _iniciar_trabalhador_lote(motor, largura, altura)
+    except Exception as erro:
+        conexao.send(f"{type(erro).__name__}: {erro}")
+    else:
+        conexao.send(None)
+    conexao.close()
+
+
+def testar_motor_lote(contexto_mp, motor, largura, altura):
+    """
+    Inicia o motor do lote num processo de teste, antes de criar o pool.
+
+    Se o inicializador dos processos do pool falha (biblioteca OSMesa
+    ausente, nenhum dispositivo EGL), o multiprocessing.Pool recria os
+    processos sem fim e o lote fica parado; o teste detecta isso antes.
+
+    Returns:
+        str | None: a mensagem de erro, ou None se o motor funciona
+    """
+    receber, enviar = contexto_mp.Pipe(duplex=False)
+    processo = contexto_mp.Process(target=_testar_motor_lote, args=(motor, largura, altura, enviar))
+    processo.start()
+    enviar.close()
+    try:
+        erro = receber.recv()
+    except EOFError:
+        erro = None
+    processo.join()
+    if erro is None and processo.exitcode != 0:
+        erro = f"o processo de teste terminou com código {processo.exitcode} (erro acima)"
+    return erro
+
+
+def _renderizar_quadro_lote(tarefa):
+    """Renderiza uma pose; grava o arquivo (caminho) ou retorna os bytes RGB do quadro."""
+    indice, pose, caminho = tarefa
+    aplicar_pose(pose)
+    if _trabalhador_lote["motor"] == "cpu":
+        imagem = renderizar_cena_software(renderizador=_trabalhador_lote["renderizador"])
+    else:
+        imagem = ler_quadro_gl(_trabalhador_lote["largura"], _trabalhador_lote["altura"])
+    if caminho is not None:
+        salvar_imagem(caminho, imagem)
+        return indice, None
+    return indice, np.ascontiguousarray(imagem).tobytes()
+
+
+def main_lote(argv=None):
+    """
+    Renderiza um roteiro de quadros (volta do objeto, caminho de câmera,
+    comparação de modelos de iluminação) sem janela, com os quadros
+    distribuídos num pool de processos.
+
+    Cada processo tem seu próprio renderizador: o RenderizadorSoftware
+    (--motor cpu) ou um contexto OpenGL offscreen (--motor egl/osmesa,
+    com a mesma pipeline de display()), e mantém as malhas em cache entre
+    os quadros que recebe.
+
+    Exemplos:
+        python "Mod python Nick 1.py" --lote volta.json -o quadros/{quadro:04d}_{iluminacao}.png
+        python "Mod python Nick 1.py" --lote volta.json --motor egl --video - | \\
+            ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 30 -i - volta.mp4
+    """
+    parser = argparse.ArgumentParser(
+        prog='"Mod python Nick 1.py" --lote',
+        description="Renderiza um roteiro de quadros sem janela, em paralelo")
+    parser.add_argument("roteiro", help="arquivo JSON com o roteiro (ver poses_roteiro)")
+    parser.add_argument("-o", "--saida",
+                        help="padrão dos arquivos .png/.ppm, com {quadro} e as propriedades "
+                             "de \"variar\" (padrão: quadro_{quadro:04d}....png)")
+    parser.add_argument("--video", metavar="ARQUIVO",
+                        help="grava os quadros em sequência como vídeo bruto RGB24 "
+                             "(\"-\" = saída padrão, para o ffmpeg)")
+    parser.add_argument("--motor", choices=MOTORES_LOTE, default="cpu",
+                        help="cpu (sem OpenGL) ou OpenGL offscreen por EGL ou OSMesa")
+    parser.add_argument("--processos", type=int, default=0,
+                        help="processos do pool (0 = um por núcleo)")
+    parser.add_argument("--largura", type=int, help="padrão: a do roteiro, ou 800")
+    parser.add_argument("--altura", type=int, help="padrão: a do roteiro, ou 600")
+    args = parser.parse_args(argv)
+
+    saida_video = None
+    if args.video == "-":
+        saida_video = sys.stdout.buffer
+        sys.stdout = sys.stderr
+    if args.video and args.saida:
+        parser.error("use -o (arquivos) ou --video, não os dois")
+
+    with open(args.roteiro, encoding="utf-8") as arquivo:
+        roteiro = json.load(arquivo)
+    try:
+        poses = poses_roteiro(roteiro)
+    except (ValueError, KeyError) as erro:
+        parser.error(f"{args.roteiro}: {erro}")
+    largura = args.largura or roteiro.get("largura", 800)
+    altura = args.altura or roteiro.get("altura", 600)
+
+    if args.motor == "cpu":
+        # fork: os processos herdam o módulo e as malhas já geradas
+        metodos = multiprocessing.get_all_start_methods()
+        contexto_mp = multiprocessing.get_context("fork" if "fork" in metodos else None)
+    else:
+        # O PyOpenGL escolhe a plataforma (EGL/OSMesa) ao ser importado:
+        # os processos começam do zero com a variável já definida
+        os.environ["PYOPENGL_PLATFORM"] = args.motor
+        if args.motor == "egl":
+            os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+        contexto_mp = multiprocessing.get_context("spawn")
+        erro = testar_motor_lote(contexto_mp, args.motor, largura, altura)
+        if erro is not None:
+            print(f"--motor {args.motor} indisponível: {erro}", file=sys.stderr)
+            print("Verifique se a biblioteca (libEGL com um dispositivo, ou libOSMesa) está "
+                  "instalada, ou use --motor cpu", file=sys.stderr)
+            return 1
+
+    caminhos = [None] * len(poses)
+    if not args.video:
+        padrao = args.saida or padrao_saida_lote(list(roteiro.get("variar", {})))
+        try:
+            caminhos = [padrao.format(quadro=quadro, **variacao) for quadro, variacao, _ in poses]
+        except (KeyError, IndexError, ValueError) as erro:
+            parser.error(f"padrão de saída inválido ({padrao}): {erro}")
+        if len(set(caminhos)) != len(caminhos):
+            parser.error(f"o padrão {padrao} repete nomes: inclua {{quadro}} e as propriedades variadas")
+        for pasta in {os.path.dirname(caminho) for caminho in caminhos} - {""}:
+            os.makedirs(pasta, exist_ok=True)
+    elif args.video != "-":
+        saida_video = open(args.video, "wb")
+
+    tarefas = [(indice, pose, caminho)
+               for indice, ((_, _, pose), caminho) in enumerate(zip(poses, caminhos))]
+    processos = min(args.processos or os.cpu_count() or 1, len(tarefas))
+
+    inicio = time.perf_counter()
+    if args.motor == "cpu" and processos <= 1:
+        _iniciar_trabalhador_lote(args.motor, largura, altura)
+        resultados = map(_renderizar_quadro_lote, tarefas)
+        pool = None
+    else:
+        pool = contexto_mp.Pool(processos, initializer=_iniciar_trabalhador_lote,
+                                initargs=(args.motor, largura, altura))
+        # O vídeo precisa dos quadros em ordem; arquivos saem como ficarem prontos
+        distribuir = pool.imap if args.video else pool.imap_unordered
+        resultados = distribuir(_renderizar_quadro_lote, tarefas)
+
+    try:
+        for feitos, (_, dados) in enumerate(resultados, start=1):
+            if dados is not None:
+                saida_video.write(dados)
+            if feitos % 10 == 0 or feitos == len(tarefas):
+                print(f"\r{feitos}/{len(tarefas)} quadros", end="", file=sys.stderr, flush=True)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if saida_video is not None and args.video != "-":
+            saida_video.close()
+    duracao = time.perf_counter() - inicio
+
+    print(file=sys.stderr)
+    print(f"{len(tarefas)} quadros {largura}x{altura} ({args.motor}, {max(processos, 1)} processos) "
+          f"em {duracao:.1f} s: {len(tarefas) / duracao:.1f} quadros/s", file=sys.stderr)
+    if args.video:
+        print(f"Vídeo bruto: ffmpeg -f rawvideo -pix_fmt rgb24 -s {largura}x{altura} -i "
+              f"{args.video} saida.mp4", file=sys.stderr)
+    return 0
 
 
 # ==========================================
 # MAIN
 # ==========================================
 def main():
-    glutInit(sys.argv)
-    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
+    global fps_maximo, usar_lod, limiares_lod
+
+    parser = argparse.ArgumentParser(description="Trabalho CG 3D (janela GLUT)")
+    parser.add_argument("--fps", type=int, default=fps_maximo,
+                        help="limite de quadros por segundo (0 = sem limite)")
+    parser.add_argument("--perfil-csv", metavar="ARQUIVO",
+                        help="grava o tempo de cada etapa de cada quadro em CSV")
+    parser.add_argument("--processos", type=int, default=0,
+                        help="processos do scanline em ladrilhos [B] (0 = um por núcleo)")
+    parser.add_argument("--modelo", metavar="ARQUIVO",
+                        help="malha .obj, .ply ou .stl (binários) selecionada com [7]")
+    parser.add_argument("--lod-limiares", type=float, nargs="+", metavar="PIXELS",
+                        default=limiares_lod,
+                        help="diâmetro mínimo na tela (pixels) de cada nível de detalhe, "
+                             "do mais fino ao mais grosso")
+    parser.add_argument("--sem-lod", action="store_true",
+                        help="desenha sempre a tesselação mais fina")
+    parser.add_argument("--sem-cache-hud", action="store_true",
+                        help="desenha o texto do HUD caractere a caractere em todo quadro")
+    args, resto = parser.parse_known_args(sys.argv[1:])
+    fps_maximo = args.fps
+    usar_lod = not args.sem_lod
+    cache_hud.ativo = not args.sem_cache_hud
+    limiares_lod = sorted(args.lod_limiares, reverse=True)
+    if args.modelo:
+        definir_modelo_externo(args.modelo)
+    rasterizador_ladrilhos.definir_processos(args.processos)
+    if args.perfil_csv:
+        perfilador.gravar_csv(args.perfil_csv)
+
+    glutInit([sys.argv[0]] + resto)
+    # Estêncil: composição do framebuffer dos ladrilhos com a cena (blit)
+    glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH | GLUT_STENCIL)
     glutInitWindowSize(800, 600)
     glutCreateWindow(b"Trabalho CG 3D - Phong Scanline no Cubo")
     init()
     glutDisplayFunc(display)
     glutReshapeFunc(reshape)
     glutKeyboardFunc(keyboard)
+    glutKeyboardUpFunc(keyboard_up)
     glutSpecialFunc(special_keys)
+    glutSpecialUpFunc(special_keys_up)
+    glutIgnoreKeyRepeat(1)  # Teclas seguradas: estado em teclas_pressionadas
     glutPassiveMotionFunc(mouse_motion)
-    glutMouseFunc(mouse_click_extrusao)
+    glutMouseFunc(mouse_click)
+    glutTimerFunc(0, quadro_temporizado, 0)
     
     print("--- CONTROLES ---")
     print("[0] Alternar entre Modo Câmera e Modo Objeto")
-    print("[1-5] Selecionar Objeto Padrão | [6] Modo Extrusão")
+    print("[1-5] Selecionar Objeto Padrão | [6] Modo Extrusão | [7] Modelo (--modelo ARQUIVO)")
+    print("[8] Cena com milhares de objetos (grafo de cena, culling e instâncias)")
     print("[WASD] Girar Objeto (Modo Objeto) | Mover Câmera (Modo Câmera)")
     print("[Mouse] Olhar ao redor (Modo Câmera) | Clique para adicionar pontos (Modo Extrusão)")
+    print("[Clique] Escolher ponto do objeto (picking: triângulo, posição e normal)")
     print("[Setas] Mover Objeto")
     print("[IJKL] Mover Luz     | [UO] Luz Z (Fundo/Frente)")
-    print("[M] Modo Iluminação (Flat/Gouraud/Phong)")
+    print("[M] Modo Iluminação (Flat/Gouraud/Phong/Phong GLSL)")
     print("[P] Projeção         | [F] Wireframe/Solid")
     print("[T] Mostrar/Ocultar comandos na tela")
+    print("[R] Mostrar/Ocultar tempos por etapa (p50/p95/p99)")
+    print("[V] Alternar geometria em VBO / modo imediato")
+    print(f"[B] Scanline Phong em ladrilhos ({rasterizador_ladrilhos.processos} processos, --processos N)")
+    print("[G] Sombreamento diferido do scanline Phong (G-buffer)")
+    print("[Q] Níveis de detalhe pelo tamanho na tela "
+          f"(limiares {', '.join(f'{l:g}' for l in limiares_lod)} pixels, --lod-limiares)")
+    print(f"Limite de quadros: {fps_maximo if fps_maximo > 0 else 'sem limite'} FPS (--fps N)")
     print("--- MODO EXTRUSÃO ---")
     print("[Clique Esquerdo] Adicionar ponto ao perfil")
     print("[E] Ativar/Desativar extrusão 3D (ver perfil 2D ou objeto 3D)")
     print("[C] Limpar perfil | [H] Aumentar altura | [N] Diminuir altura")
+    print(f"[Z] Exportar extrusão em STL binário ({ARQUIVO_STL_EXTRUSAO})")
     
     glutMainLoop()
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--headless":
+        sys.exit(main_headless(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--lote":
+        sys.exit(main_lote(sys.argv[2:]))
     main()
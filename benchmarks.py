@@ -0,0 +1,1031 @@
+"""
+Benchmarks do projeto CG 3D.
+
+Mede os caminhos críticos do programa sem abrir janela: os módulos
+OpenGL.GL/GLU/GLUT são trocados por substitutos que só contam as chamadas
+(ver instalar_opengl_substituto), então o suíte roda em CI sem display e
+mede o custo de CPU do lado Python. Uso:
+
+    python benchmarks.py                       # todos os grupos
+    python benchmarks.py --grupos triangulacao --pontos 1000 10000 100000
+    python benchmarks.py --json resultados.json
+    python benchmarks.py --baseline resultados.json --tolerancia 0.5
+
+Com --baseline, cada medida é comparada à do arquivo; o código de saída é
+1 se algum tempo piorou mais que a tolerância ou se algum caso passou a
+fazer mais chamadas OpenGL (contagem exata, sem ruído).
+
+O grupo "conferencia" não mede tempo: confere resultados (instâncias,
+precisão, equivalência entre caminhos) e o código de saída é 1 se alguma
+conferência falhar.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import types
+from collections import Counter
+
+import numpy as np
+
+CAMINHO_PROGRAMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Mod python Nick 1.py")
+
+GRUPOS = ("triangulacao", "phong", "scanline", "normal", "extrusao", "display", "ladrilhos",
+          "arquivos", "picking", "lod", "conferencia")
+
+
+# ==========================================
+# OPENGL SUBSTITUTO (SEM JANELA)
+# ==========================================
+class GravadorGL:
+    """Conta as chamadas feitas às funções dos módulos OpenGL substitutos."""
+
+    def __init__(self):
+        self.chamadas = Counter()
+
+    def zerar(self):
+        self.chamadas.clear()
+
+    def total(self):
+        return sum(self.chamadas.values())
+
+
+gravador_gl = GravadorGL()
+
+# Funções cujo valor de retorno o programa usa
+TAMANHO_JANELA = (800, 600)
+RETORNOS_GL = {
+    "glGenBuffers": lambda n: np.arange(1, n + 1, dtype=np.uint32),
+    "glGenVertexArrays": lambda n: np.arange(1, n + 1, dtype=np.uint32),
+    "glGenQueries": lambda n: np.arange(1, n + 1, dtype=np.uint32),
+    "glGenLists": lambda n: 1,
+    "glGetIntegerv": lambda nome: 0,
+    "glGetQueryObjectiv": lambda consulta, nome: 1,
+    "glGetQueryObjectuiv": lambda consulta, nome: 0,
+    "glCreateShader": lambda tipo: 1,
+    "glCreateProgram": lambda: 1,
+    "glGetShaderiv": lambda shader, nome: 1,
+    "glGetProgramiv": lambda programa, nome: 1,
+    "glGetUniformLocation": lambda programa, nome: 0,
+    "glutGet": lambda nome: {"GLUT_WINDOW_WIDTH": TAMANHO_JANELA[0],
+                             "GLUT_WINDOW_HEIGHT": TAMANHO_JANELA[1]}.get(nome, 0),
+}
+
+
+def _funcao_substituta(nome):
+    retorno = RETORNOS_GL.get(nome)
+
+    def funcao(*args, **kwargs):
+        gravador_gl.chamadas[nome] += 1
+        if retorno is not None:
+            return retorno(*args)
+        return None
+
+    funcao.__name__ = nome
+    return funcao
+
+
+def instalar_opengl_substituto(caminho=CAMINHO_PROGRAMA):
+    """
+    Coloca módulos OpenGL.GL/GLU/GLUT falsos em sys.modules.
+
+    Os nomes vêm do próprio código do programa (tudo que casa com
+    gl*/glu*/glut* ou GL_*/GLU_*/GLUT_*): funções viram contadores no
+    gravador_gl e constantes viram inteiros distintos. As constantes do
+    GLUT valem o próprio nome, para que glutGet possa responder.
+
+    Returns:
+        dict: entradas de sys.modules substituídas (para restaurar depois)
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        nomes = set(re.findall(r"\b(?:glut|glu|gl)[A-Z]\w*|\b(?:GLUT|GLU|GL)_\w+", arquivo.read()))
+
+    modulos = {nome: types.ModuleType(nome) for nome in ("OpenGL", "OpenGL.GL", "OpenGL.GLU", "OpenGL.GLUT")}
+    for valor, nome in enumerate(sorted(nomes), start=0x10000):
+        prefixo = re.match(r"(?:glut|glu|gl)(?=[A-Z])|GLUT_|GLU_|GL_", nome).group(0)
+        modulo = modulos["OpenGL." + prefixo.rstrip("_").upper()]
+        if prefixo.endswith("_"):
+            setattr(modulo, nome, nome if prefixo == "GLUT_" else valor)
+        else:
+            setattr(modulo, nome, _funcao_substituta(nome))
+    for sufixo in ("GL", "GLU", "GLUT"):
+        modulo = modulos["OpenGL." + sufixo]
+        modulo.__all__ = [nome for nome in vars(modulo) if not nome.startswith("__")]
+        setattr(modulos["OpenGL"], sufixo, modulo)
+
+    anteriores = {nome: sys.modules.get(nome) for nome in modulos}
+    sys.modules.update(modulos)
+    return anteriores
+
+
+def carregar_programa():
+    """
+    Importa "Mod python Nick 1.py" como módulo (sem executar o main), com
+    o OpenGL substituto, e prepara um viewport de TAMANHO_JANELA.
+    """
+    anteriores = instalar_opengl_substituto()
+    try:
+        spec = importlib.util.spec_from_file_location("cg3d", CAMINHO_PROGRAMA)
+        modulo = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = modulo  # os processos do pool acham as funções por nome
+        spec.loader.exec_module(modulo)
+    finally:
+        for nome, anterior in anteriores.items():
+            if anterior is None:
+                sys.modules.pop(nome, None)
+            else:
+                sys.modules[nome] = anterior
+    modulo.init()
+    modulo.reshape(*TAMANHO_JANELA)
+    return modulo
+
+
+def cronometrar(funcao, repeticoes, duracao_minima=0.02):
+    """
+    Menor tempo (em segundos) por chamada de funcao() entre várias medidas.
+
+    Funções rápidas são chamadas várias vezes seguidas em cada medida,
+    até ela durar pelo menos duracao_minima, para que o ruído do relógio
+    e do sistema não domine. Como no timeit, o coletor de lixo fica
+    desligado durante as medidas.
+    """
+    gc_ligado = gc.isenabled()
+    gc.disable()
+    try:
+        vezes = 1
+        while True:
+            inicio = time.perf_counter()
+            for _ in range(vezes):
+                funcao()
+            duracao = time.perf_counter() - inicio
+            if duracao >= duracao_minima:
+                break
+            vezes *= 2
+        melhor = duracao / vezes
+        for _ in range(repeticoes - 1):
+            inicio = time.perf_counter()
+            for _ in range(vezes):
+                funcao()
+            melhor = min(melhor, (time.perf_counter() - inicio) / vezes)
+    finally:
+        if gc_ligado:
+            gc.enable()
+    return melhor
+
+
+def resultado(grupo, caso, segundos, **extras):
+    """Uma medida, no formato gravado em JSON."""
+    return {"grupo": grupo, "caso": caso, "ms": segundos * 1000.0, **extras}
+
+
+# ==========================================
+# PERFIS DE TESTE (CONTORNOS DIGITALIZADOS)
+# ==========================================
+def perfil_ruidoso(num_pontos, semente=0):
+    """Contorno estrelado com raio ruidoso, como um contorno digitalizado."""
+    aleatorio = random.Random(semente)
+    perfil = []
+    for k in range(num_pontos):
+        angulo = 2.0 * math.pi * k / num_pontos
+        raio = 2.0 + 0.4 * math.sin(7 * angulo) + 0.1 * aleatorio.random()
+        perfil.append((raio * math.cos(angulo), raio * math.sin(angulo)))
+    return perfil
+
+
+def perfil_pente(num_pontos):
+    """Contorno muito côncavo: um pente com num_pontos / 4 dentes."""
+    dentes = max(1, num_pontos // 4)
+    perfil = [(0.0, 0.0), (float(dentes), 0.0)]
+    for k in range(dentes - 1, -1, -1):
+        perfil += [(k + 1.0, 3.0), (k + 0.6, 3.0), (k + 0.6, 1.0), (k + 0.4, 1.0)]
+    perfil[-1] = (0.0, 3.0)
+    return perfil
+
+
+# ==========================================
+# BENCHMARKS
+# ==========================================
+def benchmark_triangulacao(programa, tamanhos, repeticoes):
+    """Tempo de triangular_poligono por tamanho e forma do perfil."""
+    resultados = []
+    print(f"{'perfil':<10}{'pontos':>10}{'triângulos':>12}{'ms':>10}{'área ok':>10}")
+    for num_pontos in tamanhos:
+        for nome, perfil in (("ruidoso", perfil_ruidoso(num_pontos)),
+                             ("pente", perfil_pente(num_pontos))):
+            tempo = cronometrar(lambda: programa.triangular_poligono(perfil), repeticoes)
+            pontos, indices = programa.triangular_poligono(perfil)
+
+            # A soma das áreas dos triângulos deve ser a área do perfil
+            a, b, c = pontos[indices[:, 0]], pontos[indices[:, 1]], pontos[indices[:, 2]]
+            area = 0.5 * np.sum((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+                                - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+            correta = math.isclose(area, programa.area_sinalizada(perfil), rel_tol=1e-9)
+            print(f"{nome:<10}{len(perfil):>10}{len(indices):>12}{tempo * 1000:>10.1f}"
+                  f"{'sim' if correta else 'NÃO':>10}")
+            resultados.append(resultado("triangulacao", f"{nome}/{len(perfil)}", tempo,
+                                        triangulos=len(indices), area_ok=correta))
+    return resultados
+
+
+def benchmark_phong(programa, repeticoes, chamadas=1000):
+    """Custo de uma chamada de phong_shading_point (um ponto por vez)."""
+    aleatorio = np.random.default_rng(0)
+    posicoes = aleatorio.uniform(-1, 1, (chamadas, 3)).tolist()
+    normais = aleatorio.normal(size=(chamadas, 3)).tolist()
+
+    def sombrear():
+        for P, N in zip(posicoes, normais):
+            programa.phong_shading_point(P, N, (0.0, 0.5, 1.0))
+
+    tempo = cronometrar(sombrear, repeticoes) / chamadas
+    print(f"phong_shading_point: {tempo * 1e6:.1f} µs/ponto")
+    return [resultado("phong", "phong_shading_point", tempo)]
+
+
+def benchmark_scanline(programa, repeticoes, lados=(8, 32, 128, 512)):
+    """
+    scanline_phong_triangle para triângulos retângulos com catetos de
+    `lado` pixels na tela (cerca de lado²/2 pixels cada).
+    """
+    programa.pilha_modelview.carregar_identidade()
+    origem, unidade = programa.projetar_pontos([(0.0, 0.0, -5.0), (1.0, 0.0, -5.0)])
+    pixels_por_unidade = unidade[0] - origem[0]
+    normal = [0.0, 0.0, 1.0]
+
+    resultados = []
+    print(f"{'lado px':>8}{'pixels':>10}{'ms':>10}{'ns/pixel':>10}")
+    for lado in lados:
+        s = lado / pixels_por_unidade
+        p1, p2, p3 = [0.0, 0.0, -5.0], [s, 0.0, -5.0], [0.0, s, -5.0]
+
+        def rasterizar():
+            programa.buffer_software.limpar()
+            programa.scanline_phong_triangle(p1, normal, p2, normal, p3, normal, (0.0, 0.5, 1.0))
+
+        tempo = cronometrar(rasterizar, repeticoes)
+        pixels = programa.buffer_software.total
+        programa.buffer_software.limpar()
+        print(f"{lado:>8}{pixels:>10}{tempo * 1000:>10.3f}{tempo * 1e9 / max(pixels, 1):>10.1f}")
+        resultados.append(resultado("scanline", f"lado/{lado}", tempo, pixels=pixels))
+    return resultados
+
+
+def benchmark_normal_face(programa, repeticoes, chamadas=10000):
+    """Custo de uma chamada de calcular_normal_face."""
+    triangulos = np.random.default_rng(0).uniform(-1, 1, (chamadas, 3, 3)).tolist()
+
+    def calcular():
+        for p1, p2, p3 in triangulos:
+            programa.calcular_normal_face(p1, p2, p3)
+
+    tempo = cronometrar(calcular, repeticoes) / chamadas
+    print(f"calcular_normal_face: {tempo * 1e6:.2f} µs/face")
+    return [resultado("normal", "calcular_normal_face", tempo)]
+
+
+def benchmark_extrusao(programa, repeticoes, tamanhos=(10, 100, 1000, 10000),
+                       segmentos=(1, 10, 100, 500)):
+    """
+    desenhar_extrusao por tamanho do perfil e número de segmentos.
+
+    - frio: caches de malha e triangulação vazios (gera a malha e a envia)
+    - quente: malha já em cache (só o desenho)
+    """
+    programa.modo_extrusao = True
+    programa.extrusao_ativa = True
+    programa.modo_wireframe = False
+    programa.furos_extrusao = []
+
+    def desenhar_frio():
+        programa._cache_extrusao["chave"] = None
+        programa._cache_triangulacao.clear()
+        programa.desenhar_extrusao()
+
+    resultados = []
+    print(f"{'pontos':>8}{'segmentos':>11}{'frio ms':>10}{'quente ms':>11}{'chamadas GL':>13}")
+    for num_pontos in tamanhos:
+        programa.perfil_extrusao = perfil_ruidoso(num_pontos)
+        for num_segmentos in segmentos:
+            programa.num_segmentos_extrusao = num_segmentos
+            frio = cronometrar(desenhar_frio, repeticoes)
+            quente = cronometrar(programa.desenhar_extrusao, repeticoes)
+            gravador_gl.zerar()
+            programa.desenhar_extrusao()
+            chamadas = gravador_gl.total()
+            print(f"{num_pontos:>8}{num_segmentos:>11}{frio * 1000:>10.2f}{quente * 1000:>11.3f}"
+                  f"{chamadas:>13}")
+            caso = f"{num_pontos}x{num_segmentos}"
+            resultados.append(resultado("extrusao", caso + "/frio", frio))
+            resultados.append(resultado("extrusao", caso + "/quente", quente, chamadas_gl=chamadas))
+
+    programa.modo_extrusao = False
+    programa.extrusao_ativa = False
+    return resultados
+
+
+def benchmark_display(programa, repeticoes):
+    """
+    Um quadro completo de display() por objeto e modelo de iluminação
+    (a cena do objeto 8 sai com instâncias nos modos Phong).
+
+    O cache do quadro por software fica desligado (cada quadro rasteriza
+    de novo); o cubo Phong também é medido com ele ligado, com a cena
+    parada (phong_em_cache) e com a luz mudando a cada quadro, o que no
+    sombreamento diferido só refaz a iluminação do G-buffer
+    (phong_luz_movendo).
+    """
+    objetos = {1: "esfera", 2: "cubo", 3: "cone", 4: "torus", 5: "teapot", 6: "extrusao", 8: "cena"}
+    modelos = ("flat", "gouraud", "phong", "phong_glsl")
+    programa.perfil_extrusao = perfil_ruidoso(100)
+    programa.num_segmentos_extrusao = 20
+
+    casos = [(modelo, nome_modelo, False) for modelo, nome_modelo in enumerate(modelos)]
+    casos_cubo = [(2, "phong_em_cache", True), (2, "phong_luz_movendo", True)]
+    cache = programa.cache_quadro_software
+
+    def quadro_movendo_luz():
+        programa.luz_x = -programa.luz_x
+        programa.display()
+
+    resultados = []
+    print(f"{'objeto':<10}{'iluminação':<18}{'ms':>10}{'chamadas GL':>13}")
+    for objeto, nome_objeto in objetos.items():
+        programa.modo_extrusao = programa.extrusao_ativa = objeto == 6
+        if objeto != 6:
+            programa.objeto_selecionado = objeto
+        for modelo, nome_modelo, em_cache in casos + (casos_cubo if objeto == 2 else []):
+            programa.modelo_iluminacao = modelo
+            cache.ativo = em_cache
+            quadro = quadro_movendo_luz if nome_modelo == "phong_luz_movendo" else programa.display
+            quadro()  # aquece os caches
+            tempo = cronometrar(quadro, repeticoes)
+            gravador_gl.zerar()
+            quadro()
+            chamadas = gravador_gl.total()
+            print(f"{nome_objeto:<10}{nome_modelo:<18}{tempo * 1000:>10.2f}{chamadas:>13}")
+            resultados.append(resultado("display", f"{nome_objeto}/{nome_modelo}", tempo,
+                                        chamadas_gl=chamadas))
+
+    cache.ativo = True
+    programa.modo_extrusao = programa.extrusao_ativa = False
+    return resultados
+
+
+def benchmark_ladrilhos(programa, repeticoes, processos=None, tamanho=(1920, 1080)):
+    """
+    Quadro do cubo em Phong por software em ladrilhos numa tela grande,
+    por número de processos; confere que o framebuffer é idêntico ao de
+    um processo.
+    """
+    if processos is None:
+        nucleos = os.cpu_count() or 1
+        # Sempre ao menos 2 processos, mesmo com 1 núcleo: o pool e o
+        # framebuffer compartilhado também são exercitados
+        processos = sorted({1, 2, nucleos} | ({4} if nucleos >= 4 else set()))
+    programa.reshape(*tamanho)
+    programa.objeto_selecionado = 2
+    programa.modelo_iluminacao = 2
+    programa.scale, programa.rot_x, programa.rot_y = 2.0, 25.0, 35.0
+    programa.rasterizacao_ladrilhos = True
+    programa.cache_quadro_software.ativo = False
+    rasterizador = programa.rasterizador_ladrilhos
+
+    resultados = []
+    referencia = None
+    print(f"{'processos':>10}{'ms':>10}{'pixels':>10}{'idêntico':>10}")
+    for num_processos in processos:
+        rasterizador.definir_processos(num_processos)
+        programa.display()  # cria o pool
+        tempo = cronometrar(programa.display, repeticoes)
+        quadro = (rasterizador.cor.tobytes(), rasterizador.profundidade.tobytes())
+        referencia = referencia or quadro
+        identico = quadro == referencia
+        pixels = programa.estatisticas_software["pixels"]
+        print(f"{num_processos:>10}{tempo * 1000:>10.1f}{pixels:>10}{'sim' if identico else 'NÃO':>10}")
+        resultados.append(resultado("ladrilhos", f"processos/{num_processos}", tempo,
+                                    pixels=pixels, identico=identico))
+
+    rasterizador.fechar()
+    programa.rasterizacao_ladrilhos = False
+    programa.cache_quadro_software.ativo = True
+    programa.scale, programa.rot_x, programa.rot_y = 1.0, 0.0, 0.0
+    programa.reshape(*TAMANHO_JANELA)
+    return resultados
+
+
+def gravar_ply_binario(caminho, malha):
+    """Grava a malha como PLY binário (vértices float, faces uchar/int)."""
+    faces = np.zeros(malha.num_triangulos, dtype=[("n", "u1"), ("i", "<i4", (3,))])
+    faces["n"] = 3
+    faces["i"] = malha.indices.reshape(-1, 3)
+    cabecalho = ("ply\nformat binary_little_endian 1.0\n"
+                 f"element vertex {len(malha.vertices)}\n"
+                 "property float x\nproperty float y\nproperty float z\n"
+                 f"element face {malha.num_triangulos}\n"
+                 "property list uchar int vertex_indices\nend_header\n")
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(cabecalho.encode("ascii"))
+        arquivo.write(malha.vertices.astype("<f4").tobytes())
+        arquivo.write(faces.tobytes())
+
+
+def gravar_obj(caminho, malha):
+    """Grava a malha como OBJ texto (só 'v' e 'f')."""
+    with open(caminho, "w", encoding="ascii") as arquivo:
+        np.savetxt(arquivo, malha.vertices, fmt="v %.6f %.6f %.6f")
+        np.savetxt(arquivo, malha.indices.reshape(-1, 3) + 1, fmt="f %d %d %d")
+
+
+def benchmark_arquivos(programa, repeticoes, pontos=10000, segmentos=50):
+    """
+    Exportação STL de uma extrusão grande e carga da mesma malha em STL,
+    PLY binário e OBJ texto; confere que a carga devolve os triângulos.
+    """
+    malha = programa.gerar_malha_extrusao_indexada(perfil_ruidoso(pontos), 2.0, segmentos, (), 30.0)
+    resultados = []
+    print(f"{'caso':<14}{'triângulos':>12}{'MB':>8}{'ms':>10}{'ok':>6}")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = {formato: os.path.join(pasta, "malha." + formato) for formato in ("stl", "ply", "obj")}
+        exportar = lambda: programa.exportar_stl(caminhos["stl"], malha)
+        casos = [("exportar_stl", exportar, caminhos["stl"])]
+        gravar_ply_binario(caminhos["ply"], malha)
+        gravar_obj(caminhos["obj"], malha)
+        for formato, caminho in caminhos.items():
+            casos.append(("carregar_" + formato,
+                          lambda caminho=caminho: programa.carregar_malha(caminho, normalizar=False),
+                          caminho))
+        for caso, funcao, caminho in casos:
+            tempo = cronometrar(funcao, repeticoes)
+            carregada = programa.carregar_malha(caminho, normalizar=False)
+            ok = (carregada.num_triangulos == malha.num_triangulos
+                  and np.allclose(carregada.triangulos()[0], malha.triangulos()[0], atol=1e-4))
+            megabytes = os.path.getsize(caminho) / 2**20
+            print(f"{caso:<14}{malha.num_triangulos:>12}{megabytes:>8.1f}{tempo * 1000:>10.1f}"
+                  f"{'sim' if ok else 'NÃO':>6}")
+            resultados.append(resultado("arquivos", caso, tempo,
+                                        triangulos=malha.num_triangulos, ok=ok))
+    return resultados
+
+
+def benchmark_picking(programa, repeticoes, resolucoes=(20, 100, 300, 700), raios=100):
+    """
+    Picking por raio em esferas cada vez mais tesseladas: construção da
+    BVH e consulta, contra o teste de força bruta em todos os triângulos
+    (que também confere o triângulo atingido).
+    """
+    aleatorio = np.random.default_rng(0)
+    origens = aleatorio.uniform(-4.0, 4.0, (raios, 3))
+    direcoes = aleatorio.uniform(-0.8, 0.8, (raios, 3)) - origens
+
+    resultados = []
+    print(f"{'triângulos':>11}{'construir ms':>14}{'BVH µs':>10}{'força bruta µs':>16}{'iguais':>8}")
+    for resolucao in resolucoes:
+        malha = programa.malha_procedural("esfera", 1.5, resolucao, resolucao)
+        triangulos = malha.vertices[malha.indices.astype(np.int64)].reshape(-1, 3, 3)
+        v0, e1, e2 = triangulos[:, 0], triangulos[:, 1] - triangulos[:, 0], triangulos[:, 2] - triangulos[:, 0]
+        construir = cronometrar(lambda: programa.BVH(malha), repeticoes)
+        bvh = programa.BVH(malha)
+
+        def consultar():
+            for origem, direcao in zip(origens, direcoes):
+                bvh.intersectar(origem, direcao)
+
+        def forca_bruta():
+            for origem, direcao in zip(origens, direcoes):
+                programa.intersectar_raio_triangulos(origem, direcao, v0, e1, e2)
+
+        consulta = cronometrar(consultar, repeticoes) / raios
+        bruta = cronometrar(forca_bruta, repeticoes) / raios
+        iguais = True
+        for origem, direcao in zip(origens, direcoes):
+            acerto = bvh.intersectar(origem, direcao)
+            t = programa.intersectar_raio_triangulos(origem, direcao, v0, e1, e2)[0]
+            esperado = None if not np.isfinite(t.min()) else t.min()
+            iguais &= (acerto is None) == (esperado is None) and (
+                acerto is None or math.isclose(acerto[1], esperado, rel_tol=1e-9))
+        print(f"{malha.num_triangulos:>11}{construir * 1000:>14.1f}{consulta * 1e6:>10.0f}"
+              f"{bruta * 1e6:>16.0f}{'sim' if iguais else 'NÃO':>8}")
+        caso = f"esfera/{malha.num_triangulos}"
+        resultados.append(resultado("picking", caso + "/construir", construir))
+        resultados.append(resultado("picking", caso + "/raio", consulta, iguais=iguais))
+        resultados.append(resultado("picking", caso + "/forca_bruta", bruta))
+    return resultados
+
+
+def benchmark_lod(programa, repeticoes, escalas=(1.0, 0.3, 0.1)):
+    """
+    Quadro do teapot em escalas cada vez menores e da cena do objeto 8
+    (uma chamada por objeto no Gouraud, instâncias no Phong GLSL), com e
+    sem níveis de detalhe, e os triângulos desenhados em cada caso.
+
+    Com o OpenGL substituto, o tempo é só o custo de CPU da escolha dos
+    níveis; o ganho na GPU aparece na coluna de triângulos.
+    """
+    casos = [(5, 1, f"teapot/escala_{escala:g}", escala) for escala in escalas]
+    casos += [(programa.OBJETO_CENA, 1, "cena/gouraud", 1.0),
+              (programa.OBJETO_CENA, 3, "cena/phong_glsl", 1.0)]
+
+    resultados = []
+    print(f"{'caso':<22}{'LOD':<6}{'ms':>10}{'triângulos':>12}")
+    for objeto, modelo, caso, escala in casos:
+        programa.objeto_selecionado = objeto
+        programa.modelo_iluminacao = modelo
+        programa.scale = escala
+        for usar_lod in (False, True):
+            programa.usar_lod = usar_lod
+            programa.display()  # aquece os caches
+            tempo = cronometrar(programa.display, repeticoes)
+            if objeto == programa.OBJETO_CENA:
+                triangulos = programa.estatisticas_cena["triangulos"]
+            else:
+                triangulos = programa.estatisticas_lod["triangulos"]
+            nome = "lod" if usar_lod else "sem_lod"
+            print(f"{caso:<22}{'ON' if usar_lod else 'OFF':<6}{tempo * 1000:>10.2f}{triangulos:>12}")
+            resultados.append(resultado("lod", f"{caso}/{nome}", tempo, triangulos=triangulos))
+
+    programa.scale = 1.0
+    programa.usar_lod = True
+    return resultados
+
+
+# ==========================================
+# CONFERÊNCIAS (RESULTADOS, NÃO TEMPOS)
+# ==========================================
+def conferencia(caso, ok, detalhe=""):
+    """Registra uma conferência; falhas fazem main() sair com 1."""
+    print(f"{'ok' if ok else 'FALHOU':<8}{caso}{f'  ({detalhe})' if detalhe else ''}")
+    return resultado("conferencia", caso, 0.0, ok=bool(ok))
+
+
+def conferir_instancias(programa, nos=5):
+    """N nós com a mesma malha (sem lista de níveis) saem numa só chamada instanciada."""
+    malha = programa.malha_objeto(1)
+    raiz = programa.NoCena()
+    for i in range(nos):
+        raiz.adicionar(programa.NoCena(malha, programa.matriz_translacao(2.0 * i - nos + 1, 0.0, 0.0)))
+    anterior = programa.grafo_cena
+    programa.grafo_cena = programa.GrafoCena(raiz)
+    programa.objeto_selecionado = programa.OBJETO_CENA
+    programa.modelo_iluminacao = 3
+    try:
+        gravador_gl.zerar()
+        programa.display()
+        chamadas = gravador_gl.chamadas["glDrawElementsInstanced"]
+    finally:
+        programa.grafo_cena = anterior
+        programa.objeto_selecionado = 1
+    return [conferencia("cena/instancias_malha_compartilhada", chamadas == 1,
+                        f"{nos} nós, {chamadas} glDrawElementsInstanced")]
+
+
+def conferir_picking_cena(programa):
+    """
+    Picking na cena: um raio por duas esferas enfileiradas atinge a mais
+    próxima, e um raio até uma esfera distante a atinge num triângulo da
+    malha do nível de detalhe (mais grosso) em que ela foi desenhada.
+    """
+    niveis = programa.malhas_lod(1)
+    raiz = programa.NoCena()
+    for x, z in ((0.0, -6.0), (0.0, -60.0), (12.0, -60.0)):
+        raiz.adicionar(programa.NoCena(niveis[0], programa.matriz_translacao(x, 0.0, z), niveis=niveis))
+    grafo = programa.GrafoCena(raiz)
+    _, _, desenhados = grafo.visiveis(np.identity(4), np.identity(4),
+                                      programa.matriz_perspectiva(45.0, 1.0, 0.1, 100.0), 600)
+    resultados = []
+    for caso, direcao, no in (("esfera_proxima", (0.05, 0.05, -1.0), 1),
+                              ("esfera_distante", (0.2, 0.005, -1.0), 3)):
+        acerto = grafo.picking(np.zeros(3), np.array(direcao))
+        ok = acerto is not None and acerto[0] == no
+        if ok:
+            _, triangulo, ponto, _ = acerto
+            malha = niveis[desenhados[no]]
+            v0, v1, v2 = malha.vertices[malha.indices[3 * triangulo:3 * triangulo + 3]]
+            normal = np.cross(v1 - v0, v2 - v0)
+            local = ponto - grafo.matrizes_mundo()[no, :3, 3]
+            ok = abs((local - v0) @ normal) <= 1e-9 * np.linalg.norm(normal)
+        resultados.append(conferencia(f"picking/cena_{caso}", ok,
+                                      f"nó {None if acerto is None else acerto[0]}, esperado {no}, "
+                                      f"nível {desenhados[no]}"))
+    return resultados
+
+
+def conferir_ladrilhos(programa, tamanho=(320, 240), processos=(1, 2)):
+    """
+    Cubo em Phong por software: o framebuffer dos ladrilhos (com 1 e mais
+    processos) tem os mesmos pixels, com as mesmas cores, que os GL_POINTS
+    do scanline sem ladrilhos, projetados com a mvp do quadro.
+    """
+    largura, altura = tamanho
+    programa.reshape(largura, altura)
+    programa.objeto_selecionado = 2
+    programa.modelo_iluminacao = 2
+    programa.scale, programa.rot_x, programa.rot_y = 1.5, 25.0, 35.0
+    programa.cache_quadro_software.ativo = False
+    rasterizador = programa.rasterizador_ladrilhos
+    processos_antes = rasterizador.processos
+    resultados = []
+    try:
+        programa.rasterizacao_ladrilhos = False
+        programa.display()
+        n = programa.estatisticas_software["pixels"]
+        janela = programa.projetar_pontos(programa.buffer_software.posicoes[:n],
+                                          programa.pilha_projecao.topo @ programa.modelview_objeto)
+        # projetar_pontos conta o Y da janela a partir do topo; o framebuffer, da base
+        colunas = np.floor(janela[:, 0]).astype(int)
+        linhas = altura - 1 - np.floor(janela[:, 1]).astype(int)
+        referencia = np.zeros((altura, largura, 4), dtype=np.int64)
+        referencia[linhas, colunas, :3] = np.round(programa.buffer_software.cores[:n] * 255.0)
+        referencia[linhas, colunas, 3] = 255
+
+        programa.rasterizacao_ladrilhos = True
+        for num_processos in processos:
+            rasterizador.definir_processos(num_processos)
+            programa.display()
+            cor = rasterizador.cor.astype(np.int64)
+            cobertos = cor[..., 3] > 0
+            iguais = (cobertos == (referencia[..., 3] > 0)).all()
+            diferenca = int(np.abs(cor - referencia)[cobertos].max()) if cobertos.any() else 0
+            resultados.append(conferencia(
+                f"ladrilhos/pontos_scanline_processos_{num_processos}",
+                iguais and diferenca <= 1 and cobertos.sum() == n,
+                f"{int(cobertos.sum())} pixels, {n} pontos, diferença máxima de cor {diferenca}/255"))
+    finally:
+        rasterizador.fechar()
+        rasterizador.processos = processos_antes
+        programa.rasterizacao_ladrilhos = False
+        programa.cache_quadro_software.ativo = True
+        programa.scale, programa.rot_x, programa.rot_y = 1.0, 0.0, 0.0
+        programa.reshape(*TAMANHO_JANELA)
+    return resultados
+
+
+def conferir_hud(programa, quadros=5):
+    """
+    Girando o cubo Phong, os contadores do scanline mudam a cada quadro,
+    mas a display list do HUD não é recompilada.
+    """
+    programa.objeto_selecionado = 2
+    programa.modelo_iluminacao = 2
+    programa.mostrar_comandos = True
+    programa.cache_quadro_software.ativo = False
+    try:
+        programa.display()
+        recompilacoes = programa.cache_hud.recompilacoes
+        pixels = set()
+        for _ in range(quadros):
+            programa.rot_y += 7.0
+            programa.display()
+            pixels.add(programa.estatisticas_software["pixels"])
+        recompilacoes = programa.cache_hud.recompilacoes - recompilacoes
+    finally:
+        programa.cache_quadro_software.ativo = True
+        programa.rot_y = 0.0
+        programa.objeto_selecionado = 1
+    return [conferencia("hud/contadores_fora_da_lista", recompilacoes == 0 and len(pixels) > 1,
+                        f"{quadros} quadros, {len(pixels)} contagens de pixels diferentes, "
+                        f"{recompilacoes} recompilações")]
+
+
+def conferir_scanline_renderizador(programa, tamanho=(320, 240), tolerancia=2):
+    """
+    Phong do scanline interativo (GL_POINTS, modo 2) contra o
+    RenderizadorSoftware (--headless), com o objeto girado, deslocado e
+    escalado: os dois iluminam no espaço do mundo, então as cores dos
+    pixels em comum diferem só por arredondamento (até `tolerancia`/255).
+    """
+    largura, altura = tamanho
+    programa.reshape(largura, altura)
+    programa.modelo_iluminacao = 2
+    programa.scale, programa.rot_x, programa.rot_y, programa.pos_x = 1.3, 60.0, -40.0, 0.4
+    programa.cache_quadro_software.ativo = False
+    resultados = []
+    try:
+        for objeto, nome in ((2, "cubo"), (1, "esfera")):
+            programa.objeto_selecionado = objeto
+            programa.display()
+            n = programa.estatisticas_software["pixels"]
+            janela = programa.projetar_pontos(programa.buffer_software.posicoes[:n],
+                                              programa.pilha_projecao.topo @ programa.modelview_objeto)
+            colunas, linhas = np.floor(janela[:, 0]).astype(int), np.floor(janela[:, 1]).astype(int)
+            cores = np.round(programa.buffer_software.cores[:n] * 255.0)
+            imagem = programa.renderizar_cena_software(largura, altura).astype(np.float64)
+            diferenca = np.abs(imagem[linhas, colunas] - cores).max(axis=1)
+            diferenca = diferenca[imagem[linhas, colunas].sum(axis=1) > 0]
+            # Na silhueta, um pixel pode cair em triângulos diferentes nos
+            # dois caminhos: tolera 1 pixel em mil acima da tolerância
+            fora = int((diferenca > tolerancia).sum())
+            resultados.append(conferencia(
+                f"phong/scanline_renderizador_{nome}", fora <= n // 1000,
+                f"{n} pixels, {fora} acima de {tolerancia}/255, diferença máxima {diferenca.max():.0f}/255"))
+    finally:
+        programa.cache_quadro_software.ativo = True
+        programa.scale, programa.rot_x, programa.rot_y, programa.pos_x = 1.0, 0.0, 0.0, 0.0
+        programa.objeto_selecionado = 1
+        programa.reshape(*TAMANHO_JANELA)
+    return resultados
+
+
+def conferir_scanline_malha(programa, tamanho=(320, 240)):
+    """
+    Rasterização em lote da malha inteira (pixels_triangulos_scanline)
+    contra o scanline de um triângulo por vez (pixels_poligono_scanline):
+    os mesmos pixels, na mesma ordem, com os mesmos P e N.
+    """
+    largura, altura = tamanho
+    programa.reshape(largura, altura)
+    programa.scale, programa.rot_x, programa.rot_y, programa.pos_x = 1.3, 60.0, -40.0, 0.4
+    resultados = []
+    try:
+        for objeto, nome in ((4, "torus"), (5, "teapot")):
+            programa.objeto_selecionado = objeto
+            programa.display()
+            mvp = programa.pilha_projecao.topo @ programa.modelview_objeto
+            limites = programa.limites_viewport()
+            vertices, normais = programa.malhas_lod(objeto)[0].triangulos()
+            S, P, N, _ = programa.preparar_triangulos_software(vertices, normais, mvp)
+            lote = programa.pixels_triangulos_scanline(S, P, N, limites)
+            um_a_um = [programa.pixels_poligono_scanline(*triangulo, limites=limites)
+                       for triangulo in zip(S, P, N)]
+            um_a_um = [np.concatenate(partes) for partes in zip(*um_a_um)]
+            mesmos = len(lote[2]) == len(um_a_um[2])
+            diferenca = max(float(np.abs(a - b).max()) for a, b in zip(lote, um_a_um)) if mesmos else np.inf
+            resultados.append(conferencia(
+                f"scanline/malha_em_lote_{nome}", mesmos and diferenca < 1e-9,
+                f"{len(S)} triângulos, {len(lote[2])} pixels em lote, {len(um_a_um[2])} um a um, "
+                f"diferença máxima {diferenca:.1e}"))
+    finally:
+        programa.scale, programa.rot_x, programa.rot_y, programa.pos_x = 1.0, 0.0, 0.0, 0.0
+        programa.objeto_selecionado = 1
+        programa.reshape(*TAMANHO_JANELA)
+    return resultados
+
+
+def conferir_triangulacao(programa):
+    """
+    Tampas de perfis com pontas que vão e voltam pelo mesmo segmento (o
+    último ponto repete um anterior), no contorno e num furo com um ponto
+    repetido em seguida. A partição monótona (sem cair no leque) cobre
+    exatamente a área do perfil menos a dos furos.
+    """
+    casos = {
+        "ponta": ([(0.8, 0.0), (0.0, 0.6), (-0.2, 1.0), (-0.4, 0.4), (0.0, -0.4), (0.4, -0.6),
+                   (0.6, -0.2), (0.8, -0.2), (0.6, -0.2)], []),
+        "furo_com_ponta": ([(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)],
+                           [[(0.2, 0.2), (0.4, 0.2), (0.4, 0.2), (0.6, 0.2), (0.8, 0.2), (0.6, 0.2),
+                             (0.5, 0.7)]]),
+    }
+    resultados = []
+    for nome, (perfil, furos) in casos.items():
+        pontos, indices = programa.triangular_perfil(perfil, furos)
+        a, b, c = pontos[indices[:, 0]], pontos[indices[:, 1]], pontos[indices[:, 2]]
+        # Soma dos módulos: no leque de um perfil côncavo, triângulos
+        # invertidos se sobrepõem aos outros e a soma passa da área
+        area = 0.5 * float(np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+                                  - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])).sum())
+        esperada = abs(programa.area_sinalizada(programa.remover_pontas(perfil)))
+        esperada -= sum(abs(programa.area_sinalizada(programa.remover_pontas(furo))) for furo in furos)
+        resultados.append(conferencia(
+            f"triangulacao/{nome}", abs(area - esperada) < 1e-9,
+            f"{len(indices)} triângulos, área {area:.4f}, esperada {esperada:.4f}"))
+    return resultados
+
+
+def conferir_lod_extrusao(programa, pontos=200, altura=1.0):
+    """
+    Níveis de detalhe de uma extrusão com um furo pequeno (menos pontos
+    que PONTOS_MINIMOS_LOD, então nunca decimado) junto da borda: no
+    nível mais grosso, a corda do contorno decimado corta o furo. Em todos
+    os níveis, a tampa de cima não pode cobrir o centro do furo nem ter
+    triângulos sobrepostos (leque).
+    """
+    angulos = np.arange(pontos) * 2.0 * np.pi / pontos
+    perfil = [(float(np.cos(a)), float(np.sin(a))) for a in angulos]
+    # Entre dois pontos do contorno no nível 3 (1 a cada 8), dentro do
+    # contorno completo e para fora da corda entre eles
+    meio = 4 * 2.0 * np.pi / pontos
+    furo = [(r * float(np.cos(meio + d)), r * float(np.sin(meio + d)))
+            for r, d in ((0.985, -0.01), (0.985, 0.01), (0.997, 0.01), (0.997, -0.01))]
+    centro = np.array([0.991 * np.cos(meio), 0.991 * np.sin(meio)])
+    antigos = (programa.perfil_extrusao, programa.furos_extrusao,
+               programa.altura_extrusao, programa.extrusao_ativa)
+    resultados = []
+    try:
+        programa.perfil_extrusao, programa.furos_extrusao = perfil, [furo]
+        programa.altura_extrusao, programa.extrusao_ativa = altura, True
+        for nivel in range(programa.num_niveis_extrusao()):
+            vertices, _ = programa.obter_malha_extrusao(nivel).triangulos()
+            tampa = vertices[np.all(vertices[:, :, 2] == altura, axis=1)][:, :, :2]
+            a, b, c = tampa[:, 0], tampa[:, 1], tampa[:, 2]
+            areas = 0.5 * ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+                           - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+            # Triângulos (anti-horários) que contêm o centro do furo
+            lados = [(q[:, 0] - p[:, 0]) * (centro[1] - p[:, 1]) - (q[:, 1] - p[:, 1]) * (centro[0] - p[:, 0])
+                     for p, q in ((a, b), (b, c), (c, a))]
+            cobrem = int(np.sum(np.all(np.array(lados) * np.sign(areas) > 0, axis=0)))
+            sobrepostos = abs(np.abs(areas).sum() - abs(areas.sum())) > 1e-9
+            resultados.append(conferencia(
+                f"lod/extrusao_furo_nivel_{nivel}", cobrem == 0 and not sobrepostos,
+                f"{len(tampa)} triângulos na tampa, {cobrem} sobre o furo"
+                + (", triângulos sobrepostos" if sobrepostos else "")))
+    finally:
+        (programa.perfil_extrusao, programa.furos_extrusao,
+         programa.altura_extrusao, programa.extrusao_ativa) = antigos
+    return resultados
+
+
+def conferir_phong(programa, pontos=2000, semente=0):
+    """
+    ContextoSombreamento.shade contra o Phong escalar ponto a ponto
+    (phong_referencia_escalar), em pontos, normais e luzes aleatórios,
+    com shininess potência de 2 (quadrados sucessivos) e não.
+    """
+    aleatorio = np.random.default_rng(semente)
+    resultados = []
+    for shininess in (32.0, 10.0):
+        contexto = programa.ContextoSombreamento(aleatorio.uniform(-5.0, 5.0, 3),
+                                                 aleatorio.uniform(-10.0, 10.0, 3),
+                                                 shininess=shininess)
+        posicoes = aleatorio.uniform(-2.0, 2.0, (pontos, 3))
+        normais = aleatorio.normal(size=(pontos, 3))
+        normais[:10] = 0.0  # normais degeneradas
+        diferenca = programa.comparar_phong_vetorizado(posicoes, normais, (0.0, 0.5, 1.0), contexto)
+        resultados.append(conferencia(
+            f"phong/vetorizado_shininess_{shininess:g}",
+            diferenca <= programa.TOLERANCIA_PHONG_VETORIZADO,
+            f"diferença máxima {diferenca:.2e}, tolerância {programa.TOLERANCIA_PHONG_VETORIZADO:g}"))
+    return resultados
+
+
+def conferir_arquivos(programa, lado=40):
+    """
+    PLY com triângulos e quads misturados (grade de quads, metade dividida
+    em triângulos) contra as mesmas faces em leque; STL binário com bytes
+    sobrando no fim, STL texto e STL truncado.
+    """
+    grade = np.arange((lado + 1) ** 2).reshape(lado + 1, lado + 1)
+    quads = np.stack([grade[:-1, :-1], grade[:-1, 1:], grade[1:, 1:], grade[1:, :-1]], axis=-1).reshape(-1, 4)
+    vertices = np.column_stack([np.indices((lado + 1, lado + 1)).reshape(2, -1).T, np.zeros((lado + 1) ** 2)])
+    faces = bytearray()
+    esperados = []
+    for f, quad in enumerate(quads):
+        partes = [quad] if f % 2 else [quad[[0, 1, 2]], quad[[0, 2, 3]]]
+        for face in partes:
+            faces += bytes([len(face)]) + face.astype("<i4").tobytes()
+        esperados += [quad[[0, 1, 2]], quad[[0, 2, 3]]]
+    num_faces = len(quads) + (len(quads) + 1) // 2
+    cabecalho = ("ply\nformat binary_little_endian 1.0\n"
+                 f"element vertex {len(vertices)}\n"
+                 "property float x\nproperty float y\nproperty float z\n"
+                 f"element face {num_faces}\n"
+                 "property list uchar int vertex_indices\nend_header\n")
+    esperados = np.concatenate(esperados)
+
+    malha = programa.malha_procedural("esfera", 1.0, 12, 12)
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "mista.ply")
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(cabecalho.encode("ascii"))
+            arquivo.write(vertices.astype("<f4").tobytes())
+            arquivo.write(bytes(faces))
+        carregada = programa.carregar_malha(caminho, normalizar=False)
+        resultados.append(conferencia("arquivos/ply_faces_mistas",
+                                      np.array_equal(carregada.indices, esperados),
+                                      f"{carregada.num_triangulos} triângulos, esperados {len(esperados) // 3}"))
+
+        stl = os.path.join(pasta, "malha.stl")
+        programa.exportar_stl(stl, malha)
+        with open(stl, "ab") as arquivo:
+            arquivo.write(b"\0" * 7)
+        carregada = programa.carregar_malha(stl, normalizar=False)
+        resultados.append(conferencia("arquivos/stl_bytes_sobrando",
+                                      carregada.num_triangulos == malha.num_triangulos,
+                                      f"{carregada.num_triangulos} triângulos, esperados {malha.num_triangulos}"))
+
+        for caso, conteudo, mensagem in (
+                ("stl_texto", b"solid cubo\n  facet normal 0 0 1\n" + b" " * 100, "ASCII"),
+                ("stl_truncado", open(stl, "rb").read()[:200], "truncado")):
+            with open(stl, "wb") as arquivo:
+                arquivo.write(conteudo)
+            try:
+                programa.carregar_malha(stl, normalizar=False)
+                erro = "carregou sem erro"
+            except ValueError as excecao:
+                erro = str(excecao)
+            resultados.append(conferencia("arquivos/" + caso, mensagem in erro, erro))
+    return resultados
+
+
+def benchmark_conferencia(programa, repeticoes):
+    return (conferir_instancias(programa) + conferir_picking_cena(programa)
+            + conferir_hud(programa) + conferir_phong(programa) + conferir_scanline_renderizador(programa)
+            + conferir_scanline_malha(programa)
+            + conferir_ladrilhos(programa)
+            + conferir_triangulacao(programa)
+            + conferir_lod_extrusao(programa)
+            + conferir_arquivos(programa))
+
+
+# ==========================================
+# RESULTADOS E COMPARAÇÃO COM BASELINE
+# ==========================================
+def gravar_json(caminho, resultados):
+    dados = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, indent=2, ensure_ascii=False)
+
+
+def comparar_com_baseline(resultados, caminho, tolerancia):
+    """
+    Compara os resultados com os de um JSON gravado por --json.
+
+    Uma medida regride se ficou mais de `tolerancia` (fração) mais lenta
+    que a baseline, ou se fez mais chamadas OpenGL. Medidas abaixo de
+    0.05 ms só regridem pelas chamadas (o ruído domina).
+
+    Returns:
+        int: número de regressões
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        baseline = {(r["grupo"], r["caso"]): r for r in json.load(arquivo)["resultados"]}
+
+    regressoes = 0
+    print(f"\n{'grupo':<14}{'caso':<26}{'base ms':>10}{'atual ms':>10}{'razão':>8}")
+    for atual in resultados:
+        base = baseline.get((atual["grupo"], atual["caso"]))
+        if base is None:
+            continue
+        razao = atual["ms"] / base["ms"] if base["ms"] > 0 else float("inf")
+        lento = razao > 1.0 + tolerancia and atual["ms"] >= 0.05
+        mais_chamadas = atual.get("chamadas_gl", 0) > base.get("chamadas_gl", atual.get("chamadas_gl", 0))
+        marca = ""
+        if lento or mais_chamadas:
+            regressoes += 1
+            marca = "  REGRESSÃO" + (" (chamadas GL)" if mais_chamadas else "")
+        print(f"{atual['grupo']:<14}{atual['caso']:<26}{base['ms']:>10.3f}{atual['ms']:>10.3f}"
+              f"{razao:>8.2f}{marca}")
+    print(f"\n{regressoes} regressão(ões) com tolerância de {tolerancia:.0%}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do projeto CG 3D (sem janela)")
+    parser.add_argument("--grupos", nargs="+", choices=GRUPOS, default=list(GRUPOS),
+                        help="grupos de benchmarks a executar (padrão: todos)")
+    parser.add_argument("--pontos", type=int, nargs="+", default=[10000],
+                        help="tamanhos dos perfis da triangulação")
+    parser.add_argument("--repeticoes", type=int, default=3,
+                        help="execuções por medida (vale a menor)")
+    parser.add_argument("--json", metavar="ARQUIVO",
+                        help="grava os resultados em JSON")
+    parser.add_argument("--baseline", metavar="ARQUIVO",
+                        help="compara com um JSON gravado antes; sai com 1 se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.5,
+                        help="piora de tempo aceita na comparação (fração, padrão 0.5)")
+    args = parser.parse_args(argv)
+
+    programa = carregar_programa()
+    benchmarks = {
+        "triangulacao": lambda: benchmark_triangulacao(programa, args.pontos, args.repeticoes),
+        "phong": lambda: benchmark_phong(programa, args.repeticoes),
+        "scanline": lambda: benchmark_scanline(programa, args.repeticoes),
+        "normal": lambda: benchmark_normal_face(programa, args.repeticoes),
+        "extrusao": lambda: benchmark_extrusao(programa, args.repeticoes),
+        "display": lambda: benchmark_display(programa, args.repeticoes),
+        "ladrilhos": lambda: benchmark_ladrilhos(programa, args.repeticoes),
+        "arquivos": lambda: benchmark_arquivos(programa, args.repeticoes),
+        "picking": lambda: benchmark_picking(programa, args.repeticoes),
+        "lod": lambda: benchmark_lod(programa, args.repeticoes),
+        "conferencia": lambda: benchmark_conferencia(programa, args.repeticoes),
+    }
+    resultados = []
+    for grupo in GRUPOS:
+        if grupo in args.grupos:
+            print(f"\n== {grupo} ==")
+            resultados += benchmarks[grupo]()
+
+    if args.json:
+        gravar_json(args.json, resultados)
+    falhas = [r["caso"] for r in resultados if r.get("ok") is False]
+    if falhas:
+        print(f"\n{len(falhas)} conferência(s) falharam: {', '.join(falhas)}")
+    if args.baseline and comparar_com_baseline(resultados, args.baseline, args.tolerancia):
+        return 1
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())